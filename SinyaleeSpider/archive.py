@@ -0,0 +1,114 @@
+import os
+import re
+
+# 归档目录（SinyaleeBlogs 为整理后的编号文章，输出结果 为 spider.py 按分类保存的结果）
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SinyaleeBlogs')
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '输出结果')
+
+# 文件头字段名与文章字典键的对应关系
+HEADER_FIELDS = {
+    '标题': 'title',
+    '链接': 'url',
+    '作者': 'author',
+    '发布日期': 'publish_date',
+    '分类': 'categories',
+}
+
+MAX_HEADER_LINES = 10
+
+
+def is_separator(line):
+    """文件头与正文之间的分隔线：一整行等号（归档中为 50 个，spider.py 写入 80 个）"""
+    line = line.strip()
+    return len(line) >= 10 and line == '=' * len(line)
+
+
+def parse_header_line(line):
+    """解析一行 "字段: 值"，返回 (文章字典的键, 值)；不是已知字段时返回 (None, None)"""
+    key, sep, value = line.partition(':')
+    key = HEADER_FIELDS.get(key.strip())
+    if not sep or not key:
+        return None, None
+    value = value.strip()
+    if key == 'categories':
+        return key, [c.strip() for c in value.split(',') if c.strip()]
+    return key, value
+
+
+def parse_article_text(text):
+    """
+    解析归档文本格式（若干 "字段: 值" 行，一行等号，然后是正文）
+
+    Args:
+        text: 文件全文
+
+    Returns:
+        dict: 包含 title/url/author/publish_date/categories/content 的文章字典；
+              没有文件头时只有 content
+    """
+    lines = text.split('\n', MAX_HEADER_LINES + 1)
+    article = {}
+    for i, line in enumerate(lines[:MAX_HEADER_LINES + 1]):
+        if is_separator(line):
+            article['content'] = '\n'.join(lines[i + 1:])
+            return article
+        key, value = parse_header_line(line)
+        if key:
+            article[key] = value
+    return {'content': text}
+
+
+def read_header(path):
+    """
+    只读取文件头（不读正文）
+
+    Returns:
+        dict: 文件头字段；文件没有文件头时为空字典
+    """
+    header = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for _ in range(MAX_HEADER_LINES + 1):
+            line = f.readline()
+            if not line:
+                break
+            if is_separator(line):
+                return header
+            key, value = parse_header_line(line)
+            if key:
+                header[key] = value
+    return {}
+
+
+def serial_of(path):
+    """SinyaleeBlogs 中文件名形如 "12.标题.txt"，返回序号（没有则为 None）"""
+    match = re.match(r'^(\d+)\.', os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def read_article(path):
+    """读取并解析一个归档文件，附带 path 和 serial 字段"""
+    with open(path, 'r', encoding='utf-8') as f:
+        article = parse_article_text(f.read())
+    article['path'] = path
+    article['serial'] = serial_of(path)
+    return article
+
+
+def iter_article_files(root=ARCHIVE_DIR):
+    """
+    按路径顺序遍历目录（含子目录）下所有 .txt 文件
+
+    跳过以 "." 开头的子目录，例如 ArticleStore 的 .objects（其中是各文章文件内容的副本，
+    否则每篇文章会出现两次）。
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.endswith('.txt'):
+                yield os.path.join(dirpath, filename)
+
+
+def iter_articles(root=ARCHIVE_DIR):
+    """遍历并解析目录下所有归档文章"""
+    for path in iter_article_files(root):
+        yield read_article(path)
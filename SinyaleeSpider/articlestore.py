@@ -0,0 +1,100 @@
+import filecmp
+import hashlib
+import os
+import shutil
+
+
+class ArticleStore:
+    """
+    按内容寻址的文章存储
+
+    每篇文章的文件内容只写一次，按 SHA-256 存放在 base_dir/.objects/ 下；
+    分类目录、“所有文章”目录中的文件都是指向它的硬链接（文件系统不支持时
+    退回符号链接或复制）。内容和链接都没有变化时不做任何写入。
+
+    Args:
+        base_dir: 输出目录
+        mode: 'hardlink'、'symlink' 或 'copy'
+    """
+
+    def __init__(self, base_dir, mode='hardlink'):
+        self.base_dir = base_dir
+        self.objects_dir = os.path.join(base_dir, '.objects')
+        self.mode = mode
+        self.stats = {'written': 0, 'bytes': 0, 'linked': 0, 'unchanged': 0}
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + '.txt')
+
+    def put(self, text):
+        """保存文件内容（已存在则跳过），返回对象文件路径"""
+        data = text.encode('utf-8')
+        path = self.object_path(hashlib.sha256(data).hexdigest())
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self.stats['written'] += 1
+        self.stats['bytes'] += len(data)
+        return path
+
+    def is_current(self, object_path, view_path):
+        if not os.path.lexists(view_path):
+            return False
+        if self.mode == 'copy':
+            return filecmp.cmp(view_path, object_path, shallow=False)
+        return os.path.exists(view_path) and os.path.samefile(view_path, object_path)
+
+    def link(self, object_path, view_path):
+        """
+        让 view_path 指向对象文件
+
+        Returns:
+            bool: 是否有改动（False 表示原来就指向同一内容）
+        """
+        if self.is_current(object_path, view_path):
+            self.stats['unchanged'] += 1
+            return False
+        view_dir = os.path.dirname(view_path)
+        os.makedirs(view_dir, exist_ok=True)
+        tmp_path = view_path + '.tmp'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        if self.mode == 'hardlink':
+            try:
+                os.link(object_path, tmp_path)
+            except OSError:
+                # 跨设备或文件系统不支持硬链接
+                self.mode = 'symlink'
+        if self.mode == 'symlink':
+            try:
+                os.symlink(os.path.relpath(object_path, view_dir), tmp_path)
+            except OSError:
+                # 例如 Windows 下没有创建符号链接的权限
+                self.mode = 'copy'
+        if self.mode == 'copy':
+            shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, view_path)
+        self.stats['linked'] += 1
+        return True
+
+    def gc(self):
+        """
+        删除已没有任何分类文件引用的对象（仅硬链接模式下可判断），返回删除的数量
+
+        文章内容改变后分类文件指向新的对象，旧对象只剩 .objects 中的一个链接。
+        BlogScraper 在每次爬取结束时调用。
+        """
+        if self.mode != 'hardlink' or not os.path.isdir(self.objects_dir):
+            return 0
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
@@ -0,0 +1,1284 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import stubserver
+from frontier import Frontier, article_first, normalize_url
+from pageparse import HTML_PARSER, make_soup
+from profiles import ExtractionProfiles
+from readurl import BlogCrawler
+from metrics import NULL_METRICS, Metrics
+from archive import ARCHIVE_DIR, OUTPUT_DIR, iter_article_files, iter_articles, read_header
+import textnorm
+import dedup
+import catalog
+import dateview
+import reextract
+from crawlsummary import CrawlSummary, read_manifest
+from crawlstate import CrawlState
+from spider import BlogScraper
+from transport import Transport
+from fixtures import FixtureSite
+from fetcher import RetryScheduler
+from charsets import EncodingResolver
+
+# 峰值内存（ru_maxrss）只在 Unix 上可用
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# e2e 默认的基准文件（各机器的数值不同，不提交到仓库）
+E2E_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'e2e_baseline.json')
+
+E2E_CASES = ('spider', 'readurl')
+
+
+@contextlib.contextmanager
+def quiet_workdir():
+    """在临时目录中运行，并屏蔽爬虫的 print 输出"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def run_crawl(base_url, workers, rate, parse_workers=0, write_delay=0.0, output=None, metrics=None):
+    """对离线站点完整爬取一次，返回 (耗时, 访问页面数, 文章URL集合)
+
+    write_delay 大于 0 时每保存一篇文章额外等待该秒数，模拟慢速磁盘；
+    output 不为 None 时把爬虫的输出写入其中。
+    """
+    scraper = BlogScraper(base_url, metrics=metrics)
+    if write_delay:
+        save_article = scraper.save_article
+        def slow_save_article(article_data, base_dir="blog_content"):
+            time.sleep(write_delay)
+            save_article(article_data, base_dir)
+        scraper.save_article = slow_save_article
+    with quiet_workdir():
+        with contextlib.redirect_stdout(output or io.StringIO()):
+            start = time.perf_counter()
+            summary = scraper.scrape_blog_pages(1, 24, workers=workers, rate=rate, parse_workers=parse_workers)
+            elapsed = time.perf_counter() - start
+    return elapsed, len(scraper.visited_urls), summary.urls()
+
+
+def bench_crawl(args):
+    """顺序抓取与并发抓取对比：两者使用相同的令牌桶限速，只比较并发带来的提速"""
+    server = stubserver.serve(latency=args.latency)
+    try:
+        print(f"离线站点: {server.base_url}  延迟 {args.latency * 1000:.0f} ms，限速 {args.rate} 次/秒")
+        results = {}
+        for workers in (1, args.workers):
+            elapsed, pages, urls = run_crawl(server.base_url, workers, args.rate)
+            results[workers] = urls
+            print(f"  workers={workers:<3d} 耗时 {elapsed:7.2f} s  页面 {pages:4d}  "
+                  f"文章 {len(urls):4d}  {pages / elapsed:7.1f} 页/秒")
+        same = results[1] == results[args.workers]
+        print(f"  文章集合一致: {'是' if same else '否'}")
+    finally:
+        server.shutdown()
+
+
+def bench_pipeline(args):
+    """并发抓取（解析、保存在主线程）与流水线（解析进程池 + 写入线程）对比"""
+    server = stubserver.serve(latency=args.latency)
+    try:
+        print(f"离线站点: {server.base_url}  延迟 {args.latency * 1000:.0f} ms，"
+              f"workers={args.workers}，每篇文章保存额外 {args.write_delay * 1000:.0f} ms")
+        results = {}
+        for parse_workers in (0, args.parse_workers):
+            output = io.StringIO()
+            elapsed, pages, urls = run_crawl(server.base_url, args.workers, args.rate, parse_workers,
+                                             args.write_delay, output)
+            results[parse_workers] = urls
+            name = "并发抓取" if parse_workers == 0 else f"流水线 parse_workers={parse_workers}"
+            print(f"  {name:<24s} 耗时 {elapsed:7.2f} s  页面 {pages:4d}  文章 {len(urls):4d}  "
+                  f"{pages / elapsed:7.1f} 页/秒")
+            if parse_workers:
+                # 流水线结束时打印的各阶段统计
+                lines = output.getvalue().splitlines()
+                for line in lines[-3:]:
+                    print(f"    {line}")
+        print(f"  文章集合一致: {'是' if results[0] == results[args.parse_workers] else '否'}")
+    finally:
+        server.shutdown()
+
+
+def bench_metrics(args):
+    """统计关闭与开启时的抓取耗时，以及各阶段耗时汇总和实时查看接口"""
+    loops = 1000000
+    start = time.perf_counter()
+    for _ in range(loops):
+        with NULL_METRICS.timer('parse_seconds'):
+            pass
+    null_cost = (time.perf_counter() - start) / loops * 1e9
+    metrics = Metrics()
+    start = time.perf_counter()
+    for _ in range(loops):
+        with metrics.timer('parse_seconds'):
+            pass
+    print(f"每次计时的开销: 关闭 {null_cost:.0f} ns，开启 {(time.perf_counter() - start) / loops * 1e9:.0f} ns")
+
+    server = stubserver.serve(latency=args.latency)
+    try:
+        for name, enabled in (("关闭统计", False), ("开启统计", True)):
+            times = []
+            for _ in range(args.repeat):
+                metrics = Metrics() if enabled else None
+                elapsed, pages, urls = run_crawl(server.base_url, args.workers, args.rate, metrics=metrics)
+                times.append(elapsed)
+            print(f"  {name}: 最快 {min(times):6.2f} s  页面 {pages}  文章 {len(urls)}")
+
+        port = metrics.serve(0).server_address[1]
+        import requests
+        text = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=5).text
+        metrics.close()
+        print(f"  /metrics 返回 {len(text.splitlines())} 行 Prometheus 文本")
+        print("  各阶段耗时（最后一轮）:")
+        for name, h in metrics.to_dict()['histograms'].items():
+            print(f"    {name:<16s} {h['count']:6d} 次  平均 {h['avg'] * 1000:8.3f} ms  合计 {h['sum']:7.3f} s")
+        for name, value in metrics.to_dict()['counters'].items():
+            print(f"    {name:<16s} {value}")
+    finally:
+        server.shutdown()
+
+
+def bench_discovery(args):
+    """REST API、站点地图和逐页抓取三种方式列出全部文章，比较请求数、耗时和结果"""
+    cases = [("REST API", True, True), ("站点地图", False, True), ("逐页抓取", False, False)]
+    results = {}
+    for name, rest, sitemap in cases:
+        server = stubserver.serve(stubserver.StubSite(rest=rest, sitemap=sitemap), latency=args.latency)
+        try:
+            scraper = BlogScraper(server.base_url)
+            with quiet_workdir():
+                start = time.perf_counter()
+                summary = scraper.scrape_wordpress(workers=args.workers, rate=args.rate)
+                elapsed = time.perf_counter() - start
+            # 每次的离线站点端口不同，按站内路径比较；正文比较 SHA-256
+            results[name] = {a['url'].split('/blog/', 1)[1]: (a['title'], a['categories'], a['sha256'])
+                             for a in summary.articles()}
+            print(f"  {name:<8s} 请求 {server.requests:4d}  耗时 {elapsed:6.2f} s  文章 {len(summary):4d}")
+        finally:
+            server.shutdown()
+    baseline = results["逐页抓取"]
+    for name in ("REST API", "站点地图"):
+        same = sum(results[name].get(url) == fields for url, fields in baseline.items())
+        print(f"  {name} 与逐页抓取的结果一致: {same}/{len(baseline)} 篇（标题、分类、正文）")
+
+
+def run_incremental(base_url, workers, rate, revalidate):
+    """在当前目录（已有清单和HTTP缓存）增量爬取一次，返回 (爬虫, 汇总, 耗时)"""
+    scraper = BlogScraper(base_url, cache_file="http_cache.db", manifest_file="articles_manifest.jsonl")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = scraper.scrape_incremental(workers=workers, rate=rate, revalidate=revalidate, delay=None)
+    elapsed = time.perf_counter() - start
+    scraper.cache.close()
+    return scraper, summary, elapsed
+
+
+def bench_incremental(args):
+    """昨天全量爬取过的站点今天新发了几篇文章、改了一篇：比较全量爬取和增量爬取的请求数"""
+    yesterday = stubserver.StubSite(rest=False, sitemap=False, skip_newest=args.new)
+    server = stubserver.serve(yesterday, latency=args.latency)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            scraper = BlogScraper(server.base_url, cache_file="http_cache.db", manifest_file="articles_manifest.jsonl")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = scraper.scrape_blog_pages(1, 24, workers=args.workers, rate=args.rate)
+            elapsed = time.perf_counter() - start
+            scraper.cache.close()
+            print(f"  全量爬取（昨天）    请求 {server.requests:4d}  耗时 {elapsed:6.2f} s  文章 {len(summary)}")
+
+            # 今天：多了最新的 args.new 篇文章，第一页上的一篇旧文章有修改
+            today = stubserver.StubSite(rest=False, sitemap=False)
+            edited = today.post_ids[min(args.new, len(today.post_ids) - 1)]
+            today.edit_post(edited, today.posts[edited]['content'] + "\n（补记）")
+            today.base_url = server.base_url
+            server.site = today
+            new_urls = {f"{server.base_url}?p={p}" for p in today.post_ids[:args.new]}
+
+            server.requests = 0
+            scraper, summary, elapsed = run_incremental(server.base_url, args.workers, args.rate, False)
+            found = len(new_urls & summary.urls())
+            print(f"  增量爬取（今天）    请求 {server.requests:4d}  耗时 {elapsed:6.2f} s  "
+                  f"新文章 {found}/{args.new}  清单 {len(summary)} 篇")
+
+            edited_url = f"{server.base_url}?p={edited}"
+            before = [a['sha256'] for a in summary.articles() if a['url'] == edited_url]
+            server.requests = 0
+            scraper, summary, elapsed = run_incremental(server.base_url, args.workers, args.rate, True)
+            records = [a['sha256'] for a in summary.articles() if a['url'] == edited_url]
+            print(f"  增量 + 检查修改     请求 {server.requests:4d}  耗时 {elapsed:6.2f} s  "
+                  f"304 {scraper.cache.stats['revalidated']}  内容已变 {scraper.cache.stats['changed']}  "
+                  f"清单 {len(summary)} 篇")
+            print(f"  修改的文章 ?p={edited}: 清单中 {len(records)} 条记录，"
+                  f"{'已更新为修改后的正文' if len(records) == 1 and records != before else '未更新'}")
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+
+def percentile(values, q):
+    """百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, -(-len(values) * q // 100) - 1)]
+
+
+def record_fixture(path, workers):
+    """逐页完整爬取一次离线站点，把全部请求和响应录制到 path，返回录制的响应数"""
+    server = stubserver.serve(stubserver.StubSite(rest=False, sitemap=False))
+    try:
+        transport = Transport(record_file=path)
+        scraper = BlogScraper(server.base_url, transport=transport)
+        with quiet_workdir():
+            scraper.scrape_blog_pages(1, 24, workers=workers, rate=1000.0)
+        count = transport.recorder.count
+        transport.close()
+    finally:
+        server.shutdown()
+    return count
+
+
+def bench_e2e_run(args):
+    """e2e 的子进程：对回放服务器完整运行一个爬虫，结果以一行 JSON 输出"""
+    logging.getLogger().setLevel(logging.ERROR)
+    latencies = []
+    transport = Transport()
+    transport.session.hooks['response'].append(lambda r, *a, **k: latencies.append(r.elapsed.total_seconds()))
+    cpu_start = os.times()
+    with quiet_workdir() as tmp:
+        start = time.perf_counter()
+        if args.case == 'spider':
+            scraper = BlogScraper(args.base_url, transport=transport)
+            scraper.scrape_blog_pages(1, 24, workers=args.workers, rate=1000.0)
+        else:
+            crawler = BlogCrawler(delay=0, transport=transport)
+            crawler.crawl(args.list_file, os.path.join(tmp, 'blog_pages'), workers=args.workers)
+        elapsed = time.perf_counter() - start
+    cpu_end = os.times()
+    # 包括已结束的子进程（readurl 的正文提取进程）
+    cpu_seconds = sum(cpu_end[i] - cpu_start[i] for i in range(4))
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    print(json.dumps({
+        'pages': len(latencies),
+        'seconds': elapsed,
+        'pages_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'cpu_seconds': cpu_seconds,
+        'peak_rss_mb': peak_rss,
+    }))
+
+
+def run_e2e_case(case, base_url, list_file, workers):
+    """在子进程中运行一个爬虫（CPU 时间和峰值内存只计该爬虫），返回结果字典"""
+    command = [sys.executable, os.path.abspath(__file__), 'e2e-run', '--case', case, '--base-url', base_url,
+               '--list-file', list_file, '--workers', str(workers)]
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        raise RuntimeError(f"{case} 运行失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_e2e(args):
+    """
+    用录制文件离线回放，端到端运行 spider（scrape_blog_pages）和 readurl（crawl），
+    测量页面/秒、响应时间 p50/p99、CPU 时间和峰值内存，吞吐量比基准低超过 tolerance 时以状态 1 退出
+    """
+    settings = {'latency': args.latency, 'bandwidth': args.bandwidth, 'error_rate': args.error_rate,
+                'workers': args.workers}
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = args.fixture
+        if not fixture:
+            fixture = os.path.join(tmp, 'fixtures.db')
+            count = record_fixture(fixture, args.workers)
+            print(f"未指定录制文件，已录制离线站点的 {count} 个响应")
+        site = FixtureSite(fixture)
+        server = stubserver.serve(site, latency=args.latency, error_rate=args.error_rate, keep_alive=True,
+                                  bandwidth=args.bandwidth * 1024)
+        try:
+            list_file = os.path.join(tmp, '爬取报告.txt')
+            with open(list_file, 'w', encoding='utf-8') as f:
+                for number, path in enumerate(site.article_paths(), 1):
+                    f.write(f"{number}. 文章{number} - {server.base_url.split('/blog/')[0]}{path}\n")
+            print(f"回放服务器: {server.base_url}  {len(site.pages)} 个页面，延迟 {args.latency * 1000:.0f} ms，"
+                  f"带宽 {f'{args.bandwidth:g} KB/s' if args.bandwidth else '不限'}，错误率 {args.error_rate:.0%}")
+            results = {}
+            for case in E2E_CASES:
+                runs = [run_e2e_case(case, server.base_url, list_file, args.workers) for _ in range(args.repeat)]
+                # 取吞吐量的中位数那一次
+                results[case] = sorted(runs, key=lambda r: r['pages_per_sec'])[len(runs) // 2]
+        finally:
+            server.shutdown()
+
+    print(f"  {'':<8s} {'页面':>6s} {'页面/秒':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'CPU s':>7s} {'峰值内存 MB':>11s}")
+    for case, r in results.items():
+        rss = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else '-'
+        print(f"  {case:<8s} {r['pages']:6d} {r['pages_per_sec']:9.1f} {r['p50_ms']:8.1f} {r['p99_ms']:8.1f} "
+              f"{r['cpu_seconds']:7.2f} {rss:>11s}")
+
+    failed = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('settings') != settings:
+            print(f"基准 {args.baseline} 的测试设置不同，不做比较: {baseline.get('settings')}")
+        else:
+            for case, r in results.items():
+                base = baseline['results'].get(case)
+                if not base:
+                    continue
+                change = r['pages_per_sec'] / base['pages_per_sec'] - 1
+                print(f"  {case}: 吞吐量 {change:+.1%}（基准 {base['pages_per_sec']:.1f} 页面/秒）")
+                if change < -args.tolerance:
+                    failed.append(case)
+    elif not args.save_baseline:
+        print(f"没有基准文件 {args.baseline}，加 --save-baseline 保存本次结果作为基准")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+        print(f"已保存基准: {args.baseline}")
+    if failed:
+        print(f"吞吐量下降超过 {args.tolerance:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+def bench_resume_run(args):
+    """resume 的子进程：在 workdir 中带状态文件爬取离线站点，每个响应的 URL 立即追加到 log"""
+    logging.getLogger().setLevel(logging.ERROR)
+    os.chdir(args.workdir)
+    with open(args.log, 'a', encoding='utf-8') as log:
+        def log_response(response, *a, **k):
+            log.write(response.url + "\n")
+            log.flush()
+        scraper = BlogScraper(args.base_url, state_file='spider_state.db', manifest_file='articles_manifest.jsonl')
+        scraper.session.hooks['response'].append(log_response)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.scrape_blog_pages(1, 24, workers=args.workers, rate=1000.0)
+        scraper.state.close()
+
+
+def run_resume_case(base_url, workdir, log, workers):
+    command = [sys.executable, os.path.abspath(__file__), 'resume-run', '--base-url', base_url,
+               '--workdir', workdir, '--log', log, '--workers', str(workers)]
+    return subprocess.Popen(command, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+
+
+def read_url_log(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [normalize_url(line) for line in f if line.strip()]
+
+
+def bench_resume(args):
+    """
+    断点续爬检查：在子进程中爬取离线站点，完成 kill_after 个页面后杀死进程，再从状态文件续爬
+
+    检查续爬时没有重新抓取状态文件中已完成的页面，且两次合起来得到的文章集合与
+    不中断的完整爬取相同。有问题时以非零状态退出。
+    """
+    server = stubserver.serve(latency=args.latency)
+    # 杀死爬虫时在途请求的连接被断开，不打印这些错误
+    server.handle_error = lambda request, client_address: None
+    failed = []
+    try:
+        print(f"离线站点: {server.base_url}  延迟 {args.latency * 1000:.0f} ms，workers={args.workers}")
+        _, pages, expected = run_crawl(server.base_url, args.workers, 1000.0)
+        expected = {normalize_url(url) for url in expected}
+        print(f"  完整爬取: 页面 {pages}，文章 {len(expected)}")
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'spider_state.db')
+            first_log, second_log = os.path.join(tmp, 'first.log'), os.path.join(tmp, 'second.log')
+
+            proc = run_resume_case(server.base_url, tmp, first_log, args.workers)
+            done = 0
+            while proc.poll() is None and done < args.kill_after:
+                time.sleep(0.05)
+                if os.path.exists(state_file):
+                    try:
+                        with contextlib.closing(sqlite3.connect(state_file)) as conn:
+                            done = conn.execute("SELECT COUNT(*) FROM urls WHERE status = 'done'").fetchone()[0]
+                    except sqlite3.Error:
+                        pass
+            if proc.poll() is not None:
+                print(f"爬取在中断前已经结束（{proc.stderr.read().strip()}），可调大 --latency 或调小 --kill-after")
+                sys.exit(1)
+            proc.kill()
+            proc.wait()
+            proc.stderr.close()
+
+            with CrawlState(state_file) as state:
+                finished = {normalize_url(url) for url in state.done_urls()}
+                unfinished = {normalize_url(url) for url in state.pending_urls()}
+            first = read_url_log(first_log)
+            print(f"  第一次: 抓取 {len(first)} 个页面后杀死，状态文件中已完成 {len(finished)}，待爬取 {len(unfinished)}")
+
+            proc = run_resume_case(server.base_url, tmp, second_log, args.workers)
+            _, stderr = proc.communicate()
+            if proc.returncode != 0:
+                print(f"续爬失败:\n{stderr}")
+                sys.exit(1)
+            second = read_url_log(second_log)
+            refetched = finished & set(second)
+            articles = {normalize_url(record['url'])
+                        for record in read_manifest(os.path.join(tmp, 'articles_manifest.jsonl'))}
+            # 被杀死时尚未提交到状态文件的页面会在续爬时重新抓取
+            repeated = len(set(first) & set(second))
+            print(f"  续爬: 抓取 {len(second)} 个页面（其中 {repeated} 个第一次抓过但未记录完成），"
+                  f"文章共 {len(articles)}")
+            if refetched:
+                failed.append(f"续爬重新抓取了 {len(refetched)} 个已完成的页面，例如 {sorted(refetched)[0]}")
+            if not unfinished <= set(second) | finished:
+                failed.append(f"{len(unfinished - set(second))} 个待爬取的页面续爬时没有抓取")
+            if articles != expected:
+                failed.append(f"文章集合与完整爬取不同: 缺少 {len(expected - articles)}，多出 {len(articles - expected)}")
+    finally:
+        server.shutdown()
+    if failed:
+        print("检查失败:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+    print("  检查通过")
+
+
+def read_tree(root):
+    """目录下全部文件（不含 .objects）的 相对路径 -> 内容"""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != '.objects']
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def bench_reextract(args):
+    """爬取离线站点时写入 WARC，再从 WARC 重新提取，比较耗时和结果"""
+    server = stubserver.serve(stubserver.StubSite(rest=False, sitemap=False), latency=args.latency)
+    try:
+        with quiet_workdir() as tmp:
+            warc_file = os.path.join(tmp, 'spider_raw.warc.gz')
+            scraper = BlogScraper(server.base_url, warc_file=warc_file)
+            start = time.perf_counter()
+            scraper.scrape_blog_pages(1, 24, workers=args.workers, rate=1000.0)
+            crawl_seconds = time.perf_counter() - start
+            scraper.warc.close()
+            crawled = read_tree(os.path.join(tmp, 'blog_content'))
+
+            # 归档副本的链接改为离线站点地址，检查重新提取的正文与归档是否一致
+            archive_copy = os.path.join(tmp, 'archive')
+            os.makedirs(archive_copy)
+            for path in iter_article_files(ARCHIVE_DIR):
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    text = f.read().replace("https://sinyalee.com/blog/", server.base_url, 1)
+                with open(os.path.join(archive_copy, os.path.basename(path)), 'w', encoding='utf-8', newline='') as f:
+                    f.write(text)
+
+            rows = []
+            for workers in args.pool_sizes:
+                output = os.path.join(tmp, f'reextracted_{workers}')
+                start = time.perf_counter()
+                captures = reextract.Captures([warc_file])
+                replay = BlogScraper(server.base_url)
+                articles = reextract.extract_articles(captures, replay, workers)
+                for article_data in articles.values():
+                    replay.save_article(article_data, output)
+                updated, matched = reextract.update_archive(archive_copy, articles)
+                rows.append((workers, time.perf_counter() - start, len(articles), read_tree(output) == crawled,
+                             updated, matched))
+    finally:
+        server.shutdown()
+
+    print(f"  爬取（{args.workers} 并发，延迟 {args.latency * 1000:.0f} ms）: {crawl_seconds:6.2f} s，"
+          f"{len(crawled)} 个文件")
+    for workers, seconds, count, same, updated, matched in rows:
+        print(f"  重新提取（{workers} 个进程）: {seconds:6.2f} s，{count} 篇文章，"
+              f"与爬取结果{'相同' if same else '不同'}，归档 {matched} 个文件中 {updated} 个正文有变化")
+
+
+def synthetic_urls(n):
+    """生成 n 个不同的站内URL，每个再附带一个写法不同的重复（锚点、参数顺序、http）"""
+    urls = []
+    for i in range(n):
+        if i % 3 == 0:
+            url = f"https://sinyalee.com/blog/?p={i}"
+            variant = f"http://sinyalee.com/blog/?p={i}#comments"
+        else:
+            url = f"https://sinyalee.com/blog/?cat={i % 400}&paged={i}"
+            variant = f"https://sinyalee.com/blog?paged={i}&cat={i % 400}"
+        urls.append(url)
+        urls.append(variant)
+    return urls
+
+
+def run_list_frontier(urls):
+    """原 crawl_site 的做法：list.pop(0) 出队，link not in list 查重"""
+    queue, visited = [], set()
+    for url in urls:
+        if url not in visited and url not in queue:
+            queue.append(url)
+    while queue:
+        visited.add(queue.pop(0))
+
+
+def run_frontier(urls, priority=None):
+    frontier = Frontier(priority=priority)
+    for url in urls:
+        frontier.add(url)
+    while frontier:
+        frontier.pop()
+
+
+def bench_frontier(args):
+    """待爬取队列微基准：每个URL的平均耗时应与规模无关（线性扩展）"""
+    sizes = [args.size // 8, args.size // 4, args.size // 2, args.size]
+    print(f"{'URL数':>8s} {'list (μs/URL)':>14s} {'Frontier':>10s} {'Frontier+优先级':>16s}")
+    for n in sizes:
+        urls = synthetic_urls(n)
+        timings = []
+        for runner in (run_list_frontier, run_frontier, lambda u: run_frontier(u, article_first)):
+            if runner is run_list_frontier and n > args.list_limit:
+                timings.append(None)
+                continue
+            start = time.perf_counter()
+            runner(urls)
+            timings.append((time.perf_counter() - start) / len(urls) * 1e6)
+        cells = ["-" if t is None else f"{t:.2f}" for t in timings]
+        print(f"{n:8d} {cells[0]:>14s} {cells[1]:>10s} {cells[2]:>16s}")
+
+
+def bench_parse(args):
+    """每页解析耗时：原来的两次 html.parser 解析加逐个试探选择器，与一次解析加提取配置"""
+    site = stubserver.StubSite()
+    pages = [(f"https://sinyalee.com{path}", html) for path, html in site.pages.items()]
+    probing = BlogScraper()
+    # 样本数足够大时提取配置永远不会固定，相当于原来每页逐个试探候选选择器
+    probing.profiles = ExtractionProfiles(sample_size=float('inf'))
+    profiled = BlogScraper()
+
+    def two_parses(scraper, url, html, parser):
+        article = None
+        if scraper.is_article_url(url):
+            article = scraper.extract_article_content(html, url, make_soup(html, parser))
+        scraper.extract_article_links(html, url, make_soup(html, parser))
+        return article
+
+    def one_parse(scraper, url, html, parser):
+        soup = make_soup(html, parser)
+        scraper.extract_article_links(html, url, soup)
+        if scraper.is_article_url(url):
+            return scraper.extract_article_content(html, url, soup)
+
+    cases = [("两次解析+逐个试探（原实现）", two_parses, probing, 'html.parser'),
+             ("一次解析+逐个试探", one_parse, probing, 'html.parser'),
+             ("一次解析+提取配置", one_parse, profiled, 'html.parser')]
+    if HTML_PARSER != 'html.parser':
+        cases.append((f"一次解析+提取配置 {HTML_PARSER}", one_parse, profiled, HTML_PARSER))
+    print(f"页面数: {len(pages)}  默认解析器: {HTML_PARSER}")
+    baseline = None
+    for name, func, scraper, parser in cases:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = [func(scraper, url, html, parser) for url, html in pages]
+        per_page = (time.perf_counter() - start) / (len(pages) * args.repeat) * 1000
+        baseline = baseline or results
+        same = "一致" if results == baseline else "不一致"
+        print(f"  {name:<24s} {per_page:7.2f} ms/页  提取结果与原实现{same}")
+
+
+def legacy_clean_text(text):
+    """原 BlogScraper.clean_text"""
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_clean_filename(filename):
+    """原 BlogScraper.clean_filename（非法字符直接删除）"""
+    if not filename:
+        return "未分类"
+    filename = re.sub(r'<[^>]+>', '', filename)
+    filename = re.sub(r'\s+', ' ', filename)
+    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+    filename = filename.strip()[:100]
+    return filename if filename else "未分类"
+
+
+def legacy_sanitize_filename(filename):
+    """原 BlogCrawler.sanitize_filename（非法字符替换为下划线）"""
+    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    if len(filename) > 100:
+        filename = filename[:100]
+    return filename.strip()
+
+
+def bench_textnorm(args):
+    """对 输出结果 中所有文件的全文、标题和分类做文本清理，比较原实现与 textnorm 的吞吐量"""
+    bodies = []
+    for path in iter_article_files(OUTPUT_DIR):
+        with open(path, 'r', encoding='utf-8') as f:
+            bodies.append(f.read())
+    articles = list(iter_articles(OUTPUT_DIR))
+    names = [a.get('title', '') for a in articles] + [c for a in articles for c in a.get('categories', [])]
+    body_bytes = sum(len(b.encode('utf-8')) for b in bodies)
+    print(f"文件数: {len(bodies)}  全文 {body_bytes / 1e6:.2f} MB  标题和分类 {len(names)} 个")
+
+    def measure(func, items):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = [func(item) for item in items]
+            best = min(best, time.perf_counter() - start)
+        return best, results
+
+    legacy_time, legacy = measure(legacy_clean_text, bodies)
+    new_time, new = measure(textnorm.clean_text, bodies)
+    print(f"  clean_text  原实现 {body_bytes / 1e6 / legacy_time:7.1f} MB/s | textnorm "
+          f"{body_bytes / 1e6 / new_time:7.1f} MB/s  ({legacy_time / new_time:.1f}x)  结果一致: "
+          f"{'是' if legacy == new else '否'}")
+
+    spider_time, spider_names = measure(legacy_clean_filename, names)
+    readurl_time, readurl_names = measure(legacy_sanitize_filename, names)
+    new_time, new_names = measure(textnorm.clean_filename, names)
+    print(f"  文件名      spider 原实现 {len(names) / spider_time / 1e3:6.0f} k/s | readurl 原实现 "
+          f"{len(names) / readurl_time / 1e3:6.0f} k/s | textnorm {len(names) / new_time / 1e3:6.0f} k/s")
+    print(f"  与原实现不同的文件名: spider {sum(a != b for a, b in zip(spider_names, new_names))} 个"
+          f"（非法字符改为下划线），readurl {sum(a != b for a, b in zip(readurl_names, new_names))} 个")
+
+
+def disk_usage(root):
+    """目录占用的磁盘空间，硬链接只计算一次"""
+    seen, total = set(), 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            st = os.lstat(os.path.join(dirpath, filename))
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_blocks * 512
+    return total
+
+
+def legacy_save_article(scraper, article_data, base_dir):
+    """原 save_article 的写入方式：每个分类（含重复）各写一份，再写一份到“所有文章”，返回写入字节数"""
+    text = scraper.format_article(article_data)
+    size = len(text.encode('utf-8'))
+    written = 0
+    for category in article_data['categories'] + ["所有文章"]:
+        category_dir = os.path.join(base_dir, scraper.clean_filename(category))
+        os.makedirs(category_dir, exist_ok=True)
+        with open(os.path.join(category_dir, f"{scraper.clean_filename(article_data['title'])}.txt"), 'w', encoding='utf-8') as f:
+            f.write(text)
+        written += size
+    return written
+
+
+def bench_store(args):
+    """保存归档中所有文章两次（第二次内容不变），比较写入量、磁盘占用和耗时"""
+    scraper = BlogScraper()
+    articles = [dict(a, author=a.get('author', '未知作者'), publish_date=a.get('publish_date', '未知日期'))
+                for a in iter_articles() if 'title' in a and 'categories' in a]
+    print(f"文章数: {len(articles)}")
+    with quiet_workdir() as tmp:
+        legacy_dir, store_dir = os.path.join(tmp, 'legacy'), os.path.join(tmp, 'store')
+        for round_name in ("首次保存", "再次保存"):
+            start = time.perf_counter()
+            legacy_bytes = sum(legacy_save_article(scraper, a, legacy_dir) for a in articles)
+            legacy_time = time.perf_counter() - start
+
+            store = scraper.article_store(store_dir)
+            before = store.stats['bytes']
+            start = time.perf_counter()
+            for article in articles:
+                scraper.save_article(article, store_dir)
+            store_time = time.perf_counter() - start
+            store_bytes = store.stats['bytes'] - before
+            with contextlib.redirect_stdout(sys.__stdout__):
+                print(f"  {round_name}: 原实现写入 {legacy_bytes / 1e6:6.2f} MB {legacy_time:6.2f} s | "
+                      f"ArticleStore 写入 {store_bytes / 1e6:6.2f} MB {store_time:6.2f} s")
+        with contextlib.redirect_stdout(sys.__stdout__):
+            print(f"  磁盘占用: 原实现 {disk_usage(legacy_dir) / 1e6:.2f} MB | "
+                  f"ArticleStore {disk_usage(store_dir) / 1e6:.2f} MB ({store.mode})")
+
+
+def run_readurl(server, list_file, save_dir, workers, delay, min_interval):
+    """用 readurl.BlogCrawler 按列表抓取一次，返回 (耗时, 保存的文本文件名, 限流减速次数, 死信数)"""
+    metrics = Metrics(prefix='readurl')
+    crawler = BlogCrawler(delay=delay, metrics=metrics)
+    start = time.perf_counter()
+    crawler.crawl(list_file, save_dir, workers=workers, min_interval=min_interval)
+    elapsed = time.perf_counter() - start
+    saved = [name for name in os.listdir(save_dir) if name.endswith('.txt')]
+    throttled = metrics.to_dict()['counters'].get('throttled', 0)
+    return elapsed, saved, throttled, len(crawler.retries.dead_letters)
+
+
+def bench_readurl(args):
+    """
+    readurl 顺序抓取与批量抓取对比，服务器会对超过并发上限的请求返回 429（带 Retry-After）
+
+    两种模式使用相同的 delay：顺序抓取每个条目之后等待 delay，批量模式的请求间隔从 delay
+    开始自适应缩短（不低于 min_interval）。每种模式都检查每个条目的 {编号}_{标题}.txt 和
+    crawl_stats.txt 都已保存、没有条目进入死信；批量模式还检查服务器限流时 AdaptiveLimiter
+    确实减速了，且比顺序抓取快。有问题时以非零状态退出。
+    """
+    logging.getLogger().setLevel(logging.ERROR)
+    server = stubserver.serve(latency=args.latency, max_inflight=args.max_inflight, error_rate=args.error_rate)
+    failed = []
+    try:
+        post_ids = server.site.post_ids[:args.count]
+        print(f"离线站点: {server.base_url}  延迟 {args.latency * 1000:.0f} ms，"
+              f"并发上限 {args.max_inflight}，503 概率 {args.error_rate:.0%}，{len(post_ids)} 篇文章，"
+              f"请求间隔 {args.delay * 1000:.0f} ms（批量模式下限 {args.min_interval * 1000:.0f} ms）")
+        with quiet_workdir() as tmp:
+            list_file = os.path.join(tmp, '爬取报告.txt')
+            with open(list_file, 'w', encoding='utf-8') as f:
+                for number, post_id in enumerate(post_ids, 1):
+                    f.write(f"{number}. 文章{post_id} - {server.base_url}?p={post_id}\n")
+            expected = {f"{number}_文章{post_id}.txt" for number, post_id in enumerate(post_ids, 1)}
+            expected.add('crawl_stats.txt')
+            times = {}
+            for workers in (1, args.workers):
+                server.throttled = 0
+                save_dir = os.path.join(tmp, f"out_{workers}")
+                elapsed, saved, backoffs, lost = run_readurl(server, list_file, save_dir, workers, args.delay,
+                                                             args.min_interval)
+                times[workers] = elapsed
+                missing = expected - set(saved)
+                with contextlib.redirect_stdout(sys.__stdout__):
+                    print(f"  workers={workers:<3d} 耗时 {elapsed:7.2f} s  保存 {len(saved) - 1:4d}  "
+                          f"服务器限流/错误 {server.throttled:4d}  减速 {backoffs:4d}  死信 {lost:3d}  "
+                          f"文件齐全: {'是' if not missing else '否'}")
+                if missing:
+                    failed.append(f"workers={workers} 缺少 {len(missing)} 个文件，例如 {sorted(missing)[0]}")
+                if lost:
+                    failed.append(f"workers={workers} 有 {lost} 个条目进入死信")
+                if workers > 1 and not backoffs:
+                    failed.append(f"workers={workers} 服务器限流/错误 {server.throttled} 次，但没有减速")
+            if times[args.workers] >= times[1]:
+                failed.append(f"批量模式（{times[args.workers]:.2f} s）不比顺序抓取（{times[1]:.2f} s）快")
+    finally:
+        server.shutdown()
+    if failed:
+        print("检查失败:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+def legacy_fetch_page(scraper, url, attempts, base_delay):
+    """改动前的做法：在抓取线程中 time.sleep 等待退避时间后原地重试"""
+    for attempt in range(attempts):
+        try:
+            response = scraper.session.get(url, timeout=scraper.timeout)
+            response.raise_for_status()
+            return response.text
+        except requests.RequestException:
+            if attempt < attempts - 1:
+                time.sleep(base_delay * 2 ** attempt + random.uniform(0, base_delay))
+    return None
+
+
+def run_retry(base_url, workers, retries, legacy_attempts=0):
+    """爬取一次，返回 (耗时, 访问页面数, 文章数)；legacy_attempts 大于 0 时使用原地等待的重试"""
+    scraper = BlogScraper(base_url, retries=retries)
+    if legacy_attempts:
+        scraper.fetch_page = lambda url: legacy_fetch_page(scraper, url, legacy_attempts, retries.base_delay)
+    with quiet_workdir():
+        start = time.perf_counter()
+        summary = scraper.scrape_blog_pages(1, 24, workers=workers, rate=1000.0)
+        elapsed = time.perf_counter() - start
+    return elapsed, len(scraper.visited_urls), len(summary)
+
+
+def bench_retry(args):
+    """出错的服务器上，原地等待重试与重试队列（等待期间继续抓取其他页面）的耗时对比"""
+    logging.getLogger().setLevel(logging.ERROR)
+    server = stubserver.serve(latency=args.latency, keep_alive=True)
+    try:
+        baseline = run_retry(server.base_url, args.workers, RetryScheduler())[2]
+        server.error_rate = args.error_rate
+        print(f"离线站点: {server.base_url}  延迟 {args.latency * 1000:.0f} ms，503 概率 {args.error_rate:.0%}，"
+              f"并发 {args.workers}，第一次重试等待 {args.base_delay:g} s，最多重试 {args.max_retries} 次，"
+              f"无错误时 {baseline} 篇文章")
+        for name, legacy in (('原地等待', True), ('重试队列', False)):
+            random.seed(args.seed)
+            server.throttled = 0
+            retries = RetryScheduler(max_retries=args.max_retries, base_delay=args.base_delay)
+            elapsed, pages, articles = run_retry(server.base_url, args.workers, retries,
+                                                 args.max_retries + 1 if legacy else 0)
+            detail = f"死信 {len(retries.dead_letters)}，熔断 {retries.stats['circuit_opened']}" if not legacy else ""
+            print(f"  {name}: 耗时 {elapsed:7.2f} s  页面 {pages:4d}  文章 {articles:4d}/{baseline}  "
+                  f"服务器错误 {server.throttled:4d}  {detail}")
+    finally:
+        server.shutdown()
+
+
+class AccumulatingSummary(CrawlSummary):
+    """改动前的做法：每篇文章的完整字典（含正文）都留在内存中直到爬取结束"""
+
+    def __init__(self, manifest_file=None, resume=False):
+        super().__init__(None)
+
+    def add(self, article_data):
+        self.count += 1
+        self.records.append(article_data)
+
+
+def run_memory(base_url, pages, workers, summary_class, sample_every):
+    """用 tracemalloc 跟踪一次爬取，返回 (耗时, 峰值内存, [(已访问页面数, 当前内存)], 文章数)"""
+    with quiet_workdir() as tmp, open(os.devnull, 'w') as devnull, mock.patch('spider.CrawlSummary', summary_class):
+        scraper = BlogScraper(base_url, manifest_file=os.path.join(tmp, 'articles_manifest.jsonl'))
+        samples = []
+        save_article = scraper.save_article
+        def sampled_save_article(article_data, base_dir="blog_content"):
+            save_article(article_data, base_dir)
+            if len(scraper.visited_urls) >= (len(samples) + 1) * sample_every:
+                samples.append((len(scraper.visited_urls), tracemalloc.get_traced_memory()[0]))
+        scraper.save_article = sampled_save_article
+        # 输出直接丢弃：重定向到 StringIO 本身会随页面数增长
+        with contextlib.redirect_stdout(devnull):
+            tracemalloc.start()
+            try:
+                start = time.perf_counter()
+                summary = scraper.crawl_site([f"{base_url}?paged=1"], max_pages=pages, workers=workers,
+                                             rate=100000.0, burst=workers)
+                elapsed = time.perf_counter() - start
+                scraper.generate_summary(summary)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return elapsed, peak, samples, len(summary)
+
+
+def bench_memory(args):
+    """保留全部文章 与 增量汇总 + 清单文件 的内存对比（按需生成页面的大型离线站点）"""
+    site = stubserver.SyntheticSite(post_count=args.pages * stubserver.POSTS_PER_PAGE // (stubserver.POSTS_PER_PAGE + 1))
+    server = stubserver.serve(site)
+    logging.getLogger().setLevel(logging.ERROR)
+    try:
+        print(f"合成站点: {len(site)} 个页面（文章 {site.post_count} 篇），tracemalloc 跟踪 Python 分配的内存")
+        for name, summary_class in (("保留全部文章", AccumulatingSummary), ("增量汇总", CrawlSummary)):
+            elapsed, peak, samples, count = run_memory(server.base_url, args.pages, args.workers,
+                                                       summary_class, args.sample_every)
+            print(f"  {name:<8s} 耗时 {elapsed:7.1f} s  文章 {count:6d}  峰值 {peak / 2**20:8.1f} MB")
+            print("    已访问页面 -> 当前内存: " + "  ".join(
+                f"{visited} -> {current / 2**20:.1f} MB" for visited, current in samples))
+    finally:
+        server.shutdown()
+
+
+def self_signed_cert(directory):
+    """用 openssl 生成 127.0.0.1 的自签名证书，返回 (证书, 私钥) 的路径"""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+                    '-days', '1', '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def fetch_all(session, urls, workers, headers=None, verify=True):
+    """用 workers 个线程抓取全部URL，返回 (耗时, 解压后的总字节数)"""
+    def fetch(url):
+        # verify 逐个请求传入：环境变量 REQUESTS_CA_BUNDLE 会覆盖 Session.verify
+        response = session.get(url, headers=headers, timeout=30, verify=verify)
+        response.raise_for_status()
+        return len(response.content)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(fetch, urls))
+    return time.perf_counter() - start, total
+
+
+def bench_transport(args):
+    """HTTPS 离线站点上，每次新建连接、默认 Session 和 Transport 连接池的吞吐量对比"""
+    logging.getLogger('urllib3').setLevel(logging.ERROR)  # 默认 Session 连接池满时的警告
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = self_signed_cert(tmp)
+        site = stubserver.StubSite()
+        server = stubserver.serve(site, latency=args.latency, keep_alive=True, certfile=cert, keyfile=key,
+                                  compress=True)
+        try:
+            paths = [path for path in site.pages if '?p=' in path] * args.rounds
+            urls = [server.base_url[:-len('/blog/')] + path for path in paths]
+            print(f"HTTPS 离线站点: {server.base_url}  {len(urls)} 个请求，{args.workers} 个线程，"
+                  f"延迟 {args.latency * 1000:.0f} ms，gzip 压缩")
+
+            transport = Transport(pool_size=args.workers)
+            cases = [("每次新建连接", requests.Session(), {'Connection': 'close'}),
+                     ("默认 Session", requests.Session(), None),
+                     ("Transport", transport.session, None)]
+            for name, session, headers in cases:
+                connections = server.connections
+                elapsed, total = fetch_all(session, urls, args.workers, headers, verify=cert)
+                print(f"  {name:<12s} 耗时 {elapsed:6.2f} s  {len(urls) / elapsed:7.1f} 请求/秒  "
+                      f"新建连接 {server.connections - connections:5d}  解压后 {total / 2**20:.1f} MB")
+                session.close()
+            print(f"  {transport.stats_line()}")
+        finally:
+            server.shutdown()
+
+
+def perturb(text, rng, rate):
+    """随机替换约 rate 比例的字符，得到一个近似重复的副本"""
+    chars = list(text)
+    for _ in range(max(1, int(len(chars) * rate))):
+        chars[rng.randrange(len(chars))] = rng.choice(text)
+    return ''.join(chars)
+
+
+def bench_dedup(args):
+    """MinHash + LSH 与两两比较的耗时对比：每篇归档文章生成若干个随机改动的副本，检查能否找回"""
+    rng = random.Random(0)
+    base = [text for text in (dedup.normalize(a['content']) for a in iter_articles()) if len(text) >= 200]
+    print(f"基础文章 {len(base)} 篇，每个副本随机替换 {args.rate:.0%} 的字符")
+    for copies in args.copies:
+        texts = [(i, text if c == 0 else perturb(text, rng, args.rate)) for c in range(copies) for i, text in enumerate(base)]
+        start = time.perf_counter()
+        documents = [dedup.Document(f"{source}/{n}", hashlib.sha1(text.encode('utf-8')).hexdigest(), len(text),
+                                    dedup.minhash(text)) for n, (source, text) in enumerate(texts)]
+        signed = time.perf_counter()
+        clusters = dedup.find_duplicates(documents)
+        grouped = time.perf_counter()
+        # 找回率：与同一篇基础文章的其他副本分在同一组的文件比例
+        found = 0
+        for canonical, duplicates in clusters:
+            source = canonical.path.split('/')[0]
+            found += sum(d.path.split('/')[0] == source for d, _, _ in duplicates) + 1
+        mixed = sum(len({canonical.path.split('/')[0]} | {d.path.split('/')[0] for d, _, _ in duplicates}) > 1
+                    for canonical, duplicates in clusters)
+        line = (f"  {len(documents):6d} 个文件  签名 {signed - start:6.2f} s  LSH 分组 {grouped - signed:6.3f} s  "
+                f"找回 {found / len(documents):6.1%}  混入其他文章的组 {mixed}")
+        pairs = len(documents) * (len(documents) - 1) // 2
+        if len(documents) <= args.pairwise_limit:
+            start = time.perf_counter()
+            for i in range(len(documents)):
+                for j in range(i + 1, len(documents)):
+                    dedup.similarity(documents[i].signature, documents[j].signature)
+            line += f"  两两比较 {pairs} 对 {time.perf_counter() - start:7.2f} s"
+        else:
+            line += f"  两两比较需 {pairs} 对"
+        print(line)
+
+
+def legacy_category_counts(roots):
+    """改动前的做法：每次统计都重新读取并解析全部文件头"""
+    counts = {}
+    for root in roots:
+        for path in iter_article_files(root):
+            for name in set(read_header(path).get('categories', [])):
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def bench_catalog(args):
+    """元数据表：首次建立、增量更新和查询耗时，与每次重新读取全部文件头对比"""
+    roots = (ARCHIVE_DIR, OUTPUT_DIR)
+    start = time.perf_counter()
+    legacy = legacy_category_counts(roots)
+    legacy_time = time.perf_counter() - start
+    print(f"重新读取全部文件头统计分类: {legacy_time * 1000:8.1f} ms（{len(legacy)} 个分类）")
+    with tempfile.TemporaryDirectory() as tmp, catalog.ArchiveCatalog(os.path.join(tmp, 'catalog.db')) as store:
+        start = time.perf_counter()
+        changed, _ = store.update(roots)
+        print(f"首次建立元数据表:           {(time.perf_counter() - start) * 1000:8.1f} ms（{changed} 个文件）")
+        start = time.perf_counter()
+        store.update(roots)
+        print(f"没有变化时更新:             {(time.perf_counter() - start) * 1000:8.1f} ms")
+        path = next(iter_article_files(ARCHIVE_DIR))
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 1))
+        try:
+            start = time.perf_counter()
+            changed, _ = store.update(roots)
+            print(f"改动 {changed} 个文件后更新:        {(time.perf_counter() - start) * 1000:8.1f} ms")
+        finally:
+            os.utime(path, (st.st_atime, st.st_mtime))
+        queries = [("分类计数（按文件）", lambda: store.count('category', distinct=False)),
+                   ("2008 年最大的分类", lambda: store.count('category', {'year': 2008}, limit=10)),
+                   ("按年计数", lambda: store.count('year')),
+                   ("时间线（心情日记）", lambda: store.timeline({'category': '心情日记'}))]
+        for name, query in queries:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                rows = query()
+                best = min(best, time.perf_counter() - start)
+            print(f"  {name:<12s} {best * 1000:7.2f} ms  {len(rows)} 行")
+        same = dict(store.count('category', distinct=False)) == {
+            name: n for name, n in legacy.items() if name in catalog.clean_categories([name])}
+        print(f"  分类计数与重新读取文件头一致: {'是' if same else '否'}")
+
+
+def bench_dateview(args):
+    """按日期分组的视图：全部重新生成与增量构建（新增、修改、删除一篇文章）的耗时"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source')
+        shutil.copytree(ARCHIVE_DIR, source)
+        with catalog.ArchiveCatalog(os.path.join(tmp, 'catalog.db')) as store:
+            store.update((ARCHIVE_DIR, OUTPUT_DIR))
+            dates = store.listing_dates()
+
+        def build(output, full=False):
+            start = time.perf_counter()
+            stats = dateview.DateView(source, output).build(dates, full)
+            return (time.perf_counter() - start) * 1000, stats
+
+        def report(name, elapsed, stats):
+            print(f"  {name:<14s} {elapsed:8.1f} ms  读取 {stats['read']:3d}  改动目录 {stats['buckets']:3d}  "
+                  f"写入 {stats['written']:3d}  删除 {stats['deleted']:3d}")
+
+        output = os.path.join(tmp, 'view')
+        elapsed, stats = build(output)
+        report("首次生成", elapsed, stats)
+        files = read_tree(output)
+        print(f"  {len(files) - 1} 个文件，{sum(map(len, files.values())) / 1e6:.2f} MB，"
+              f"{sum(1 for _ in os.scandir(output)) - 1} 个目录")
+        report("全部重新生成", *build(output, full=True))
+        report("没有变化", *build(output))
+
+        new_post = os.path.join(source, '999.新文章.txt')
+        with open(new_post, 'w', encoding='utf-8', newline='') as f:
+            f.write("标题: 新文章\r\n链接: https://sinyalee.com/blog/?p=99999\r\n发布日期: 2026年10月17日\r\n"
+                    "分类: 心情日记\r\n" + "=" * 50 + "\r\n新文章的正文")
+        report("新增一篇", *build(output))
+        edited = next(iter_article_files(source))
+        with open(edited, 'a', encoding='utf-8', newline='') as f:
+            f.write("\r\n补充一段")
+        report("修改一篇", *build(output))
+        os.remove(new_post)
+        report("删除一篇", *build(output))
+
+        fresh = os.path.join(tmp, 'fresh')
+        build(fresh, full=True)
+        same = {k: v for k, v in read_tree(output).items() if k != dateview.MANIFEST_NAME} == \
+               {k: v for k, v in read_tree(fresh).items() if k != dateview.MANIFEST_NAME}
+        print(f"  增量构建的结果与重新生成一致: {'是' if same else '否'}")
+
+
+def html_response(url, body):
+    """没有声明字符集的 text/html 响应（requests 按 ISO-8859-1 处理，readurl 需要确定编码）"""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict({'Content-Type': 'text/html'})
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = body
+    return response
+
+
+def legacy_decode(response):
+    """改动前的做法：对整个正文做字符集检测"""
+    response.encoding = response.apparent_encoding
+    return response.text
+
+
+def bench_encoding(args):
+    """归档文章渲染的页面在不声明字符集时的解码耗时：apparent_encoding 与 EncodingResolver"""
+    site = stubserver.StubSite(rest=False, sitemap=False)
+    pages = [(f"https://sinyalee.com{path}", html) for path, html in site.pages.items()]
+    body_bytes = sum(len(html.encode('utf-8')) for url, html in pages)
+    print(f"页面数: {len(pages)}  共 {body_bytes / 1e6:.2f} MB（UTF-8）")
+    cases = [
+        ("UTF-8，有 meta", 'utf-8', lambda html: html),
+        ("GBK，有 meta", 'gb18030', lambda html: html.replace('charset="UTF-8"', 'charset="GBK"')),
+        ("GBK，无 meta", 'gb18030', lambda html: html.replace('<meta charset="UTF-8">', '')),
+        ("UTF-8，无 meta", 'utf-8', lambda html: html.replace('<meta charset="UTF-8">', '')),
+    ]
+    for name, encoding, transform in cases:
+        bodies = [(url, transform(html).encode(encoding, errors='xmlcharrefreplace')) for url, html in pages]
+        expected = [body.decode(encoding) for url, body in bodies]
+        results = {}
+        for label, make_decode in (("apparent_encoding", lambda: legacy_decode),
+                                   ("EncodingResolver", lambda: EncodingResolver().decode)):
+            best = float('inf')
+            for _ in range(args.repeat):
+                decode = make_decode()  # 每轮重新开始，缓存只在同一轮的页面之间生效
+                start = time.perf_counter()
+                texts = [decode(html_response(url, body)) for url, body in bodies]
+                best = min(best, time.perf_counter() - start)
+            correct = sum(text == want for text, want in zip(texts, expected))
+            results[label] = best
+            print(f"  {name:<12s} {label:<18s} {best / len(bodies) * 1000:8.3f} ms/页  "
+                  f"正确解码 {correct}/{len(bodies)}")
+        print(f"  {'':<12s} 提速 {results['apparent_encoding'] / results['EncodingResolver']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crawl = subparsers.add_parser('crawl', help="BlogScraper 顺序/并发抓取对比")
+    crawl.add_argument('--workers', type=int, default=8)
+    crawl.add_argument('--latency', type=float, default=0.05, help="离线站点每个请求的模拟延迟（秒）")
+    crawl.add_argument('--rate', type=float, default=1000.0, help="每个主机每秒最多请求数")
+    crawl.set_defaults(func=bench_crawl)
+
+    pipeline = subparsers.add_parser('pipeline', help="并发抓取与抓取/解析/写入流水线对比")
+    pipeline.add_argument('--workers', type=int, default=8)
+    pipeline.add_argument('--parse-workers', type=int, default=4)
+    pipeline.add_argument('--latency', type=float, default=0.01, help="离线站点每个请求的模拟延迟（秒）")
+    pipeline.add_argument('--rate', type=float, default=1000.0, help="每个主机每秒最多请求数")
+    pipeline.add_argument('--write-delay', type=float, default=0.01, help="每篇文章保存的额外延迟（秒），模拟慢速磁盘")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    metrics = subparsers.add_parser('metrics', help="各阶段耗时统计及其开销")
+    metrics.add_argument('--workers', type=int, default=8)
+    metrics.add_argument('--latency', type=float, default=0.01, help="离线站点每个请求的模拟延迟（秒）")
+    metrics.add_argument('--rate', type=float, default=1000.0, help="每个主机每秒最多请求数")
+    metrics.add_argument('--repeat', type=int, default=3)
+    metrics.set_defaults(func=bench_metrics)
+
+    textnorm_parser = subparsers.add_parser('textnorm', help="文本清理吞吐量（输出结果 全部文章）")
+    textnorm_parser.add_argument('--repeat', type=int, default=3)
+    textnorm_parser.set_defaults(func=bench_textnorm)
+
+    discovery = subparsers.add_parser('discovery', help="REST API / 站点地图 / 逐页抓取列出文章的请求数")
+    discovery.add_argument('--workers', type=int, default=8)
+    discovery.add_argument('--latency', type=float, default=0.05, help="离线站点每个请求的模拟延迟（秒）")
+    discovery.add_argument('--rate', type=float, default=1000.0, help="每个主机每秒最多请求数")
+    discovery.set_defaults(func=bench_discovery)
+
+    incremental = subparsers.add_parser('incremental', help="全量爬取与增量爬取（只抓新文章/有修改的文章）的请求数")
+    incremental.add_argument('--new', type=int, default=5, help="昨天之后新发布的文章数")
+    incremental.add_argument('--workers', type=int, default=8)
+    incremental.add_argument('--latency', type=float, default=0.01, help="离线站点每个请求的模拟延迟（秒）")
+    incremental.add_argument('--rate', type=float, default=1000.0, help="每个主机每秒最多请求数")
+    incremental.set_defaults(func=bench_incremental)
+
+    e2e = subparsers.add_parser('e2e', help="回放录制文件，端到端测量两个爬虫，吞吐量比基准下降时失败")
+    e2e.add_argument('--fixture', help="录制文件（Transport 的 record_file），不指定时先录制一次离线站点")
+    e2e.add_argument('--latency', type=float, default=0.02, help="回放服务器每个请求的延迟（秒）")
+    e2e.add_argument('--bandwidth', type=float, default=0, help="每个响应的传输速率上限（KB/秒），0 表示不限")
+    e2e.add_argument('--error-rate', type=float, default=0.0, help="随机返回 503 的概率")
+    e2e.add_argument('--workers', type=int, default=8)
+    e2e.add_argument('--repeat', type=int, default=3, help="每个爬虫运行的次数，取吞吐量中位数")
+    e2e.add_argument('--baseline', default=E2E_BASELINE, help="基准文件")
+    e2e.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准")
+    e2e.add_argument('--tolerance', type=float, default=0.2, help="允许的吞吐量下降比例")
+    e2e.set_defaults(func=bench_e2e)
+
+    e2e_run = subparsers.add_parser('e2e-run', help="e2e 的子进程，运行单个爬虫")
+    e2e_run.add_argument('--case', choices=E2E_CASES, required=True)
+    e2e_run.add_argument('--base-url', required=True)
+    e2e_run.add_argument('--list-file', required=True)
+    e2e_run.add_argument('--workers', type=int, default=8)
+    e2e_run.set_defaults(func=bench_e2e_run)
+
+    reextract_parser = subparsers.add_parser('reextract', help="从 WARC 离线重新提取与重新爬取的耗时对比")
+    reextract_parser.add_argument('--workers', type=int, default=8, help="爬取并发数")
+    reextract_parser.add_argument('--latency', type=float, default=0.05, help="离线站点每个请求的模拟延迟（秒）")
+    reextract_parser.add_argument('--pool-sizes', type=int, nargs='+', default=[0, 2, 4], help="重新提取的进程数")
+    reextract_parser.set_defaults(func=bench_reextract)
+
+    frontier = subparsers.add_parser('frontier', help="待爬取队列微基准")
+    frontier.add_argument('--size', type=int, default=100000, help="最大规模（不同URL数）")
+    frontier.add_argument('--list-limit', type=int, default=25000, help="原 list 实现只测到该规模，再大太慢")
+    frontier.set_defaults(func=bench_frontier)
+
+    parse = subparsers.add_parser('parse', help="页面解析耗时")
+    parse.add_argument('--repeat', type=int, default=3)
+    parse.set_defaults(func=bench_parse)
+
+    store = subparsers.add_parser('store', help="文章保存的写入量与磁盘占用")
+    store.set_defaults(func=bench_store)
+
+    resume = subparsers.add_parser('resume', help="杀死爬虫进程后从状态文件续爬，检查只抓取未完成的页面且文章齐全")
+    resume.add_argument('--workers', type=int, default=4)
+    resume.add_argument('--latency', type=float, default=0.02, help="离线站点每个请求的模拟延迟（秒）")
+    resume.add_argument('--kill-after', type=int, default=60, help="状态文件中已完成多少个页面后杀死爬虫")
+    resume.set_defaults(func=bench_resume)
+
+    resume_run = subparsers.add_parser('resume-run', help="resume 的子进程，带状态文件运行一次爬取")
+    resume_run.add_argument('--base-url', required=True)
+    resume_run.add_argument('--workdir', required=True)
+    resume_run.add_argument('--log', required=True)
+    resume_run.add_argument('--workers', type=int, default=4)
+    resume_run.set_defaults(func=bench_resume_run)
+
+    readurl = subparsers.add_parser('readurl', help="readurl 顺序/批量抓取对比（限流服务器）")
+    readurl.add_argument('--workers', type=int, default=8)
+    readurl.add_argument('--count', type=int, default=100, help="抓取的文章数")
+    readurl.add_argument('--latency', type=float, default=0.05, help="离线站点每个请求的模拟延迟（秒）")
+    readurl.add_argument('--max-inflight', type=int, default=4, help="服务器同时处理的请求上限，超过返回 429")
+    readurl.add_argument('--error-rate', type=float, default=0.02, help="随机返回 503 的概率")
+    readurl.add_argument('--delay', type=float, default=0.05, help="爬虫的请求间隔（秒），两种模式相同")
+    readurl.add_argument('--min-interval', type=float, default=0.005, help="批量模式请求间隔的下限（秒）")
+    readurl.set_defaults(func=bench_readurl)
+
+    retry = subparsers.add_parser('retry', help="原地等待重试与非阻塞重试队列的耗时对比（随机返回 503 的服务器）")
+    retry.add_argument('--workers', type=int, default=4)
+    retry.add_argument('--latency', type=float, default=0.02, help="离线站点每个请求的模拟延迟（秒）")
+    retry.add_argument('--error-rate', type=float, default=0.1, help="随机返回 503 的概率")
+    retry.add_argument('--base-delay', type=float, default=0.5, help="第一次重试前的等待（秒）")
+    retry.add_argument('--max-retries', type=int, default=3)
+    retry.add_argument('--seed', type=int, default=1)
+    retry.set_defaults(func=bench_retry)
+
+    catalog_parser = subparsers.add_parser('catalog', help="元数据表的建立、增量更新和查询耗时")
+    catalog_parser.add_argument('--repeat', type=int, default=5)
+    catalog_parser.set_defaults(func=bench_catalog)
+
+    dateview_parser = subparsers.add_parser('dateview', help="按日期分组的视图：全部重新生成与增量构建的耗时")
+    dateview_parser.set_defaults(func=bench_dateview)
+
+    encoding = subparsers.add_parser('encoding', help="未声明字符集的页面的解码耗时（归档文章）")
+    encoding.add_argument('--repeat', type=int, default=3)
+    encoding.set_defaults(func=bench_encoding)
+
+    memory = subparsers.add_parser('memory', help="爬取大型合成站点时的内存占用（tracemalloc）")
+    memory.add_argument('--pages', type=int, default=50000, help="合成站点的页面数")
+    memory.add_argument('--workers', type=int, default=8)
+    memory.add_argument('--sample-every', type=int, default=10000, help="每访问该数量的页面记录一次当前内存")
+    memory.set_defaults(func=bench_memory)
+
+    transport = subparsers.add_parser('transport', help="连接池与每次新建连接的吞吐量对比（HTTPS 离线站点）")
+    transport.add_argument('--workers', type=int, default=16)
+    transport.add_argument('--rounds', type=int, default=3, help="每篇文章抓取的次数")
+    transport.add_argument('--latency', type=float, default=0.005, help="离线站点每个请求的模拟延迟（秒）")
+    transport.set_defaults(func=bench_transport)
+
+    dedup_parser = subparsers.add_parser('dedup', help="近似重复检测（MinHash + LSH）与两两比较的耗时")
+    dedup_parser.add_argument('--copies', type=int, nargs='+', default=[2, 8, 32], help="每篇文章的副本数（含原文）")
+    dedup_parser.add_argument('--rate', type=float, default=0.01, help="副本中随机替换的字符比例")
+    dedup_parser.add_argument('--pairwise-limit', type=int, default=2000, help="文件数不超过该值时才实际两两比较")
+    dedup_parser.set_defaults(func=bench_dedup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
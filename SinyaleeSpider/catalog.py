@@ -0,0 +1,365 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+
+from archive import ARCHIVE_DIR, OUTPUT_DIR, iter_article_files, read_article
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive_catalog.db')
+
+CJK_DATE = re.compile(r'(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日')
+NUMERIC_DATE = re.compile(r'(?<!\d)(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)')
+ENGLISH_DATE = re.compile(r'\b([A-Za-z]{3,9})\.?\s+(\d{1,2}),?\s+(\d{4})\b')
+MONTHS = {name: i for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+# 分类列表中不是分类的词：文章列表页每篇文章后的“阅读更多”链接
+READ_MORE = '阅读更多'
+
+# 可以分组的字段 -> SQL 表达式（category 需要连接 categories 表）
+GROUPS = {
+    'year': "f.year",
+    'month': "CASE WHEN f.year IS NOT NULL THEN printf('%04d-%02d', f.year, f.month) END",
+    'category': "c.name",
+    'author': "f.author",
+    'kind': "f.kind",
+    'root': "f.root",
+    'bucket': "f.bucket",
+    'date_source': "f.date_source",
+}
+
+
+def parse_dates(text):
+    """
+    找出文本中的全部日期，按出现顺序返回 ISO 格式（YYYY-MM-DD）列表
+
+    支持 "2008年10月4日"、"2008-10-04 12:00:00"（REST API）、"2008/10/4" 和
+    "October 4, 2008"。主题把发布日期和修改日期连在一起显示时
+    （"2008年10月4日2024年1月15日"）返回两个日期。不是合法日期的忽略。
+    """
+    found = []
+    for pattern in (CJK_DATE, NUMERIC_DATE):
+        for match in pattern.finditer(text):
+            found.append((match.start(), int(match.group(1)), int(match.group(2)), int(match.group(3))))
+    for match in ENGLISH_DATE.finditer(text):
+        month = MONTHS.get(match.group(1).lower()[:3])
+        if month:
+            found.append((match.start(), int(match.group(3)), month, int(match.group(2))))
+    dates = []
+    for _, year, month, day in sorted(found):
+        try:
+            dates.append(date(year, month, day).isoformat())
+        except ValueError:
+            continue
+    return dates
+
+
+def normalize_date(text):
+    """日期文本中的第一个日期（ISO 格式），没有时返回 None"""
+    dates = parse_dates(text or '')
+    return dates[0] if dates else None
+
+
+def page_kind(url):
+    """按链接判断页面类型：post（?p=）、category（?cat=）、page（?page_id=）或 other"""
+    query = parse_qs(urlparse(url or '').query)
+    for name, kind in (('p', 'post'), ('cat', 'category'), ('page_id', 'page')):
+        if name in query:
+            return kind
+    return 'other'
+
+
+def listing_dates(categories):
+    """
+    从文章列表页的分类字段中找出 (标题, 日期)
+
+    爬虫把列表页中每篇文章的 分类、日期、标题、“阅读更多” 都记进了分类字段，
+    日期后面隔一个词是“阅读更多”时，中间的词就是该日期发布的文章标题。
+    """
+    pairs = []
+    for i in range(len(categories) - 2):
+        if categories[i + 2] == READ_MORE:
+            published = normalize_date(categories[i])
+            if published:
+                pairs.append((categories[i + 1], published))
+    return pairs
+
+
+def clean_categories(categories):
+    """去重（保留第一次出现的顺序），去掉日期和“阅读更多”"""
+    seen = []
+    for name in categories:
+        if name not in seen and name != READ_MORE and not parse_dates(name):
+            seen.append(name)
+    return seen
+
+
+class ArchiveCatalog:
+    """
+    归档文章的元数据表（SQLite）
+
+    每个文件的文件头（标题/链接/作者/发布日期/分类）只解析一次：files 表每个文件一行，
+    按年月、类型、作者、链接建有索引；分类拆成 categories 表（按分类名索引）。分组、
+    筛选和时间线查询都只读这两张表，不需要再读取任何文件。
+
+    日期统一为 ISO 格式（YYYY-MM-DD）。文件头没有发布日期时（SinyaleeBlogs 中的大多数文章），
+    用文章列表页中记录的日期按标题补上，date_source 记录来源（header/listing）。
+    update() 按文件修改时间和大小增量更新，只重新解析新增或改动的文件。
+    """
+
+    def __init__(self, path=CATALOG_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                root TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                serial INTEGER,
+                title TEXT,
+                url TEXT,
+                kind TEXT NOT NULL,
+                author TEXT,
+                publish_date TEXT,
+                updated_date TEXT,
+                date_source TEXT,
+                year INTEGER,
+                month INTEGER,
+                chars INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_date ON files (year, month);
+            CREATE INDEX IF NOT EXISTS files_kind ON files (kind);
+            CREATE INDEX IF NOT EXISTS files_author ON files (author);
+            CREATE INDEX IF NOT EXISTS files_url ON files (url);
+            CREATE INDEX IF NOT EXISTS files_title ON files (title);
+            CREATE TABLE IF NOT EXISTS categories (
+                name TEXT NOT NULL,
+                file INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (name, file)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS categories_file ON categories (file);
+            CREATE TABLE IF NOT EXISTS listings (
+                title TEXT NOT NULL,
+                published TEXT NOT NULL,
+                file INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS listings_title ON listings (title);
+            CREATE INDEX IF NOT EXISTS listings_file ON listings (file);
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def update(self, roots=(ARCHIVE_DIR, OUTPUT_DIR)):
+        """
+        增量更新
+
+        Returns:
+            tuple: (新增或更新的文件数, 删除的文件数)
+        """
+        known = {path: (file_id, mtime, size)
+                 for file_id, path, mtime, size in self.conn.execute("SELECT id, path, mtime, size FROM files")}
+        seen = set()
+        changed = 0
+        with self.conn:
+            for root in roots:
+                root = os.path.abspath(root)
+                for path in iter_article_files(root):
+                    path = os.path.abspath(path)
+                    seen.add(path)
+                    st = os.stat(path)
+                    old = known.get(path)
+                    if old and old[1] == st.st_mtime and old[2] == st.st_size:
+                        continue
+                    if old:
+                        self.remove(old[0])
+                    self.add(path, st, root)
+                    changed += 1
+            removed = [file_id for path, (file_id, _, _) in known.items() if path not in seen]
+            for file_id in removed:
+                self.remove(file_id)
+            if changed or removed:
+                self.fill_listing_dates()
+        return changed, len(removed)
+
+    def add(self, path, st, root):
+        article = read_article(path)
+        raw_categories = article.get('categories', [])
+        dates = parse_dates(article.get('publish_date', ''))
+        published = dates[0] if dates else None
+        bucket = os.path.relpath(os.path.dirname(path), root)
+        cursor = self.conn.execute("""
+            INSERT INTO files (path, mtime, size, root, bucket, serial, title, url, kind, author,
+                               publish_date, updated_date, date_source, year, month, chars)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (path, st.st_mtime, st.st_size, os.path.basename(root), '' if bucket == '.' else bucket,
+             article['serial'], article.get('title'), article.get('url'), page_kind(article.get('url')),
+             article.get('author') if article.get('author') not in (None, '', '未知作者') else None,
+             published, dates[1] if len(dates) > 1 else None, 'header' if published else None,
+             int(published[:4]) if published else None, int(published[5:7]) if published else None,
+             len(article['content'])))
+        file_id = cursor.lastrowid
+        self.conn.executemany("INSERT INTO categories (name, file, position) VALUES (?, ?, ?)",
+                              ((name, file_id, i) for i, name in enumerate(clean_categories(raw_categories))))
+        self.conn.executemany("INSERT INTO listings (title, published, file) VALUES (?, ?, ?)",
+                              ((title, day, file_id) for title, day in listing_dates(raw_categories)))
+
+    def remove(self, file_id):
+        self.conn.execute("DELETE FROM categories WHERE file = ?", (file_id,))
+        self.conn.execute("DELETE FROM listings WHERE file = ?", (file_id,))
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def fill_listing_dates(self):
+        """文件头没有发布日期的文件，按标题用列表页中的日期补上（列表页变化后重新计算）"""
+        self.conn.execute("""
+            UPDATE files SET publish_date = NULL, year = NULL, month = NULL, date_source = NULL
+            WHERE date_source = 'listing'""")
+        self.conn.execute("""
+            UPDATE files SET publish_date = (SELECT MIN(published) FROM listings WHERE listings.title = files.title),
+                             date_source = 'listing'
+            WHERE publish_date IS NULL AND title IN (SELECT title FROM listings)""")
+        self.conn.execute("""
+            UPDATE files SET year = CAST(substr(publish_date, 1, 4) AS INTEGER),
+                             month = CAST(substr(publish_date, 6, 2) AS INTEGER)
+            WHERE date_source = 'listing'""")
+
+    def listing_dates(self):
+        """文章列表页中记录的发布日期：标题 -> ISO 日期（同一标题有多个日期时取最早的）"""
+        return dict(self.conn.execute("SELECT title, MIN(published) FROM listings GROUP BY title"))
+
+    def where(self, filters):
+        """筛选条件 -> (WHERE 子句, 参数)"""
+        clauses, params = [], []
+        for name, column in (('year', 'f.year'), ('month', 'f.month'), ('kind', 'f.kind'),
+                             ('author', 'f.author'), ('root', 'f.root'), ('bucket', 'f.bucket')):
+            if filters.get(name) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[name])
+        if filters.get('category'):
+            clauses.append("f.id IN (SELECT file FROM categories WHERE name = ?)")
+            params.append(filters['category'])
+        if filters.get('since'):
+            clauses.append("f.publish_date >= ?")
+            params.append(normalize_date(filters['since']) or filters['since'])
+        if filters.get('until'):
+            clauses.append("f.publish_date <= ?")
+            params.append(normalize_date(filters['until']) or filters['until'])
+        if filters.get('title'):
+            clauses.append("f.title LIKE ?")
+            params.append(f"%{filters['title']}%")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, by, filters=None, distinct=True, limit=None):
+        """
+        分组计数
+
+        Args:
+            by: 分组字段，见 GROUPS
+            filters: 筛选条件字典（year/month/kind/author/root/bucket/category/since/until/title）
+            distinct: 为 True 时按链接去重计文章数（同一篇文章在两个目录中各有一份），否则计文件数
+            limit: 最多返回的组数
+
+        Returns:
+            list: (分组值, 数量)；按年、月分组时按时间排序，其他按数量从多到少
+        """
+        where, params = self.where(filters or {})
+        join = " JOIN categories c ON c.file = f.id" if by == 'category' else ""
+        counted = "COUNT(DISTINCT COALESCE(f.url, f.path))" if distinct else "COUNT(*)"
+        order = "key" if by in ('year', 'month') else "n DESC, key"
+        sql = f"SELECT {GROUPS[by]} AS key, {counted} AS n FROM files f{join}{where} GROUP BY key ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql, params).fetchall()
+
+    def timeline(self, filters=None, distinct=True):
+        """按月计数（只含有日期的文件），返回 [(YYYY-MM, 数量)]"""
+        return [(key, n) for key, n in self.count('month', filters, distinct) if key]
+
+    def list(self, filters=None, limit=50):
+        """筛选出的文件，按发布日期排序，返回 [(发布日期, 标题, 链接, 路径)]"""
+        where, params = self.where(filters or {})
+        return self.conn.execute(
+            f"SELECT f.publish_date, f.title, f.url, f.path FROM files f{where} "
+            f"ORDER BY f.publish_date IS NULL, f.publish_date, f.path LIMIT {int(limit)}", params).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--year', type=int)
+    filters.add_argument('--month', type=int)
+    filters.add_argument('--category', help="分类名（完全匹配）")
+    filters.add_argument('--author')
+    filters.add_argument('--kind', choices=['post', 'category', 'page', 'other'])
+    filters.add_argument('--root', help="所在目录，例如 SinyaleeBlogs 或 输出结果")
+    filters.add_argument('--bucket', help="所在子目录，例如 2008年10月4日")
+    filters.add_argument('--since', help="发布日期不早于，例如 2008年10月4日 或 2008-10-04")
+    filters.add_argument('--until', help="发布日期不晚于")
+    filters.add_argument('--title', help="标题包含")
+    filters.add_argument('--files', action='store_true', help="计文件数（默认按链接去重计文章数）")
+    filters.add_argument('-n', '--limit', type=int, default=20, help="最多显示的行数")
+
+    parser = argparse.ArgumentParser(description="归档文章元数据查询（分组、筛选、时间线）")
+    parser.add_argument('--catalog', default=CATALOG_FILE, help="元数据文件路径")
+    parser.add_argument('--no-update', action='store_true', help="不检查新文件，直接查询")
+    subparsers = parser.add_subparsers(dest='command')
+    count = subparsers.add_parser('count', parents=[filters], help="分组计数，例如 count --by category --year 2008")
+    count.add_argument('--by', choices=sorted(GROUPS), default='year')
+    subparsers.add_parser('timeline', parents=[filters], help="按月的文章数")
+    subparsers.add_parser('list', parents=[filters], help="列出筛选出的文件")
+    sql = subparsers.add_parser('sql', help="直接执行 SQL 查询（表 files、categories、listings）")
+    sql.add_argument('query')
+    args = parser.parse_args()
+
+    with ArchiveCatalog(args.catalog) as catalog:
+        if not args.no_update:
+            start = time.perf_counter()
+            changed, removed = catalog.update()
+            if changed or removed:
+                print(f"元数据已更新: 新增/改动 {changed} 个文件，删除 {removed} 个 "
+                      f"({time.perf_counter() - start:.2f} s)")
+        if not args.command:
+            return
+        start = time.perf_counter()
+        if args.command == 'sql':
+            cursor = catalog.conn.execute(args.query)
+            rows = cursor.fetchall()
+            if cursor.description:
+                print("\t".join(column[0] for column in cursor.description))
+            for row in rows:
+                print("\t".join('' if value is None else str(value) for value in row))
+        else:
+            selected = {name: getattr(args, name) for name in
+                        ('year', 'month', 'category', 'author', 'kind', 'root', 'bucket', 'since', 'until', 'title')}
+            if args.command == 'list':
+                rows = catalog.list(selected, args.limit)
+                for published, title, url, path in rows:
+                    print(f"{published or '未知日期':<10s}  {title or os.path.basename(path)}  {url or ''}")
+                    print(f"            {path}")
+            elif args.command == 'timeline':
+                rows = catalog.timeline(selected, not args.files)
+                peak = max((n for _, n in rows), default=0)
+                for month, n in rows:
+                    print(f"{month}  {n:4d}  {'#' * round(n / peak * 40) if peak else ''}")
+            else:
+                rows = catalog.count(args.by, selected, not args.files, args.limit)
+                for key, n in rows:
+                    print(f"{n:6d}  {'未知' if key is None else key}")
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"共 {len(rows)} 行，查询用时 {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
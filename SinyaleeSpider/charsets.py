@@ -0,0 +1,159 @@
+import codecs
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+from requests.compat import chardet
+
+# 字节顺序标记，UTF-32 LE 的 BOM 以 UTF-16 LE 的 BOM 开头，所以放在前面
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# <meta charset="..."> 和 <meta http-equiv="Content-Type" content="text/html; charset=...">
+META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+
+XML_DECLARATION = re.compile(rb'<\?xml[^>]+?encoding\s*=\s*["\']([\w.:-]+)')
+
+# 只在开头查找编码声明（HTML 规范要求在前 1024 字节内声明，留些余量）
+META_PREFIX = 4096
+
+# 字符集检测只看开头这么多字节
+DETECT_PREFIX = 32 * 1024
+
+# 与浏览器一致，声明为 GB2312/GBK 的页面按其超集 GB18030 解码
+SUPERSETS = {'gb2312': 'gb18030', 'gbk': 'gb18030'}
+
+SOURCE_NAMES = {'sniffed': 'BOM/meta', 'utf-8': 'UTF-8', 'cached': '缓存', 'detected': '前缀检测',
+                'detected_full': '全文检测', 'fallback': '无法确定'}
+
+
+def normalize_encoding(name):
+    """规范化编码名（Python 的编解码器名称），无法识别时返回 None"""
+    if not name:
+        return None
+    try:
+        name = codecs.lookup(name).name
+    except LookupError:
+        return None
+    return SUPERSETS.get(name, name)
+
+
+def sniff_encoding(body):
+    """从 BOM 或开头的 <meta charset>、XML 声明得到编码，都没有时返回 None"""
+    for bom, encoding in BOMS:
+        if body.startswith(bom):
+            return encoding
+    head = body[:META_PREFIX]
+    match = META_CHARSET.search(head) or XML_DECLARATION.search(head)
+    return normalize_encoding(match.group(1).decode('ascii', 'ignore')) if match else None
+
+
+def detect_encoding(data):
+    """对 data 做字符集检测（与 requests 的 apparent_encoding 相同的检测库），返回编码名或 None"""
+    return normalize_encoding(chardet.detect(data)['encoding'])
+
+
+def try_decode(body, encoding):
+    """按 encoding 严格解码，字节与编码不符时返回 None"""
+    if not encoding:
+        return None
+    try:
+        return body.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
+
+
+class EncodingResolver:
+    """
+    服务器没有声明字符集时确定响应正文的编码，代替 response.apparent_encoding
+
+    apparent_encoding 对整个正文做字符集检测，长的中文页面很慢，而且同一站点的
+    每个页面都要重新检测一遍。这里按代价从低到高依次尝试：
+
+    1. BOM 和开头的 <meta charset>（或 XML 声明）
+    2. UTF-8（不是 UTF-8 的正文通常在第一个非 ASCII 字符处就解码失败）
+    3. 同一主机、同一 Content-Type 上次确定的编码
+    4. 只对开头 detect_prefix 字节做字符集检测；结果不能解码整个正文时再检测全文
+
+    每个候选编码都用严格模式解码整个正文来验证（解码本来就要做），所以页面的字节
+    与缓存的编码不符时（例如站点中个别页面换了编码）会继续往下重新确定，而不是
+    得到乱码。GB18030 这样宽松的多字节编码几乎能解码任何字节，站点混用这类编码时
+    只有页面自己的 meta 声明能纠正（第 1 步）。确定的编码按 (主机, Content-Type) 缓存。
+    多个线程可以同时使用。
+
+    Args:
+        detect_prefix: 字符集检测的字节数
+    """
+
+    def __init__(self, detect_prefix=DETECT_PREFIX):
+        self.detect_prefix = detect_prefix
+        self.cache = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def cache_key(self, url, content_type):
+        return urlparse(url).netloc, content_type.split(';')[0].strip().lower()
+
+    def decode(self, response):
+        """返回 requests.Response 的正文文本，并把确定的编码设置到 response.encoding"""
+        key = self.cache_key(response.url, response.headers.get('Content-Type', ''))
+        text, encoding = self.resolve(response.content or b'', key)
+        response.encoding = encoding
+        return text
+
+    def resolve(self, body, key):
+        """
+        确定 body 的编码并解码
+
+        Args:
+            body: 正文字节
+            key: 缓存键，例如 (主机, Content-Type)
+
+        Returns:
+            tuple: (文本, 编码)
+        """
+        encoding, source = sniff_encoding(body), 'sniffed'
+        text = try_decode(body, encoding)
+        if text is None:
+            encoding, source = 'utf-8', 'utf-8'
+            text = try_decode(body, encoding)
+        if text is None:
+            with self.lock:
+                encoding, source = self.cache.get(key), 'cached'
+            text = try_decode(body, encoding)
+            if text is None and encoding:
+                # 与缓存的编码不符，重新检测
+                self.count('rechecked')
+        if text is None:
+            encoding, source = detect_encoding(body[:self.detect_prefix]), 'detected'
+            text = try_decode(body, encoding)
+        if text is None and len(body) > self.detect_prefix:
+            encoding, source = detect_encoding(body), 'detected_full'
+            text = try_decode(body, encoding)
+        if text is None:
+            encoding, source = encoding or 'utf-8', 'fallback'
+            text = body.decode(encoding, errors='replace')
+        with self.lock:
+            self.cache[key] = encoding
+            self.stats[source] += 1
+        return text, encoding
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def stats_line(self):
+        """统计信息，例如 "编码: BOM/meta 120, 缓存 30, 前缀检测 1 | 与缓存不符重新检测 1" """
+        with self.lock:
+            stats = dict(self.stats)
+        parts = ", ".join(f"{label} {stats[source]}" for source, label in SOURCE_NAMES.items() if stats.get(source))
+        line = f"编码: {parts or '无'}"
+        if stats.get('rechecked'):
+            line += f" | 与缓存不符重新检测 {stats['rechecked']}"
+        return line
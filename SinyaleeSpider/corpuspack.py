@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from archive import ARCHIVE_DIR, iter_article_files, parse_article_text, serial_of
+
+# 可选依赖：安装了 zstandard 时可以用 zstd 压缩
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 文件格式：
+#   8 字节魔数 | 4 字节索引长度（小端 uint32）| 索引（UTF-8 JSON）| 数据区
+# 索引中每篇文章记录 path/serial/title/url/date/categories 以及正文在数据区中的
+# offset/length（压缩后）和 size（原始字节数）。数据区保存各文件的原始字节，
+# 解包后与原文件完全相同；内容相同的文件只保存一份。
+MAGIC = b'SYPACK01'
+HEADER = struct.Struct('<8sI')
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, 9)
+    return data
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    return bytes(data)
+
+
+def pack(root, pack_path, codec='zlib'):
+    """
+    把目录下所有 .txt 文章打包成一个文件
+
+    Args:
+        root: 归档目录（SinyaleeBlogs 或 输出结果）
+        pack_path: 输出文件路径
+        codec: 'none'、'zlib' 或 'zstd'（需要安装 zstandard）
+
+    Returns:
+        int: 打包的文章数
+    """
+    if codec == 'zstd' and zstandard is None:
+        raise RuntimeError("未安装 zstandard，无法使用 zstd 压缩")
+    entries, blobs, offsets = [], [], {}
+    data_size = 0
+    for path in iter_article_files(root):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        try:
+            article = parse_article_text(raw.decode('utf-8'))
+        except UnicodeDecodeError:
+            article = {}
+        digest = hashlib.sha256(raw).digest()
+        if digest not in offsets:
+            blob = compress(raw, codec)
+            offsets[digest] = (data_size, len(blob))
+            blobs.append(blob)
+            data_size += len(blob)
+        offset, length = offsets[digest]
+        entries.append({
+            'path': os.path.relpath(path, root).replace(os.sep, '/'),
+            'serial': serial_of(path),
+            'title': article.get('title'),
+            'url': article.get('url'),
+            'date': article.get('publish_date'),
+            'categories': article.get('categories', []),
+            'offset': offset,
+            'length': length,
+            'size': len(raw),
+        })
+
+    index = json.dumps({'codec': codec, 'articles': entries}, ensure_ascii=False).encode('utf-8')
+    tmp_path = pack_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, pack_path)
+    return len(entries)
+
+
+class CorpusPack:
+    """
+    读取打包文件：内存映射整个文件，只解析索引，按需解压单篇文章
+
+    用法：
+        with CorpusPack("SinyaleeBlogs.pack") as corpus:
+            text = corpus.read(corpus.by_serial[12])
+    """
+
+    def __init__(self, pack_path):
+        self.file = open(pack_path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是文章打包文件: {pack_path}")
+        index = json.loads(self.map[HEADER.size:HEADER.size + index_length].decode('utf-8'))
+        self.codec = index['codec']
+        self.data_start = HEADER.size + index_length
+        self.articles = index['articles']
+        self.by_path = {a['path']: a for a in self.articles}
+        self.by_serial = {a['serial']: a for a in self.articles if a['serial'] is not None}
+        self.by_url = {}
+        for article in self.articles:
+            if article['url']:
+                self.by_url.setdefault(article['url'], article)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.articles)
+
+    def __iter__(self):
+        return iter(self.articles)
+
+    def read_bytes(self, entry):
+        """文章文件的原始字节"""
+        start = self.data_start + entry['offset']
+        return decompress(self.map[start:start + entry['length']], self.codec)
+
+    def read(self, entry):
+        """文章文件的文本（与用文本模式打开原文件读到的相同）"""
+        return self.read_bytes(entry).decode('utf-8').replace('\r\n', '\n')
+
+    def unpack(self, out_dir):
+        """还原为目录，返回写出的文件数"""
+        for entry in self.articles:
+            path = os.path.join(out_dir, *entry['path'].split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.read_bytes(entry))
+        return len(self.articles)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def find(corpus, key):
+    """按序号、URL或相对路径查找文章"""
+    if key.isdigit() and int(key) in corpus.by_serial:
+        return corpus.by_serial[int(key)]
+    return corpus.by_url.get(key) or corpus.by_path.get(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文章归档打包工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('pack', help="打包目录")
+    p.add_argument('pack_file')
+    p.add_argument('root', nargs='?', default=ARCHIVE_DIR)
+    p.add_argument('--codec', choices=['none', 'zlib', 'zstd'], default='zlib')
+
+    p = subparsers.add_parser('unpack', help="还原为目录")
+    p.add_argument('pack_file')
+    p.add_argument('out_dir')
+
+    p = subparsers.add_parser('get', help="按序号、URL或路径读取一篇文章")
+    p.add_argument('pack_file')
+    p.add_argument('key')
+
+    p = subparsers.add_parser('ls', help="列出所有文章")
+    p.add_argument('pack_file')
+
+    args = parser.parse_args()
+    if args.command == 'pack':
+        count = pack(args.root, args.pack_file, args.codec)
+        print(f"已打包 {count} 篇文章: {args.pack_file} ({os.path.getsize(args.pack_file) / 1e6:.2f} MB)")
+        return
+
+    with CorpusPack(args.pack_file) as corpus:
+        if args.command == 'unpack':
+            print(f"已还原 {corpus.unpack(args.out_dir)} 个文件到 {args.out_dir}")
+        elif args.command == 'get':
+            entry = find(corpus, args.key)
+            if entry is None:
+                print(f"未找到: {args.key}", file=sys.stderr)
+                sys.exit(1)
+            print(corpus.read(entry))
+        else:
+            for entry in corpus:
+                print(f"{entry['serial'] or '-'}\t{entry['title'] or ''}\t{entry['url'] or ''}\t{entry['path']}")
+
+
+if __name__ == "__main__":
+    main()
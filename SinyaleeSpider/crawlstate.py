@@ -0,0 +1,113 @@
+import sqlite3
+import time
+
+from frontier import normalize_url
+
+QUEUED = 'queued'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class CrawlState:
+    """
+    可断点续爬的爬取状态（SQLite）
+
+    记录每个URL的状态（queued 待爬取 / done 已完成 / failed 失败）和结果说明。
+    写入先缓存在内存中，每 batch_size 条或每 flush_interval 秒合并为一个事务提交，
+    不会给每个页面增加一次磁盘同步；进程被杀死时最多丢失最后一批记录，
+    这些URL在续爬时会被重新抓取。
+
+    Args:
+        path: 数据库文件路径
+        batch_size: 累计多少条记录提交一次
+        flush_interval: 距上次提交超过多少秒时提交
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                outcome TEXT,
+                updated REAL
+            )""")
+        self.conn.commit()
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.done = {row[0] for row in self.conn.execute("SELECT key FROM urls WHERE status = ?", (DONE,))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def key(self, url, key=None):
+        return key if key is not None else normalize_url(url)
+
+    def is_done(self, url, key=None):
+        return self.key(url, key) in self.done
+
+    def done_urls(self):
+        """已完成的URL（含尚未提交的记录）"""
+        self.flush()
+        return [row[0] for row in self.conn.execute("SELECT url FROM urls WHERE status = ?", (DONE,))]
+
+    def pending_urls(self):
+        """上次未完成的URL：待爬取和失败的，按首次入队顺序"""
+        self.flush()
+        return [row[0] for row in self.conn.execute(
+            "SELECT url FROM urls WHERE status != ? ORDER BY rowid", (DONE,))]
+
+    def record_queued(self, url, key=None):
+        self.add(self.key(url, key), url, QUEUED, None)
+
+    def record_done(self, url, outcome='ok', key=None):
+        key = self.key(url, key)
+        self.done.add(key)
+        self.add(key, url, DONE, outcome)
+
+    def record_failed(self, url, error, key=None):
+        self.add(self.key(url, key), url, FAILED, str(error))
+
+    def add(self, key, url, status, outcome):
+        self.pending.append((key, url, status, outcome, time.time()))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把缓存的记录作为一个事务提交"""
+        if self.pending:
+            with self.conn:
+                for key, url, status, outcome, updated in self.pending:
+                    if status == QUEUED:
+                        # 已有记录（可能已完成）时不降级为待爬取
+                        self.conn.execute(
+                            "INSERT OR IGNORE INTO urls (key, url, status, outcome, updated) VALUES (?, ?, ?, ?, ?)",
+                            (key, url, status, outcome, updated))
+                    else:
+                        self.conn.execute(
+                            "INSERT INTO urls (key, url, status, outcome, updated) VALUES (?, ?, ?, ?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET status = excluded.status, "
+                            "outcome = excluded.outcome, updated = excluded.updated",
+                            (key, url, status, outcome, updated))
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def reset(self):
+        """清空所有记录，开始新一轮爬取"""
+        self.pending = []
+        self.done = set()
+        with self.conn:
+            self.conn.execute("DELETE FROM urls")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from collections import Counter
+
+# 清单中每篇文章保存的字段（不含正文）
+MANIFEST_FIELDS = ('title', 'url', 'author', 'publish_date', 'categories')
+
+
+def read_manifest(path):
+    """逐行读取清单文件中的文章记录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def compact_manifest(path):
+    """
+    同一文章有多条记录时（增量爬取中文章有修改、重新保存）只保留最后一条
+
+    先写入临时文件再替换原文件，中途出错时原清单不受影响。
+
+    Returns:
+        int: 删除的记录数
+    """
+    last = {}
+    total = 0
+    for i, record in enumerate(read_manifest(path)):
+        last[record['url']] = i
+        total = i + 1
+    if len(last) == total:
+        return 0
+    keep = set(last.values())
+    tmp_path = path + '.tmp'
+    with open(path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        i = 0
+        for line in src:
+            if not line.strip():
+                continue
+            if i in keep:
+                dst.write(line if line.endswith('\n') else line + '\n')
+            i += 1
+    os.replace(tmp_path, path)
+    return total - len(keep)
+
+
+class CrawlSummary:
+    """
+    增量汇总：每保存一篇文章就更新计数，文章列表逐行写入 JSONL 清单
+
+    爬虫不再把全部文章（含正文）留在内存中直到结束：add() 只更新文章数和
+    分类、作者计数，并把标题、链接、作者、日期、分类和正文的 SHA-256 追加到
+    清单文件。内存占用只与分类和作者的数量有关，与爬取的页面数无关。
+    write_report() 从计数器和清单（逐行读取）生成汇总报告。
+
+    不指定清单文件时，文章列表（不含正文）保存在内存中，适合小规模爬取和测试。
+
+    Args:
+        manifest_file: 清单文件路径（JSONL），None 表示不写文件
+        resume: 为 True 时保留已有清单并从中恢复计数（断点续爬），否则清空
+    """
+
+    def __init__(self, manifest_file=None, resume=False):
+        self.manifest_file = manifest_file
+        self.count = 0
+        self.categories = Counter()
+        self.authors = Counter()
+        self.records = [] if manifest_file is None else None
+        self.file = None
+        if manifest_file:
+            if resume and os.path.exists(manifest_file):
+                for record in self.read_manifest():
+                    self.count_record(record)
+            # 按行缓冲：每条记录在状态文件记为完成之前就写入文件，进程被杀死时不会丢失
+            self.file = open(manifest_file, 'a' if resume else 'w', encoding='utf-8', buffering=1)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def count_record(self, record):
+        self.count += 1
+        self.categories.update(record['categories'])
+        self.authors[record['author']] += 1
+
+    def add(self, article_data):
+        """记录一篇已保存的文章"""
+        record = {field: article_data.get(field) for field in MANIFEST_FIELDS}
+        record['author'] = record['author'] or '未知作者'
+        record['sha256'] = hashlib.sha256(article_data['content'].encode('utf-8')).hexdigest()
+        self.count_record(record)
+        if self.file:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            self.records.append(record)
+
+    def read_manifest(self):
+        return read_manifest(self.manifest_file)
+
+    def articles(self):
+        """依次产出文章记录（不含正文，按保存顺序）"""
+        if self.records is not None:
+            yield from self.records
+            return
+        if self.file:
+            self.file.flush()
+        yield from self.read_manifest()
+
+    def urls(self):
+        return {record['url'] for record in self.articles()}
+
+    def write_report(self, path, pages_visited):
+        """生成汇总报告（格式与原来的 generate_summary 相同）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("博客爬取汇总报告\n")
+            f.write("="*80 + "\n\n")
+            f.write(f"总共爬取文章数量: {self.count}\n")
+            f.write(f"总共访问页面数量: {pages_visited}\n\n")
+
+            f.write("分类统计:\n")
+            for category, count in sorted(self.categories.items(), key=lambda x: x[1], reverse=True):
+                f.write(f"  {category}: {count} 篇\n")
+
+            f.write("\n作者统计:\n")
+            for author, count in sorted(self.authors.items(), key=lambda x: x[1], reverse=True):
+                f.write(f"  {author}: {count} 篇\n")
+
+            f.write("\n文章列表:\n")
+            for i, article in enumerate(self.articles(), 1):
+                f.write(f"{i}. {article['title']} - {article['url']}\n")
+                f.write(f"   作者: {article['author']} | 日期: {article['publish_date']} | 分类: {', '.join(article['categories'])}\n\n")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
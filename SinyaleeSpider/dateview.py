@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import date
+
+from archive import ARCHIVE_DIR, OUTPUT_DIR, iter_article_files, parse_article_text
+from catalog import CATALOG_FILE, ArchiveCatalog, parse_dates
+from textnorm import clean_filename
+
+MANIFEST_NAME = '.dateview_manifest.json'
+
+# 没有发布日期的文章所在的目录（与 spider.py 中未知日期的写法相同）
+UNKNOWN_BUCKET = "未知日期"
+
+
+def bucket_name(dates):
+    """ISO 日期列表 -> 目录名，与主题的显示方式相同，例如 "2008年10月4日2024年1月15日" """
+    if not dates:
+        return UNKNOWN_BUCKET
+    return "".join(f"{d.year}年{d.month}月{d.day}日" for d in map(date.fromisoformat, dates[:2]))
+
+
+class DateView:
+    """
+    按发布日期分组的归档视图（输出结果/<日期>/<标题>.txt）的增量构建
+
+    布局由源文件的文件头决定：目录为发布日期（有修改日期时接在后面），文件头没有日期时
+    用 build() 的 dates（标题 -> ISO 日期，例如元数据表中文章列表页记录的日期），都没有
+    时放在“未知日期”；文件名为清理后的标题，内容与源文件相同。
+
+    manifest 记录每个源文件的修改时间、大小、SHA-256 和解析出的标题、日期，以及上次
+    生成的各目录的 文件名 -> 内容哈希。重新构建时：
+
+    - 只读取修改时间或大小变化的源文件
+    - 只处理文件集合或内容有变化的目录：新的或内容变化的文件先写临时文件再改名替换，
+      不再属于该目录的文件删除，空了的目录删除
+    - 只删除 manifest 中记录的、由视图生成的文件，其他文件（例如爬虫按分类保存的结果）
+      不会被删除；与视图中文件同名的文件会被替换
+    - manifest 本身最后同样经临时文件替换写入（没有变化时不写）
+
+    Args:
+        source_dir: 源目录（含子目录）
+        output_dir: 输出目录
+        manifest_file: manifest 路径，默认为 output_dir 下的 .dateview_manifest.json
+    """
+
+    def __init__(self, source_dir=ARCHIVE_DIR, output_dir=OUTPUT_DIR, manifest_file=None):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.manifest_file = manifest_file or os.path.join(output_dir, MANIFEST_NAME)
+        self.stats = {'read': 0, 'written': 0, 'deleted': 0, 'buckets': 0}
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'sources': {}, 'buckets': {}}
+
+    def save_manifest(self, manifest):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_file)), exist_ok=True)
+        tmp_path = self.manifest_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(manifest, ensure_ascii=False))
+        os.replace(tmp_path, self.manifest_file)
+
+    def scan(self, known):
+        """
+        源文件的记录：相对路径 -> {mtime, size, sha256, title, dates}
+
+        修改时间和大小与 known 中相同的文件直接沿用上次的记录，不读取。
+        """
+        sources = {}
+        for path in iter_article_files(self.source_dir):
+            relpath = os.path.relpath(path, self.source_dir)
+            st = os.stat(path)
+            old = known.get(relpath)
+            if old and old['mtime'] == st.st_mtime and old['size'] == st.st_size:
+                sources[relpath] = old
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            article = parse_article_text(data.decode('utf-8', errors='replace'))
+            sources[relpath] = {'mtime': st.st_mtime, 'size': st.st_size,
+                                'sha256': hashlib.sha256(data).hexdigest(),
+                                'title': article.get('title') or os.path.splitext(os.path.basename(path))[0],
+                                'dates': parse_dates(article.get('publish_date', ''))}
+            self.stats['read'] += 1
+        return sources
+
+    def layout(self, sources, dates=None):
+        """目录 -> {文件名: [内容哈希, 源文件相对路径]}；同一目录中标题相同的文件依次加 " (2)" 等后缀"""
+        buckets = {}
+        for relpath in sorted(sources):
+            record = sources[relpath]
+            published = record['dates'] or ([dates[record['title']]] if dates and record['title'] in dates else [])
+            files = buckets.setdefault(bucket_name(published), {})
+            title = clean_filename(record['title']) or "无标题"
+            filename, n = f"{title}.txt", 1
+            while filename in files:
+                n += 1
+                filename = f"{title} ({n}).txt"
+            files[filename] = [record['sha256'], relpath]
+        return buckets
+
+    def build(self, dates=None, full=False):
+        """
+        增量构建视图
+
+        Args:
+            dates: 标题 -> ISO 日期，文件头没有发布日期时使用
+            full: 为 True 时不沿用 manifest，重新读取全部源文件并改写全部目录
+                  （仍按 manifest 删除不再需要的文件）
+
+        Returns:
+            dict: 统计（读取的源文件数、写入和删除的文件数、改动的目录数）
+        """
+        manifest = self.load_manifest()
+        old_buckets = manifest.get('buckets', {})
+        sources = self.scan({} if full else manifest.get('sources', {}))
+        buckets = self.layout(sources, dates)
+
+        for bucket in sorted(set(old_buckets) | set(buckets)):
+            old_files = old_buckets.get(bucket, {})
+            new_files = buckets.get(bucket, {})
+            if not full and old_files == new_files:
+                continue
+            self.stats['buckets'] += 1
+            bucket_dir = os.path.join(self.output_dir, bucket)
+            for filename in old_files.keys() - new_files.keys():
+                try:
+                    os.remove(os.path.join(bucket_dir, filename))
+                    self.stats['deleted'] += 1
+                except FileNotFoundError:
+                    pass
+            for filename, (digest, relpath) in new_files.items():
+                if not full and old_files.get(filename, [None])[0] == digest:
+                    continue
+                os.makedirs(bucket_dir, exist_ok=True)
+                path = os.path.join(bucket_dir, filename)
+                tmp_path = path + '.tmp'
+                with open(os.path.join(self.source_dir, relpath), 'rb') as src, open(tmp_path, 'wb') as f:
+                    f.write(src.read())
+                os.replace(tmp_path, path)
+                self.stats['written'] += 1
+            if not new_files and os.path.isdir(bucket_dir) and not os.listdir(bucket_dir):
+                os.rmdir(bucket_dir)
+
+        if full or sources != manifest.get('sources') or buckets != old_buckets:
+            self.save_manifest({'sources': sources, 'buckets': buckets})
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按发布日期分组的归档视图（输出结果/<日期>/<标题>.txt），增量构建")
+    parser.add_argument('--source', default=ARCHIVE_DIR, help="源目录，默认为 SinyaleeBlogs")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="输出目录，默认为 输出结果")
+    parser.add_argument('--manifest', help="manifest 路径，默认为输出目录下的 .dateview_manifest.json")
+    parser.add_argument('--catalog', default=CATALOG_FILE,
+                        help="元数据表（catalog.py），文件头没有发布日期时用其中文章列表页的日期；空字符串表示不用")
+    parser.add_argument('--full', action='store_true', help="忽略 manifest，重新读取全部源文件并改写全部目录")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dates = None
+    if args.catalog:
+        with ArchiveCatalog(args.catalog) as catalog:
+            catalog.update((args.source, args.output))
+            dates = catalog.listing_dates()
+    view = DateView(args.source, args.output, args.manifest)
+    stats = view.build(dates, full=args.full)
+    print(f"读取源文件 {stats['read']} 个，改动目录 {stats['buckets']} 个，写入 {stats['written']} 个文件，"
+          f"删除 {stats['deleted']} 个，用时 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from array import array
+from collections import defaultdict
+
+from archive import ARCHIVE_DIR, OUTPUT_DIR, iter_article_files, parse_article_text, read_article
+from search import fold_text
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIGNATURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dedup_signatures.db')
+MAPPING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dedup_map.json')
+
+# 字符 shingle 的长度
+SHINGLE_SIZE = 5
+
+# MinHash 签名长度（桶数）及 LSH 分段：16 段 × 8 行，
+# 相似度 0.8 的两篇至少有一段完全相同的概率约 0.97，相似度 0.5 时约 0.06
+NUM_BINS = 128
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+
+# 估计的 Jaccard 相似度不低于该值时视为近似重复
+THRESHOLD = 0.8
+
+EMPTY = 0xFFFFFFFF
+GOLDEN = 0x9E3779B1
+
+
+def normalize(text):
+    """统一写法（全角/半角、大小写、繁简）并去掉全部空白，使排版不同的副本得到相同的 shingle"""
+    return ''.join(fold_text(text).split())
+
+
+def minhash(text, k=SHINGLE_SIZE):
+    """
+    计算文本的 MinHash 签名（单次哈希 + 分桶，one permutation hashing）
+
+    每个 k 字 shingle 只计算一次 crc32，按哈希值的高 7 位分到 NUM_BINS 个桶，
+    每个桶保留最小值。空桶取右侧最近的非空桶的值（旋转补齐），保证短文本的
+    签名也可以逐位比较。两个签名相同位置的值相等的比例即 Jaccard 相似度的估计。
+
+    Args:
+        text: normalize() 之后的文本
+        k: shingle 长度（字符数）
+
+    Returns:
+        array: NUM_BINS 个 32 位整数；文本短于 k 时为 None
+    """
+    if len(text) < k:
+        return None
+    # UTF-32 编码下每个字符 4 字节，字符 shingle 就是定长的字节切片
+    data = text.encode('utf-32-le')
+    width = 4 * k
+    hashes = {zlib.crc32(data[i:i + width]) for i in range(0, len(data) - width + 1, 4)}
+    shift = 32 - (NUM_BINS.bit_length() - 1)
+    mask = (1 << shift) - 1
+    mins = [EMPTY] * NUM_BINS
+    for h in hashes:
+        h = (h * GOLDEN) & 0xFFFFFFFF
+        b = h >> shift
+        v = h & mask
+        if v < mins[b]:
+            mins[b] = v
+    if EMPTY in mins:
+        filled = list(mins)
+        for i in range(NUM_BINS):
+            if mins[i] == EMPTY:
+                for step in range(1, NUM_BINS):
+                    value = mins[(i + step) % NUM_BINS]
+                    if value != EMPTY:
+                        # 高位记下借用的距离，与该桶自己的值（高位为 0）区分开
+                        filled[i] = (step << shift) | value
+                        break
+        mins = filled
+    return array('I', mins)
+
+
+def similarity(a, b):
+    """两个签名估计的 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+class SignatureCache:
+    """
+    签名缓存（SQLite），按文件修改时间和大小判断是否需要重新计算
+
+    语料增长时只为新增或改动的文件计算签名。
+    """
+
+    def __init__(self, path=SIGNATURE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS signatures (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                signature BLOB
+            );
+        """)
+        self.rows = {row[0]: row[1:] for row in self.conn.execute(
+            "SELECT path, mtime, size, digest, length, signature FROM signatures")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get(self, path, st):
+        """缓存中的 (摘要, 正文长度, 签名)；文件已改动或不在缓存中时为 None"""
+        row = self.rows.get(path)
+        if row is None or row[0] != st.st_mtime or row[1] != st.st_size:
+            return None
+        signature = array('I', row[4]) if row[4] is not None else None
+        return row[2], row[3], signature
+
+    def put(self, path, st, digest, length, signature):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO signatures (path, mtime, size, digest, length, signature) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, st.st_mtime, st.st_size, digest, length, signature.tobytes() if signature is not None else None))
+
+    def prune(self, seen):
+        """删除已不存在的文件的记录"""
+        gone = [path for path in self.rows if path not in seen]
+        self.conn.executemany("DELETE FROM signatures WHERE path = ?", ((path,) for path in gone))
+        return len(gone)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class Document:
+    __slots__ = ('path', 'digest', 'length', 'signature')
+
+    def __init__(self, path, digest, length, signature):
+        self.path = path
+        self.digest = digest
+        self.length = length
+        self.signature = signature
+
+
+def fingerprint(path):
+    """读取文件正文，返回 (规范化正文的 SHA-1, 规范化正文长度, MinHash 签名)"""
+    text = normalize(read_article(path)['content'])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest(), len(text), minhash(text)
+
+
+def load_documents(roots, cache=None):
+    """遍历目录，计算（或从缓存读取）每个文件的指纹；返回 (文档列表, 重新计算的文件数)"""
+    documents = []
+    computed = 0
+    seen = set()
+    for root in roots:
+        for path in iter_article_files(root):
+            path = os.path.abspath(path)
+            seen.add(path)
+            st = os.stat(path)
+            cached = cache.get(path, st) if cache else None
+            if cached is None:
+                cached = fingerprint(path)
+                computed += 1
+                if cache:
+                    cache.put(path, st, *cached)
+            documents.append(Document(path, *cached))
+    if cache:
+        cache.prune(seen)
+    return documents, computed
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+
+
+def canonical_key(document):
+    """选择每组的保留文件：优先 SinyaleeBlogs 中的编号文件，其次正文最长的，再按路径"""
+    in_archive = os.path.abspath(document.path).startswith(os.path.abspath(ARCHIVE_DIR) + os.sep)
+    return not in_archive, -document.length, document.path
+
+
+def find_duplicates(documents, threshold=THRESHOLD):
+    """
+    把近似重复的文件分组（正文为空的文件不参与分组）
+
+    1. 规范化正文（繁简折叠、去掉空白）相同的文件按摘要直接归为一组，每组只取一个代表参与后续步骤；
+    2. LSH：签名分为 BANDS 段，任一段完全相同的文件落入同一个桶，只在桶内比较，
+       不做两两比较；
+    3. 桶内两两比较尚未在同一组的文件（桶都很小），估计相似度不低于 threshold 的
+       归为一组（并查集合并）。
+
+    Returns:
+        list: 每组为 (保留文件, [(重复文件, 相似度, 规范化正文是否相同), ...])，只含有重复的组
+    """
+    uf = UnionFind(len(documents))
+    representatives = {}
+    for i, document in enumerate(documents):
+        if not document.length:
+            # 空正文彼此“相同”，但不是重复的文章
+            continue
+        first = representatives.setdefault(document.digest, i)
+        if first != i:
+            uf.union(first, i)
+
+    buckets = defaultdict(list)
+    for i in representatives.values():
+        signature = documents[i].signature
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            buckets[(band, signature[band * ROWS:(band + 1) * ROWS].tobytes())].append(i)
+    for members in buckets.values():
+        for n, i in enumerate(members):
+            signature = documents[i].signature
+            for j in members[n + 1:]:
+                if uf.find(i) != uf.find(j) and similarity(signature, documents[j].signature) >= threshold:
+                    uf.union(i, j)
+
+    groups = defaultdict(list)
+    for i in range(len(documents)):
+        groups[uf.find(i)].append(documents[i])
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=canonical_key)
+        canonical = members[0]
+        duplicates = []
+        for document in members[1:]:
+            exact = document.digest == canonical.digest
+            if exact:
+                score = 1.0
+            elif document.signature is not None and canonical.signature is not None:
+                score = similarity(canonical.signature, document.signature)
+            else:
+                score = 0.0
+            duplicates.append((document, score, exact))
+        clusters.append((canonical, duplicates))
+    clusters.sort(key=lambda c: c[0].path)
+    return clusters
+
+
+def relative(path):
+    return os.path.relpath(path, ROOT_DIR)
+
+
+def write_mapping(clusters, path=MAPPING_FILE, threshold=THRESHOLD):
+    """保存重复文件 -> 保留文件的对应表（路径相对于仓库根目录）"""
+    data = {
+        'threshold': threshold,
+        'mapping': {relative(d.path): relative(canonical.path)
+                    for canonical, duplicates in clusters for d, _, _ in duplicates},
+        'clusters': [{
+            'canonical': relative(canonical.path),
+            'duplicates': [{'path': relative(d.path), 'similarity': round(score, 3), 'exact': exact}
+                           for d, score, exact in duplicates],
+        } for canonical, duplicates in clusters],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def replace_with_link(duplicate, canonical, symbolic=False):
+    """
+    用指向 canonical 的链接替换 duplicate（先建临时链接再 os.replace，中断时不会丢文件）
+
+    Returns:
+        bool: 是否做了替换（已经是同一个文件时为 False）
+    """
+    if os.path.samefile(duplicate, canonical):
+        return False
+    tmp = duplicate + '.dedup-tmp'
+    if symbolic:
+        os.symlink(os.path.relpath(canonical, os.path.dirname(duplicate)), tmp)
+    else:
+        os.link(canonical, tmp)
+    os.replace(tmp, duplicate)
+    return True
+
+
+def raw_body(path):
+    """文件的正文（分隔线之后），不做任何规范化，换行符也保持原样"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return parse_article_text(f.read())['content']
+
+
+def link_duplicates(clusters, symbolic=False):
+    """
+    把正文与保留文件逐字节相同的重复文件替换为链接
+
+    规范化正文相同（繁简或空白不同）和近似重复的文件只在对应表中报告，不替换。
+
+    Returns:
+        tuple: (替换的文件数, 规范化正文相同但原文不同、没有替换的文件数)
+    """
+    replaced = skipped = 0
+    for canonical, duplicates in clusters:
+        body = None
+        for document, score, exact in duplicates:
+            if not exact:
+                continue
+            if body is None:
+                body = raw_body(canonical.path)
+            if raw_body(document.path) != body:
+                skipped += 1
+            elif replace_with_link(document.path, canonical.path, symbolic):
+                replaced += 1
+    return replaced, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查找归档中近似重复的文章（MinHash + LSH）")
+    parser.add_argument('roots', nargs='*', help="要检查的目录，默认 SinyaleeBlogs 和 输出结果")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="视为重复的最低相似度")
+    parser.add_argument('--output', default=MAPPING_FILE, help="重复文件对应表（JSON）")
+    parser.add_argument('--cache', default=SIGNATURE_FILE, help="签名缓存文件")
+    parser.add_argument('--no-cache', action='store_true', help="不使用签名缓存")
+    parser.add_argument('--link', choices=['hard', 'symbolic'],
+                        help="把正文与保留文件逐字节相同的重复文件替换为指向保留文件的硬链接/符号链接"
+                             "（注意文件头也会变成保留文件的）")
+    args = parser.parse_args()
+
+    roots = args.roots or [ARCHIVE_DIR, OUTPUT_DIR]
+    start = time.perf_counter()
+    if args.no_cache:
+        documents, computed = load_documents(roots)
+    else:
+        with SignatureCache(args.cache) as cache:
+            documents, computed = load_documents(roots, cache)
+    loaded = time.perf_counter()
+    clusters = find_duplicates(documents, args.threshold)
+    elapsed = time.perf_counter() - loaded
+
+    duplicate_count = sum(len(duplicates) for _, duplicates in clusters)
+    exact_count = sum(exact for _, duplicates in clusters for _, _, exact in duplicates)
+    print(f"文件 {len(documents)} 个（重新计算签名 {computed} 个，{loaded - start:.2f} s），分组 {elapsed:.2f} s")
+    print(f"重复组 {len(clusters)} 个，重复文件 {duplicate_count} 个（规范化正文相同 {exact_count} 个，"
+          f"近似重复 {duplicate_count - exact_count} 个）")
+    write_mapping(clusters, args.output, args.threshold)
+    print(f"对应表已保存到 '{args.output}'")
+    if args.link:
+        replaced, skipped = link_duplicates(clusters, args.link == 'symbolic')
+        print(f"已把 {replaced} 个重复文件替换为{'符号' if args.link == 'symbolic' else '硬'}链接"
+              f"（规范化正文相同但原文不同、未替换 {skipped} 个）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+# 值得重试的状态码（None 表示连接失败、超时等没有响应的情况）；其他 4xx 重试也不会成功
+RETRYABLE_STATUS = {None, 408, 425, 429}
+
+
+class TokenBucket:
+    """令牌桶限速器：每秒补充 rate 个令牌，最多积攒 capacity 个（允许的突发请求数）"""
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """预订一个令牌，返回拿到令牌前需要等待的秒数
+
+        令牌数允许变为负数，等待者按预订顺序依次放行，不会互相抢占。
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌，返回实际等待的秒数"""
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+class HostRateLimiter:
+    """按主机划分的令牌桶，保证对同一主机的请求频率不超过 rate 次/秒"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url):
+        return self.bucket(url).acquire()
+
+
+class ConcurrentFetcher:
+    """线程池抓取器：最多 workers 个请求同时进行，并按主机令牌桶限速
+
+    用法：
+        with ConcurrentFetcher(fetch, workers=8, rate=4) as fetcher:
+            fetcher.submit(url)
+            for url, result in fetcher.completed():
+                ...
+    """
+
+    def __init__(self, fetch, workers=4, rate=2.0, burst=None):
+        self.fetch = fetch
+        self.workers = workers
+        self.limiter = HostRateLimiter(rate, burst or workers)
+        self.executor = None
+        self.pending = {}
+
+    def __enter__(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 异常退出时不再等待排队中的请求
+        self.executor.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+        self.executor = None
+        self.pending = {}
+
+    def _run(self, url):
+        self.limiter.acquire(url)
+        return self.fetch(url)
+
+    def has_capacity(self):
+        """是否还能提交新请求（在途请求数小于 workers）"""
+        return len(self.pending) < self.workers
+
+    def submit(self, url):
+        future = self.executor.submit(self._run, url)
+        self.pending[future] = url
+
+    def completed(self, timeout=None):
+        """等待至少一个请求完成（最多 timeout 秒），依次产出 (url, 结果)；抓取函数抛出异常时结果为 None"""
+        if not self.pending:
+            return
+        done, _ = wait(list(self.pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        yield from self.collect(done)
+
+    def collect(self, done):
+        """从 done（可以混有其他 Future）中取出本抓取器已完成的请求，依次产出 (url, 结果)"""
+        for future in done:
+            url = self.pending.pop(future, None)
+            if url is None:
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  抓取线程出错 {url}: {e}")
+                result = None
+            yield url, result
+
+
+class AdaptiveLimiter:
+    """
+    自适应的并发数和请求间隔（加性增、乘性减）
+
+    服务器响应正常且延迟不高于基准的 latency_factor 倍时，每个成功的请求使请求
+    间隔缩短到 0.8 倍，每成功 limit 个请求并发数加一；遇到 429/5xx、连接错误或
+    延迟明显升高时，并发数减半、请求间隔加倍（至少 min_backoff 秒），并遵守
+    Retry-After。同一批在途请求的多次限流只减速一次。收到 429 时把当时的并发数
+    减一记为上限，之后超过它需要成功 probe_every 倍的请求才再试探加一，避免
+    反复撞到服务器的并发限制。
+
+    Args:
+        max_concurrency: 并发数上限
+        initial_interval: 初始请求间隔（秒）
+        min_interval: 请求间隔下限
+        max_interval: 请求间隔上限
+        latency_factor: 延迟超过基准多少倍视为服务器变慢
+        min_backoff: 减速后请求间隔的最小值（秒）
+        probe_every: 超过上次被限流的并发数时，增长放慢的倍数
+    """
+
+    def __init__(self, max_concurrency=8, initial_interval=1.0, min_interval=0.0, max_interval=120.0,
+                 latency_factor=3.0, min_backoff=0.05, probe_every=10):
+        self.max_concurrency = max_concurrency
+        self.limit = min(2, max_concurrency)
+        self.interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.latency_factor = latency_factor
+        self.min_backoff = min_backoff
+        self.probe_every = probe_every
+        self.ceiling = max_concurrency
+        self.last_backoff = 0.0
+        self.baseline = None
+        self.successes = 0
+        self.throttled = 0
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait_turn(self):
+        """等到下一个允许发出请求的时刻（按请求间隔依次排队）"""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def on_success(self, latency):
+        with self.lock:
+            if self.baseline is not None and latency > self.baseline * self.latency_factor:
+                self.back_off()
+                return
+            self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+            self.successes += 1
+            self.interval = max(self.min_interval, self.interval * 0.8)
+            # 间隔已经很小时直接降到下限
+            if self.interval < 0.01:
+                self.interval = self.min_interval
+            needed = self.limit if self.limit < self.ceiling else self.limit * self.probe_every
+            if self.successes >= needed:
+                self.successes = 0
+                self.limit = min(self.max_concurrency, self.limit + 1)
+
+    def on_throttle(self, retry_after=None, rate_limited=False):
+        """
+        记录一次限流或服务器错误
+
+        Args:
+            retry_after: 服务器要求等待的秒数
+            rate_limited: 是否为 429（明确超过了服务器允许的并发/频率）
+        """
+        with self.lock:
+            self.throttled += 1
+            if rate_limited:
+                self.ceiling = min(self.ceiling, max(1, self.limit - 1))
+            self.back_off()
+            if retry_after:
+                self.next_start = max(self.next_start, time.monotonic() + retry_after)
+
+    def back_off(self):
+        """并发数减半、请求间隔加倍（调用方持有锁）"""
+        now = time.monotonic()
+        self.successes = 0
+        if now - self.last_backoff < (self.baseline or 0.0) + self.interval:
+            # 同一批在途请求的限流已经处理过
+            return
+        self.last_backoff = now
+        self.limit = max(1, self.limit // 2)
+        self.interval = min(self.max_interval, max(self.interval * 2, self.min_backoff))
+
+
+class RetryScheduler:
+    """
+    不阻塞的重试调度：失败的请求按退避时间放入延迟队列，到期后再取出重试
+
+    爬虫在等待期间继续抓取其他URL，不会因为一个出错的页面停下来。两个爬虫共用：
+
+    - record_failure() 记录一次失败。可以重试时（连接失败、超时、408/425/429、5xx，
+      且未超过 max_retries 次）按 base_delay * 2^(n-1) 加随机抖动安排重试，服务器给出
+      Retry-After 时不早于该时间；否则记入死信列表。
+    - 熔断器：同一主机连续失败 failure_threshold 次后暂停该主机 cooldown 秒，期间到期的
+      重试和新的URL都推迟到恢复之后（defer）；恢复后再失败一次就立即重新暂停，成功
+      一次则恢复正常。
+    - pop_due() 取出已到期且主机未暂停的条目；time_to_next() 为距离下一个到期的秒数，
+      供抓取循环决定等待多久。
+    - 结束时 abandon_pending() 把未完成的重试记入死信，write_dead_letters() 写出 JSONL。
+
+    条目用 key 区分（默认就是URL），item 为到期时交还给调用方的对象（默认也是URL）。
+    多个线程可以同时使用。
+
+    Args:
+        max_retries: 每个条目最多重试的次数
+        base_delay: 第一次重试前的等待（秒）
+        max_delay: 退避等待的上限（秒）
+        failure_threshold: 主机连续失败多少次后熔断
+        cooldown: 熔断后暂停的秒数
+    """
+
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=60.0, failure_threshold=5, cooldown=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.queue = []  # (到期时间, 序号, key)
+        self.scheduled = {}  # key -> (到期时间, URL, item)
+        self.attempts = {}
+        self.host_failures = {}
+        self.host_paused_until = {}
+        self.dead_letters = []
+        self.stats = {'retried': 0, 'dead': 0, 'circuit_opened': 0}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.scheduled)
+
+    def host(self, url):
+        return urlparse(url).netloc
+
+    def paused_until(self, url):
+        """主机熔断时返回恢复的时刻，否则返回 None"""
+        with self.lock:
+            until = self.host_paused_until.get(self.host(url))
+        return until if until and until > time.monotonic() else None
+
+    def backoff(self, attempt):
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) + random.uniform(0, self.base_delay)
+
+    def push(self, key, deadline, url, item):
+        """放入延迟队列（调用方持有锁）"""
+        self.scheduled[key] = (deadline, url, item)
+        heapq.heappush(self.queue, (deadline, next(self.counter), key))
+
+    def record_failure(self, url, error, status=None, retry_after=None, key=None, item=None):
+        """
+        记录一次失败
+
+        Args:
+            url: 请求地址
+            error: 错误说明
+            status: HTTP 状态码，没有响应时为 None
+            retry_after: 服务器要求等待的秒数
+            key/item: 见类说明，默认为 url
+
+        Returns:
+            float: 已安排重试时为等待的秒数；不再重试（已记入死信）时为 None
+        """
+        key = url if key is None else key
+        item = url if item is None else item
+        retryable = status in RETRYABLE_STATUS or (status is not None and status >= 500)
+        now = time.monotonic()
+        with self.lock:
+            attempt = self.attempts.get(key, 0) + 1
+            self.attempts[key] = attempt
+            host = self.host(url)
+            if retryable:
+                failures = self.host_failures.get(host, 0) + 1
+                self.host_failures[host] = failures
+                if failures >= self.failure_threshold and self.host_paused_until.get(host, 0) <= now:
+                    self.host_paused_until[host] = now + self.cooldown
+                    self.stats['circuit_opened'] += 1
+            if not retryable or attempt > self.max_retries:
+                self.dead_letters.append({'url': url, 'key': key, 'attempts': attempt, 'status': status,
+                                          'error': str(error), 'time': time.strftime('%Y-%m-%d %H:%M:%S')})
+                self.stats['dead'] += 1
+                return None
+            delay = max(self.backoff(attempt), retry_after or 0.0)
+            self.push(key, now + delay, url, item)
+            self.stats['retried'] += 1
+            return delay
+
+    def record_success(self, url, key=None):
+        """请求成功：该主机的连续失败数清零，熔断解除"""
+        host = self.host(url)
+        with self.lock:
+            self.attempts.pop(url if key is None else key, None)
+            self.host_failures.pop(host, None)
+            self.host_paused_until.pop(host, None)
+
+    def defer(self, url, key=None, item=None):
+        """主机熔断期间取到的URL推迟到恢复之后（不计入重试次数）"""
+        key = url if key is None else key
+        item = url if item is None else item
+        with self.lock:
+            until = max(self.host_paused_until.get(self.host(url), 0), time.monotonic())
+            self.push(key, until, url, item)
+
+    def is_scheduled(self, key):
+        with self.lock:
+            return key in self.scheduled
+
+    def pop_due(self):
+        """取出已到期的条目（主机熔断中的推迟到恢复时刻），返回 item 列表"""
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                deadline, _, key = heapq.heappop(self.queue)
+                entry = self.scheduled.get(key)
+                if entry is None or entry[0] != deadline:
+                    continue  # 已被取走或重新安排
+                _, url, item = entry
+                paused_until = self.host_paused_until.get(self.host(url), 0)
+                if paused_until > now:
+                    self.push(key, paused_until, url, item)
+                    continue
+                del self.scheduled[key]
+                due.append(item)
+        return due
+
+    def time_to_next(self):
+        """距离下一个条目到期的秒数（已到期为 0），队列为空时为 None"""
+        with self.lock:
+            while self.queue and self.scheduled.get(self.queue[0][2], (None,))[0] != self.queue[0][0]:
+                heapq.heappop(self.queue)
+            if not self.queue:
+                return None
+            return max(0.0, self.queue[0][0] - time.monotonic())
+
+    def sleep_until_next(self):
+        """没有其他事可做时调用：等到下一个条目到期"""
+        wait_time = self.time_to_next()
+        if wait_time:
+            time.sleep(wait_time)
+
+    def wait_for(self, key):
+        """单独处理某个条目时（不经过抓取循环）：等到它到期并从队列中取出"""
+        with self.lock:
+            entry = self.scheduled.get(key)
+        if entry is None:
+            return
+        deadline, url, item = entry
+        paused_until = self.paused_until(url) or 0
+        wait_time = max(deadline, paused_until) - time.monotonic()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        with self.lock:
+            self.scheduled.pop(key, None)
+
+    def abandon_pending(self, reason="未完成重试"):
+        """把队列中还没重试的条目全部记入死信（抓取提前结束时调用）"""
+        with self.lock:
+            for key, (deadline, url, item) in self.scheduled.items():
+                self.dead_letters.append({'url': url, 'key': key, 'attempts': self.attempts.get(key, 0),
+                                          'status': None, 'error': reason,
+                                          'time': time.strftime('%Y-%m-%d %H:%M:%S')})
+                self.stats['dead'] += 1
+            self.scheduled.clear()
+            self.queue.clear()
+
+    def write_dead_letters(self, path):
+        """死信列表写入 JSONL 文件（每行一个最终失败的条目），返回条目数"""
+        with self.lock:
+            letters = list(self.dead_letters)
+        with open(path, 'w', encoding='utf-8') as f:
+            for letter in letters:
+                f.write(json.dumps(letter, ensure_ascii=False) + "\n")
+        return len(letters)
+
+    def stats_line(self):
+        """统计信息，例如 "重试: 安排重试 12, 死信 1, 熔断 0" """
+        return (f"重试: 安排重试 {self.stats['retried']}, 死信 {self.stats['dead']}, "
+                f"熔断 {self.stats['circuit_opened']}")
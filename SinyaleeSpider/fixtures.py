@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 不保存的响应头：正文已由 requests 解压，长度和分块方式由回放服务器重新决定
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive',
+                   'set-cookie', 'etag', 'last-modified', 'date', 'server'}
+
+# 回放时原样发送的响应头（Content-Type、ETag 由回放服务器另行发送）
+REPLAYED_HEADERS = ('Location', 'Retry-After', 'X-WP-Total', 'X-WP-TotalPages')
+
+# 回放时把录制站点的地址替换为回放服务器地址的响应类型
+TEXT_TYPES = ('html', 'xml', 'json', 'text')
+
+
+def request_path(url):
+    """URL 的路径加查询串，作为录制文件中的键，例如 "/blog/?p=1032" """
+    parts = urlsplit(url)
+    return (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class FixtureRecorder:
+    """
+    录制模式：把爬取过程中的每个请求和响应保存到录制文件（SQLite）
+
+    作为 requests 的响应钩子使用（Transport 的 record_file 参数会自动挂上），
+    保存的是解压后的正文和状态码、响应头、耗时。同一路径录到多次时保留最后一次，
+    但已有成功的响应时不会被之后的错误响应（限流、503 等）覆盖。
+    304 响应没有正文，不保存。回放只按路径区分，录制时应只抓取一个站点。
+
+    Args:
+        path: 录制文件路径，已存在时追加
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS exchanges (
+                path TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                elapsed REAL NOT NULL,
+                recorded REAL NOT NULL
+            )""")
+        self.conn.commit()
+        self.count = 0
+
+    def attach(self, session):
+        """挂到 requests.Session 的响应钩子上，返回自身"""
+        session.hooks['response'].append(self.on_response)
+        return self
+
+    def on_response(self, response, *args, **kwargs):
+        if response.status_code == 304:
+            return
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in SKIPPED_HEADERS}
+        row = (request_path(response.url), response.url, response.status_code,
+               json.dumps(headers, ensure_ascii=False), response.content or b'',
+               response.elapsed.total_seconds(), time.time())
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO exchanges (path, url, status, headers, body, elapsed, recorded)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    url = excluded.url, status = excluded.status, headers = excluded.headers,
+                    body = excluded.body, elapsed = excluded.elapsed, recorded = excluded.recorded
+                WHERE excluded.status < 400 OR exchanges.status >= 400""", row)
+            self.conn.commit()
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def read_fixture(path):
+    """逐条产出录制文件中的 (路径, URL, 状态码, 响应头, 正文, 录制时的耗时)"""
+    conn = sqlite3.connect(path)
+    try:
+        for path_, url, status, headers, body, elapsed in conn.execute(
+                "SELECT path, url, status, headers, body, elapsed FROM exchanges ORDER BY recorded"):
+            yield path_, url, status, json.loads(headers), body, elapsed
+    finally:
+        conn.close()
+
+
+class FixtureSite:
+    """
+    回放录制文件的站点，与 stubserver.StubSite 接口相同，可直接交给 stubserver.serve()
+
+    serve() 设置 base_url 后，页面、站点地图和 JSON 中录制站点的地址（http/https 两种
+    形式，以及 JSON 中转义为 "\\/" 的形式）替换为回放服务器的地址，爬虫不会跟着链接
+    访问真实站点。延迟、带宽和错误率由回放服务器（serve 的参数）注入。
+
+    Args:
+        path: FixtureRecorder 录制的文件
+    """
+
+    def __init__(self, path):
+        self.pages = {}
+        self.origins = set()
+        for path_, url, status, headers, body, elapsed in read_fixture(path):
+            content_type = headers.pop('Content-Type', 'application/octet-stream')
+            headers = {name: headers[name] for name in REPLAYED_HEADERS if name in headers}
+            self.pages[path_] = (status, content_type, body, headers)
+            self.origins.add(origin_of(url))
+        self.replacements = []
+        self._base_url = None
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, base_url):
+        self._base_url = base_url
+        new = origin_of(base_url)
+        self.replacements = []
+        for origin in self.origins:
+            host = origin.split('://', 1)[1]
+            for scheme in ('https', 'http'):
+                old = f"{scheme}://{host}"
+                if old != new:
+                    self.replacements.append((old.encode('utf-8'), new.encode('utf-8')))
+                    self.replacements.append((old.replace('/', '\\/').encode('utf-8'),
+                                              new.replace('/', '\\/').encode('utf-8')))
+
+    def article_paths(self):
+        """录制到的文章页路径（?p=，状态 200）"""
+        return [p for p, (status, content_type, body, headers) in self.pages.items()
+                if status == 200 and '?p=' in p and 'html' in content_type]
+
+    def rewrite(self, data):
+        for old, new in self.replacements:
+            data = data.replace(old, new)
+        return data
+
+    def lookup(self, path):
+        """按请求路径返回录制的响应 (状态码, Content-Type, 正文, 额外的响应头)，没有录到时返回 None"""
+        page = self.pages.get(path)
+        if page is None:
+            return None
+        status, content_type, body, headers = page
+        if any(t in content_type for t in TEXT_TYPES):
+            body = self.rewrite(body)
+        if 'Location' in headers:
+            headers = dict(headers, Location=self.rewrite(headers['Location'].encode('utf-8')).decode('utf-8'))
+        return status, content_type, body, headers
@@ -0,0 +1,81 @@
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+
+
+def normalize_url(url):
+    """
+    把URL规范化为去重用的键
+
+    http/https 视为同一地址，主机名小写并去掉默认端口，去掉锚点和路径末尾的斜杠，
+    查询参数按名称排序，例如 "http://SinyaLee.com/blog/?paged=2&cat=8#top"
+    与 "https://sinyalee.com/blog?cat=8&paged=2" 得到相同的键。
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if scheme in DEFAULT_PORTS and netloc.endswith(DEFAULT_PORTS[scheme]):
+        netloc = netloc[:-len(DEFAULT_PORTS[scheme])]
+    if scheme == 'http':
+        scheme = 'https'
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def article_first(url):
+    """优先级函数：文章页（?p=）排在分类、翻页等列表页之前"""
+    query = urlsplit(url).query
+    return 0 if any(name == 'p' for name, _ in parse_qsl(query)) else 1
+
+
+class Frontier:
+    """
+    待爬取URL队列
+
+    入队、出队和查重都是 O(1)：每个优先级一个 deque，另用一个集合记录
+    所有见过的（已入队或已访问的）规范化URL。出队时返回首次入队时的原始URL。
+
+    Args:
+        priority: 可选，url -> 优先级（0 最高）的函数，例如 article_first；
+                  不指定时按先进先出（广度优先）顺序
+        levels: 优先级数量
+    """
+
+    def __init__(self, urls=(), priority=None, levels=2):
+        self.priority = priority
+        self.queues = [deque() for _ in range(levels if priority else 1)]
+        self.seen = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        """URL 未见过则入队并返回 True，否则返回 False"""
+        key = normalize_url(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        level = min(self.priority(url), len(self.queues) - 1) if self.priority else 0
+        self.queues[level].append(url)
+        return True
+
+    def mark_seen(self, url):
+        """记录一个已访问的URL，之后不会再入队"""
+        self.seen.add(normalize_url(url))
+
+    def pop(self):
+        """取出优先级最高的下一个URL，队列为空时抛出 IndexError"""
+        for queue in self.queues:
+            if queue:
+                return queue.popleft()
+        raise IndexError("frontier is empty")
+
+    def __contains__(self, url):
+        return normalize_url(url) in self.seen
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def __bool__(self):
+        return any(self.queues)
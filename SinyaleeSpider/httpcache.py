@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from frontier import normalize_url
+
+# 随响应正文一起保存的响应头
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HTTPCache:
+    """
+    磁盘HTTP缓存（SQLite），支持条件请求
+
+    按规范化URL保存响应正文和校验信息（ETag / Last-Modified）。再次请求同一URL时
+    带上 If-None-Match / If-Modified-Since，服务器返回 304 则直接使用缓存的正文。
+    缓存总大小超过 max_bytes 时按最近使用时间淘汰（LRU）。可在多个线程中共用。
+
+    Args:
+        path: 缓存数据库文件路径
+        max_bytes: 缓存正文总大小上限
+        fresh_for: 缓存在多少秒内视为新鲜，直接使用而不发请求（默认 0，总是向服务器确认）
+    """
+
+    def __init__(self, path, max_bytes=200 * 1024 * 1024, fresh_for=0):
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self.total_size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {'hit': 0, 'revalidated': 0, 'changed': 0, 'failed': 0, 'miss': 0}
+
+    def lookup(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT headers, body, stored FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {'headers': json.loads(row[0]), 'body': row[1], 'stored': row[2]}
+
+    def store(self, key, url, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        if 'ETag' not in headers and 'Last-Modified' not in headers and not self.fresh_for:
+            # 没有校验信息，以后无法用条件请求确认，不值得缓存
+            return
+        body = response.content
+        now = time.time()
+        with self.lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, headers, body, size, stored, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(headers), body, len(body), now, now))
+            self.total_size += len(body) - (old[0] if old else 0)
+            self.evict()
+
+    def touch(self, key, response):
+        """304 时刷新使用时间，并更新服务器返回的新校验信息"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT headers FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            headers = json.loads(row[0])
+            for name in ('ETag', 'Last-Modified'):
+                if name in response.headers:
+                    headers[name] = response.headers[name]
+            now = time.time()
+            self.conn.execute(
+                "UPDATE responses SET headers = ?, stored = ?, last_used = ? WHERE key = ?",
+                (json.dumps(headers), now, now, key))
+
+    def mark_used(self, key):
+        """新鲜期内直接使用缓存时刷新使用时间（LRU 淘汰依据）"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def evict(self):
+        """按最近使用时间从旧到新删除，直到总大小不超过上限（调用方持有锁）"""
+        while self.total_size > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 32").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_size -= size
+                if self.total_size <= self.max_bytes:
+                    break
+
+    def cached_response(self, url, entry):
+        """用缓存内容构造一个与真实请求结果用法相同的 Response"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response.from_cache = True
+        return response
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get(self, session, url, **kwargs):
+        """
+        通过缓存发起GET请求
+
+        Args:
+            session: requests.Session
+            url: 请求地址
+            **kwargs: 传给 session.get 的其他参数（如 timeout）
+
+        Returns:
+            requests.Response: 服务器返回 304 时为由缓存构造的 200 响应
+        """
+        key = normalize_url(url)
+        entry = self.lookup(key)
+        if entry is None:
+            response = session.get(url, **kwargs)
+            if response.status_code == 200:
+                self.store(key, url, response)
+            self.count('miss')
+            return response
+
+        if self.fresh_for and time.time() - entry['stored'] < self.fresh_for:
+            self.mark_used(key)
+            self.count('hit')
+            return self.cached_response(url, entry)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if 'ETag' in entry['headers']:
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if 'Last-Modified' in entry['headers']:
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304:
+            self.touch(key, response)
+            self.count('revalidated')
+            return self.cached_response(url, entry)
+        if response.status_code == 200:
+            self.store(key, url, response)
+            self.count('changed')
+        else:
+            # 404、5xx 等：既不是内容变化，缓存也保持不变
+            self.count('failed')
+        return response
+
+    def stats_line(self):
+        """统计信息，例如 "HTTP缓存: 命中 0, 304重新验证 380, 内容已变 2, 重新验证出错 1, 未命中 10" """
+        s = self.stats
+        return (f"HTTP缓存: 命中 {s['hit']}, 304重新验证 {s['revalidated']}, "
+                f"内容已变 {s['changed']}, 重新验证出错 {s['failed']}, 未命中 {s['miss']}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
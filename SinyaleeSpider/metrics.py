@@ -0,0 +1,282 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 耗时直方图的桶上限（秒）
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 各指标的说明，用于 Prometheus 的 HELP 行
+DESCRIPTIONS = {
+    'fetch_seconds': "一次请求的耗时（每次重试单独计，不含等待重试的时间）",
+    'connect_seconds': "新建连接耗时（DNS 解析 + TCP 连接）",
+    'tls_seconds': "TLS 握手耗时",
+    'ttfb_seconds': "发出请求到收到响应头的耗时",
+    'body_seconds': "读取响应体的耗时",
+    'parse_seconds': "HTML 解析耗时",
+    'extract_seconds': "提取文章字段耗时",
+    'links_seconds': "提取链接耗时",
+    'clean_seconds': "文本清理耗时",
+    'write_seconds': "保存文件耗时",
+    'connections': "新建的连接数",
+    'responses': "收到的响应数",
+    'response_bytes': "响应体字节数（解压后）",
+    'retries': "重试次数",
+    'fetch_failures': "重试后仍失败的页面数",
+    'throttled': "限流/服务器错误次数",
+}
+
+
+class Timer:
+    """计时上下文：退出时把耗时记入直方图"""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class NullMetrics:
+    """关闭统计时使用：所有方法都不做任何事，计时只多一次空的 with"""
+
+    enabled = False
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def timer(self, name):
+        return NULL_TIMER
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Histogram:
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    爬取统计：计数器和耗时直方图
+
+    爬虫在各个阶段调用 timer()/observe()/inc() 记录数据；连接和响应的统计由
+    transport.Transport 记录（其适配器基于 InstrumentedAdapter，响应钩子为 on_response）。
+    结束时用 write() 导出为 JSON 或 Prometheus 文本格式，也可以用 serve() 在本地端口实时查看。
+
+    用法：
+        metrics = Metrics()
+        scraper = BlogScraper(metrics=metrics)
+        metrics.serve(9100)               # 可选：http://127.0.0.1:9100/metrics
+        ...
+        metrics.write("crawl_metrics.prom")
+
+    Args:
+        prefix: 导出时指标名的前缀
+    """
+
+    enabled = True
+
+    def __init__(self, prefix='sinyalee'):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def inc(self, name, value=1, **labels):
+        """计数器加 value；labels 用于细分，例如 inc('responses', status=200)"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name):
+        return Timer(self, name)
+
+    def on_response(self, response, *args, **kwargs):
+        self.observe('ttfb_seconds', response.elapsed.total_seconds())
+        # 响应钩子在读取响应体之前调用，这里读取并计时（之后 requests 直接使用已读取的内容）
+        start = time.perf_counter()
+        body = response.content or b''
+        self.observe('body_seconds', time.perf_counter() - start)
+        self.inc('response_bytes', len(body))
+        self.inc('responses', status=response.status_code)
+
+    def to_dict(self):
+        """所有指标，直方图给出计数、总和、平均值和各桶（不累计）的计数"""
+        with self.lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                if labels:
+                    counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+                else:
+                    counters[name] = value
+            histograms = {}
+            for name, h in sorted(self.histograms.items()):
+                histograms[name] = {
+                    'count': h.count,
+                    'sum': round(h.sum, 6),
+                    'avg': round(h.sum / h.count, 6) if h.count else 0.0,
+                    'buckets': {str(le): n for le, n in zip(h.buckets + ('+Inf',), h.counts) if n},
+                }
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        lines = []
+        with self.lock:
+            by_name = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in by_name.items():
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in series:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value}" if labels else f"{metric} {value}")
+            for name, h in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for le, n in zip(h.buckets + ('+Inf',), h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum {h.sum:.6f}")
+                lines.append(f"{metric}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """导出到文件：.json 结尾为 JSON，其他为 Prometheus 文本格式"""
+        if path.endswith('.json'):
+            text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        else:
+            text = self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """在后台线程提供 /metrics（Prometheus）和 /metrics.json，返回服务器"""
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        server.metrics = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.server = server
+        return server
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = self.server.metrics.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(self.server.metrics.to_dict(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TimedConnectionMixin:
+    """记录新建连接（DNS + TCP）和 TLS 握手的耗时
+
+    urllib3 在建立 TCP 连接的同一个调用里做 DNS 解析，所以两者合在 connect_seconds 中。
+    """
+
+    metrics = NULL_METRICS
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        self._tcp_seconds = time.perf_counter() - start
+        self.metrics.observe('connect_seconds', self._tcp_seconds)
+        self.metrics.inc('connections')
+        return sock
+
+    def connect(self):
+        self._tcp_seconds = 0.0
+        start = time.perf_counter()
+        super().connect()
+        if isinstance(self, HTTPSConnection):
+            self.metrics.observe('tls_seconds', time.perf_counter() - start - self._tcp_seconds)
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """连接池使用带计时的连接类的 HTTPAdapter"""
+
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def connection_class(self, base):
+        """连接池使用的连接类，子类可以在此基础上再加统计"""
+        return type(f'Timed{base.__name__}', (TimedConnectionMixin, base), {'metrics': self.metrics})
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        http_conn = self.connection_class(HTTPConnection)
+        https_conn = self.connection_class(HTTPSConnection)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_conn}),
+            'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_conn}),
+        }
@@ -0,0 +1,22 @@
+from bs4 import BeautifulSoup
+
+# 优先使用 C 实现的 lxml 解析器，没有安装时退回纯 Python 的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+def make_soup(html_content, parser=None):
+    """
+    解析HTML
+
+    Args:
+        html_content: HTML文本
+        parser: BeautifulSoup 解析器名称，默认为 HTML_PARSER
+
+    Returns:
+        BeautifulSoup: 解析结果
+    """
+    return BeautifulSoup(html_content, parser or HTML_PARSER)
@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+class StageStats:
+    """一个流水线阶段的统计：处理数量、累计耗时、队列当前和最大深度"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.depth = 0
+        self.max_depth = 0
+        self.lock = threading.Lock()
+
+    def add(self, elapsed, items=1):
+        with self.lock:
+            self.items += items
+            self.busy += elapsed
+
+    def set_depth(self, depth):
+        self.depth = depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def line(self, wall):
+        rate = self.items / wall if wall > 0 else 0.0
+        # 占用率：该阶段累计耗时占总时长的比例（多个工作线程/进程时可超过 100%）
+        load = self.busy / wall * 100 if wall > 0 else 0.0
+        return (f"{self.name:<6s} {self.items:6d} 项 {rate:8.1f} 项/秒  占用 {load:6.1f}%  "
+                f"队列 {self.depth:4d} (最大 {self.max_depth})")
+
+
+def timed_call(func, *args):
+    """在工作进程中执行 func，同时返回耗时"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class PagePipeline:
+    """
+    抓取 -> 解析 -> 写入 三段流水线
+
+    抓取由调用方的线程池完成，下载好的页面用 put() 放入原始页面队列；解析在
+    进程池中进行（BeautifulSoup 解析不受 GIL 限制）；需要保存的记录用 write()
+    放入记录队列，由一个写入线程成批写入磁盘。
+
+    两个队列都有上限：原始页面积压达到 raw_limit 时 full() 为 True，调用方应暂停
+    提交新的抓取；记录队列满时 write() 阻塞，直到写入线程跟上。这样内存中同时
+    存在的页面数有上限，慢的阶段会逐级让前面的阶段慢下来。
+
+    用法：
+        with PagePipeline(parse, write_batch, parse_workers=4) as pipeline:
+            pipeline.put(url, html)
+            done, _ = wait(fetch_futures + pipeline.futures(), return_when=FIRST_COMPLETED)
+            for url, result in pipeline.collect(done):
+                pipeline.write(url, record)
+            for url, ok in pipeline.written():
+                ...
+
+    Args:
+        parse: 解析函数 parse(key, html)，必须是模块级函数（要传给工作进程）
+        write_batch: 写入函数，参数为 [(key, record), ...]，返回每条记录的写入结果（列表），
+                     在写入线程中调用
+        parse_workers: 解析进程数
+        initializer/initargs: 解析进程的初始化函数及参数
+        raw_limit: 原始页面（排队和解析中）的最大数量
+        record_limit: 记录队列的最大长度
+        batch_size: 写入线程每批最多写入的记录数
+    """
+
+    def __init__(self, parse, write_batch, parse_workers=2, initializer=None, initargs=(),
+                 raw_limit=32, record_limit=64, batch_size=16):
+        self.parse = parse
+        self.write_batch = write_batch
+        self.parse_workers = parse_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.raw_limit = raw_limit
+        self.batch_size = batch_size
+        self.raw = deque()
+        self.parsing = {}
+        self.records = queue.Queue(maxsize=record_limit)
+        self.done = queue.SimpleQueue()
+        self.stats = {name: StageStats(name) for name in ('fetch', 'parse', 'write')}
+        self.executor = None
+        self.writer = None
+        self.error = None
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.executor = ProcessPoolExecutor(self.parse_workers, initializer=self.initializer,
+                                            initargs=self.initargs)
+        self.writer = threading.Thread(target=self.write_loop, name="pipeline-writer", daemon=True)
+        self.writer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
+
+    def timed(self, fetch):
+        """包装抓取函数，把下载耗时计入 fetch 阶段"""
+        def run(*args):
+            start = time.perf_counter()
+            try:
+                return fetch(*args)
+            finally:
+                self.stats['fetch'].add(time.perf_counter() - start)
+        return run
+
+    def full(self):
+        """原始页面积压是否已达上限（此时应暂停提交新的抓取）"""
+        return len(self.raw) + len(self.parsing) >= self.raw_limit
+
+    def busy(self):
+        """是否还有排队或解析中的页面"""
+        return bool(self.raw or self.parsing)
+
+    def put(self, key, html):
+        """放入一个下载好的页面"""
+        self.raw.append((key, html))
+        self.dispatch()
+
+    def dispatch(self):
+        # 进程池中只保留少量在途任务，其余页面留在原始页面队列里
+        while self.raw and len(self.parsing) < self.parse_workers * 2:
+            key, html = self.raw.popleft()
+            self.parsing[self.executor.submit(timed_call, self.parse, key, html)] = key
+        self.stats['parse'].set_depth(len(self.raw) + len(self.parsing))
+
+    def futures(self):
+        """解析中的 Future 列表，供调用方与抓取的 Future 一起 wait()"""
+        return list(self.parsing)
+
+    def collect(self, done):
+        """
+        取出 done 中已完成的解析任务
+
+        Returns:
+            list: (key, 解析结果)；解析函数抛出异常时结果为 None
+        """
+        results = []
+        for future in done:
+            key = self.parsing.pop(future, None)
+            if key is None:
+                continue
+            try:
+                result, elapsed = future.result()
+                self.stats['parse'].add(elapsed)
+            except Exception as e:
+                print(f"  解析进程出错 {key}: {e}")
+                result = None
+            results.append((key, result))
+        self.dispatch()
+        return results
+
+    def write(self, key, record):
+        """把一条记录交给写入线程；队列满时阻塞"""
+        if self.error:
+            raise self.error
+        self.records.put((key, record))
+        self.stats['write'].set_depth(self.records.qsize())
+
+    def write_loop(self):
+        while True:
+            item = self.records.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.records.get_nowait()
+                except queue.Empty:
+                    break
+            self.stats['write'].set_depth(self.records.qsize())
+            if batch:
+                start = time.perf_counter()
+                try:
+                    results = self.write_batch(batch)
+                except Exception as e:
+                    # 记下错误，由主线程下一次 write() 抛出；继续消费队列以免主线程阻塞
+                    self.error = e
+                else:
+                    for (key, _), result in zip(batch, results):
+                        self.done.put((key, result))
+                self.stats['write'].add(time.perf_counter() - start, len(batch))
+            if item is None:
+                return
+
+    def written(self):
+        """依次产出已写入的记录的 (key, 写入结果)"""
+        while True:
+            try:
+                yield self.done.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self, cancel=False):
+        """等待写入线程写完队列中的记录，关闭解析进程池"""
+        if self.writer:
+            self.records.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.executor:
+            self.executor.shutdown(wait=not cancel, cancel_futures=cancel)
+            self.executor = None
+        if self.error and not cancel:
+            raise self.error
+
+    def report(self):
+        """各阶段吞吐量、占用率和队列深度，用于判断瓶颈在哪个阶段"""
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        return "\n".join(stats.line(wall) for stats in self.stats.values())
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+
+import soupsieve
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionProfiles:
+    """
+    按站点学习的提取配置
+
+    爬虫对每个字段（标题、日期、正文……）都有一串候选CSS选择器。对一个站点的
+    前 sample_size 个页面逐个尝试候选选择器，记录实际命中的是哪一个；样本够了
+    就把命中最多的选择器编译下来，之后的页面直接使用，不再逐个试探。某个页面
+    与配置不符时退回完整的候选列表，并记录一次未命中。
+
+    配置保存在 JSON 文件中，spider.py 与 readurl.py 共用。
+
+    Args:
+        path: 配置文件路径，None 时只在内存中使用
+        sample_size: 每个字段学习多少个页面后固定下来
+    """
+
+    def __init__(self, path=None, sample_size=3):
+        self.path = path
+        self.sample_size = sample_size
+        self.sites = {}
+        self.compiled = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.sites = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取提取配置失败，将重新学习: {e}")
+
+    def entry(self, host, field):
+        return self.sites.setdefault(host, {}).setdefault(
+            field, {'selectors': None, 'votes': {}, 'samples': 0, 'hits': 0, 'misses': 0})
+
+    def compile(self, selector):
+        if selector not in self.compiled:
+            self.compiled[selector] = soupsieve.compile(selector)
+        return self.compiled[selector]
+
+    def probe_one(self, soup, selectors):
+        for selector in selectors:
+            elem = self.compile(selector).select_one(soup)
+            if elem is not None:
+                return selector, elem
+        return None, None
+
+    def learn(self, entry, field, host, matched, selectors):
+        """记录一个样本页命中的选择器，样本够了就固定配置"""
+        for selector in matched:
+            entry['votes'][selector] = entry['votes'].get(selector, 0) + 1
+        entry['samples'] += 1
+        if entry['samples'] >= self.sample_size and entry['votes']:
+            if field.endswith('[]'):
+                # 多值字段：保留样本中出现过的所有选择器，顺序与候选列表一致
+                entry['selectors'] = [s for s in selectors if s in entry['votes']]
+            else:
+                entry['selectors'] = [max(entry['votes'], key=entry['votes'].get)]
+            logger.info(f"提取配置已确定 {host} {field}: {', '.join(entry['selectors'])}")
+            self.save()
+
+    def miss(self, entry, field, host):
+        entry['misses'] += 1
+        logger.debug(f"页面与提取配置不符 {host} {field}，使用完整候选列表")
+
+    def select_one(self, soup, host, field, selectors):
+        """
+        按配置提取单个元素
+
+        Args:
+            soup: 已解析的页面
+            host: 站点主机名
+            field: 字段名
+            selectors: 候选选择器，按优先级排列
+
+        Returns:
+            第一个命中的元素，都不命中时为 None
+        """
+        entry = self.entry(host, field)
+        if entry['selectors']:
+            elem = self.compile(entry['selectors'][0]).select_one(soup)
+            if elem is not None:
+                entry['hits'] += 1
+                return elem
+            self.miss(entry, field, host)
+            return self.probe_one(soup, selectors)[1]
+
+        selector, elem = self.probe_one(soup, selectors)
+        self.learn(entry, field, host, [selector] if selector else [], selectors)
+        return elem
+
+    def select_all(self, soup, host, field, selectors):
+        """按配置提取多值字段：依次收集每个选择器匹配到的所有元素（field 以 [] 结尾）"""
+        entry = self.entry(host, field)
+        if entry['selectors']:
+            elems = [e for s in entry['selectors'] for e in self.compile(s).select(soup)]
+            if elems:
+                entry['hits'] += 1
+                return elems
+            self.miss(entry, field, host)
+
+        elems, matched = [], []
+        for selector in selectors:
+            found = self.compile(selector).select(soup)
+            if found:
+                matched.append(selector)
+                elems.extend(found)
+        if not entry['selectors']:
+            self.learn(entry, field, host, matched, selectors)
+        return elems
+
+    def save(self):
+        """写入配置文件（先写临时文件再替换，避免中断时留下半个文件）"""
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sites, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
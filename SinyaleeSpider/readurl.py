@@ -3,29 +3,57 @@ import re
 import os
 import time
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 import logging
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from crawlstate import CrawlState
+from httpcache import HTTPCache
+from charsets import EncodingResolver
+from pageparse import make_soup
+from profiles import ExtractionProfiles
+from fetcher import AdaptiveLimiter, RetryScheduler
+from pipeline import PagePipeline
+from metrics import NULL_METRICS, Metrics
+from transport import DEFAULT_POOL_SIZE, Transport
+from warc import WarcWriter
+import textnorm
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 批量模式请求间隔的默认下限（秒）：请求间隔从 delay 开始，服务器响应快时逐步缩短到该值
+DEFAULT_MIN_INTERVAL = 2.0
+
 class BlogCrawler:
-    def __init__(self, delay=1, timeout=10):
+    def __init__(self, delay=1, timeout=10, cache_file=None, profile_file=None, metrics=None, transport=None,
+                 warc_file=None, retries=None):
         """
         初始化爬虫
         
         Args:
             delay: 请求间隔时间（秒）
             timeout: 请求超时时间（秒）
+            cache_file: HTTP缓存文件路径，指定后用条件请求跳过未变化页面的下载
+            profile_file: 提取配置文件路径（与 spider.py 共用），记录每个站点实际命中的选择器
+            metrics: 可选的 metrics.Metrics，记录各阶段耗时，不指定时不做统计
+            transport: 可选的 transport.Transport（连接池、压缩、可选 HTTP/2），可与 spider.py 共用
+            warc_file: WARC 文件路径，指定后把抓取到的原始页面追加写入，之后可用 reextract.py 离线重新提取
+            retries: 可选的 fetcher.RetryScheduler（失败条目的延迟重试、熔断和死信列表），可与 spider.py 共用
         """
         self.delay = delay
         self.timeout = timeout
-        self.session = requests.Session()
-        # 设置请求头，模拟浏览器访问
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.cache = HTTPCache(cache_file) if cache_file else None
+        self.profiles = ExtractionProfiles(profile_file)
+        self.metrics = metrics or NULL_METRICS
+        # 请求头模拟浏览器访问（User-Agent 见 transport.USER_AGENT）
+        self.transport = transport or Transport(metrics=self.metrics)
+        self.session = self.transport.session
+        self.warc = WarcWriter(warc_file) if warc_file else None
+        self.retries = retries if retries is not None else RetryScheduler()
+        # 服务器没有声明字符集时确定编码（BOM/meta、按主机缓存、只检测开头部分）
+        self.encodings = EncodingResolver()
         
     def extract_urls_from_text(self, file_path):
         """
@@ -71,13 +99,8 @@ class BlogCrawler:
         Returns:
             str: 清理后的文件名
         """
-        # 移除Windows文件名中不允许的字符
-        invalid_chars = r'[<>:"/\\|?*]'
-        filename = re.sub(invalid_chars, '_', filename)
-        # 限制文件名长度
-        if len(filename) > 100:
-            filename = filename[:100]
-        return filename.strip()
+        # 非法字符替换为下划线、合并空白、限制长度（与 spider.py、renamefile.py 规则相同）
+        return textnorm.clean_filename(filename)
     
     def create_save_directory(self, base_dir="blog_pages"):
         """
@@ -104,77 +127,105 @@ class BlogCrawler:
         Returns:
             tuple: (成功状态, 响应内容或错误信息)
         """
+        success, content, _ = self.fetch_page_status(url)
+        return success, content
+    
+    def fetch_page_status(self, url):
+        """
+        获取网页内容，同时返回响应对象（用于查看状态码、Retry-After 和耗时）
+        
+        Args:
+            url: 网页URL
+            
+        Returns:
+            tuple: (成功状态, 响应内容或错误信息, 响应对象；连接失败等没有响应时为 None)
+        """
+        with self.metrics.timer('fetch_seconds'):
+            result = self.request_page(url)
+        if not result[0]:
+            self.metrics.inc('fetch_failures')
+        return result
+    
+    def request_page(self, url):
+        response = None
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            if self.cache:
+                response = self.cache.get(self.session, url, timeout=self.timeout)
+            else:
+                response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()  # 如果状态码不是200，抛出异常
+            if self.warc:
+                self.warc.write_response(response)
             
-            # 检测编码
-            if response.encoding.lower() == 'iso-8859-1':
-                response.encoding = response.apparent_encoding
+            # 服务器没有声明字符集时（requests 按 ISO-8859-1 处理）确定编码
+            if (response.encoding or 'iso-8859-1').lower() == 'iso-8859-1':
+                return True, self.encodings.decode(response), response
                 
-            return True, response.text
+            return True, response.text, response
             
         except requests.exceptions.RequestException as e:
             error_msg = f"请求失败: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return False, error_msg, response
         except Exception as e:
             error_msg = f"未知错误: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return False, error_msg, response
     
-    def extract_content(self, html_content):
+    def extract_content(self, html_content, url=None):
         """
         从HTML中提取主要内容
         
         Args:
             html_content: HTML内容
+            url: 页面URL，用于查找该站点的提取配置
             
         Returns:
             str: 提取的文本内容
         """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # 移除脚本和样式标签
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # 尝试找到文章主要内容区域
-            # 常见的文章内容选择器
-            content_selectors = [
-                'article',
-                '.entry-content',
-                '.post-content',
-                '.content',
-                'main',
-                '.main-content',
-                '#content'
-            ]
-            
-            content_element = None
-            for selector in content_selectors:
-                content_element = soup.select_one(selector)
-                if content_element:
-                    break
-            
-            # 如果没有找到特定的内容区域，使用body
-            if not content_element:
-                content_element = soup.find('body')
-            
-            # 获取文本
-            text = content_element.get_text(separator='\n', strip=True)
-            
-            # 清理多余的空白行
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            cleaned_text = '\n'.join(lines)
-            
-            return cleaned_text
-            
+            with self.metrics.timer('parse_seconds'):
+                soup = make_soup(html_content)
+            with self.metrics.timer('extract_seconds'):
+                return self.extract_text(soup, url)
         except Exception as e:
             logger.warning(f"内容提取失败，返回原始HTML: {e}")
             return html_content
     
+    def extract_text(self, soup, url=None):
+        """从已解析的页面中提取正文文本"""
+        # 移除脚本和样式标签
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # 尝试找到文章主要内容区域
+        # 常见的文章内容选择器
+        content_selectors = [
+            'article',
+            '.entry-content',
+            '.post-content',
+            '.content',
+            'main',
+            '.main-content',
+            '#content'
+        ]
+        
+        host = urlparse(url).netloc if url else ''
+        content_element = self.profiles.select_one(soup, host, 'main_text', content_selectors)
+        
+        # 如果没有找到特定的内容区域，使用body
+        if not content_element:
+            content_element = soup.find('body')
+        
+        # 获取文本
+        text = content_element.get_text(separator='\n', strip=True)
+        
+        # 清理多余的空白行
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        cleaned_text = '\n'.join(lines)
+        
+        return cleaned_text
+    
     def save_content(self, content, file_path):
         """
         保存内容到文件
@@ -184,14 +235,20 @@ class BlogCrawler:
             file_path: 文件路径
         """
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(content)
+            with self.metrics.timer('write_seconds'):
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(content)
             return True
         except Exception as e:
             logger.error(f"保存文件失败 {file_path}: {e}")
             return False
     
-    def crawl(self, file_path, save_dir="blog_pages", save_html=False):
+    def state_key(self, url_info):
+        """断点续爬状态中条目的键：同一URL可能以不同序号出现多次，所以用 "序号. URL" """
+        return f"{url_info['number']}. {url_info['url']}"
+    
+    def crawl(self, file_path, save_dir="blog_pages", save_html=False, state_file=None, workers=1, max_retries=3,
+              parse_workers=2, incremental=False, min_interval=DEFAULT_MIN_INTERVAL):
         """
         主爬取函数
         
@@ -199,6 +256,15 @@ class BlogCrawler:
             file_path: 包含URL列表的文本文件路径
             save_dir: 保存目录
             save_html: 是否保存原始HTML
+            state_file: 断点续爬状态文件路径，指定后中断再运行会跳过已完成的条目
+            workers: 大于 1 时使用批量模式：最多 workers 个请求同时进行，
+                     请求间隔从 delay 开始根据服务器响应自适应调整
+            max_retries: 遇到连接失败、429/5xx 等可重试的错误时每个条目最多重试的次数；
+                         失败的条目按退避时间放入 self.retries，等待期间先抓取其他条目
+            parse_workers: 批量模式下提取正文的进程数
+            incremental: 为 True 时跳过保存目录中已有文本文件的条目（不发请求），
+                         只抓取列表中新增的条目；上一轮全部完成后再次运行也不会重新抓取
+            min_interval: 批量模式下请求间隔的下限（秒），自适应调整最快缩短到该值（大于 delay 时以 delay 为准）
         """
         # 提取URL
         urls = self.extract_urls_from_text(file_path)
@@ -211,47 +277,47 @@ class BlogCrawler:
         
         success_count = 0
         fail_count = 0
+        skip_count = 0
+        saved_count = 0
         
         # 统计文件
         stats_file = os.path.join(save_dir, "crawl_stats.txt")
         
-        for url_info in urls:
-            number = url_info['number']
-            title = url_info['title']
-            url = url_info['url']
-            
-            logger.info(f"正在处理 [{number}] {title}")
-            
-            # 获取网页内容
-            success, content = self.fetch_page(url)
-            
-            if success:
-                # 提取文本内容
-                text_content = self.extract_content(content)
-                
-                # 保存文本内容
-                text_filename = f"{number}_{title}.txt"
-                text_filepath = os.path.join(save_dir, text_filename)
-                
-                if self.save_content(text_content, text_filepath):
-                    logger.info(f"✓ 成功保存: {text_filename}")
-                    success_count += 1
+        state = CrawlState(state_file) if state_file else None
+        if state and all(state.is_done(u['url'], key=self.state_key(u)) for u in urls):
+            # 上一轮已全部完成，重新开始
+            state.reset()
+        
+        throttle_count = None
+        self.retries.max_retries = max_retries
+        try:
+            todo = []
+            for url_info in urls:
+                if state and state.is_done(url_info['url'], key=self.state_key(url_info)):
+                    skip_count += 1
+                elif incremental and self.is_saved(url_info, save_dir):
+                    saved_count += 1
                 else:
-                    logger.error(f"✗ 保存失败: {text_filename}")
-                    fail_count += 1
-                
-                # 如果需要保存原始HTML
-                if save_html:
-                    html_filename = f"{number}_{title}.html"
-                    html_filepath = os.path.join(save_dir, html_filename)
-                    self.save_content(content, html_filepath)
-                    logger.info(f"✓ 保存HTML: {html_filename}")
-            else:
-                logger.error(f"✗ 获取失败: {title}")
-                fail_count += 1
+                    todo.append(url_info)
             
-            # 延迟，避免请求过快
-            time.sleep(self.delay)
+            if workers > 1:
+                success_count, fail_count, throttle_count = self.crawl_batch(
+                    todo, save_dir, save_html, state, workers, max_retries, parse_workers, min_interval)
+            else:
+                success_count, fail_count = self.crawl_sequential(todo, save_dir, save_html, state)
+        finally:
+            if self.retries:
+                # 中断时还在等待重试的条目记入死信（状态文件中仍未完成，下次运行会重新抓取）
+                self.retries.abandon_pending("爬取中断时仍在等待重试")
+            if state:
+                state.close()
+            self.profiles.save()
+        
+        if skip_count:
+            logger.info(f"跳过上次已完成的 {skip_count} 个条目")
+        if saved_count:
+            logger.info(f"跳过已保存的 {saved_count} 个条目，抓取 {len(todo)} 个")
+        success_count += skip_count + saved_count
         
         # 保存统计信息
         stats_content = f"""爬取统计报告
@@ -261,8 +327,306 @@ class BlogCrawler:
 失败数量: {fail_count}
 成功率: {success_count/len(urls)*100:.2f}%
         """
+        if throttle_count is not None:
+            stats_content += f"\n限流/服务器错误次数: {throttle_count}\n"
+        if self.cache:
+            logger.info(self.cache.stats_line())
+            stats_content += f"\n{self.cache.stats_line()}\n"
+        logger.info(self.transport.stats_line())
+        stats_content += f"\n{self.transport.stats_line()}\n"
+        logger.info(self.retries.stats_line())
+        stats_content += f"\n{self.retries.stats_line()}\n"
+        if self.encodings.stats:
+            logger.info(self.encodings.stats_line())
+            stats_content += f"\n{self.encodings.stats_line()}\n"
         self.save_content(stats_content, stats_file)
         logger.info(f"爬取完成！统计信息已保存到: {stats_file}")
+    
+    def text_filename(self, url_info):
+        return f"{url_info['number']}_{url_info['title']}.txt"
+    
+    def is_saved(self, url_info, save_dir):
+        """保存目录中是否已有该条目的文本文件"""
+        return os.path.exists(os.path.join(save_dir, self.text_filename(url_info)))
+    
+    def crawl_sequential(self, todo, save_dir, save_html=False, state=None):
+        """
+        逐个抓取，每个请求之后等待 delay 秒
+    
+        失败的条目不原地等待重试，而是放入 self.retries，到期后优先重新抓取；
+        主机熔断期间的条目推迟到恢复之后。
+    
+        Returns:
+            tuple: (成功数量, 失败数量)
+        """
+        queue = deque(todo)
+        success_count = 0
+        fail_count = 0
+        while queue or self.retries:
+            # 已到期的重试排在最前面
+            queue.extendleft(reversed(self.retries.pop_due()))
+            if not queue:
+                # 只剩等待中的重试
+                self.retries.sleep_until_next()
+                continue
+            url_info = queue.popleft()
+            if self.defer_paused(url_info):
+                continue
+    
+            logger.info(f"正在处理 [{url_info['number']}] {url_info['title']}")
+            success, content, response = self.fetch_page_status(url_info['url'])
+            if success:
+                self.retries.record_success(url_info['url'], self.state_key(url_info))
+            if success or not self.schedule_retry(url_info, content, response):
+                if self.save_result(url_info, success, content, save_dir, save_html, state):
+                    success_count += 1
+                else:
+                    fail_count += 1
+    
+            # 延迟，避免请求过快
+            time.sleep(self.delay)
+        return success_count, fail_count
+    
+    def defer_paused(self, url_info):
+        """条目的主机熔断中时推迟到恢复之后，返回是否已推迟"""
+        if not self.retries.paused_until(url_info['url']):
+            return False
+        self.retries.defer(url_info['url'], self.state_key(url_info), url_info)
+        return True
+    
+    def schedule_retry(self, url_info, error, response):
+        """
+        请求失败后交给 self.retries：可以重试时安排在退避时间之后（不等待），否则记入死信
+    
+        Returns:
+            bool: 是否已安排重试
+        """
+        status = response.status_code if response is not None else None
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        delay = self.retries.record_failure(url_info['url'], error, status,
+                                            float(retry_after) if retry_after.isdigit() else None,
+                                            key=self.state_key(url_info), item=url_info)
+        if delay is None:
+            return False
+        self.metrics.inc('retries')
+        logger.warning(f"获取失败，{delay:.2f} 秒后重试: {url_info['title']}")
+        return True
+    
+    def crawl_one(self, url_info, save_dir, save_html=False, state=None):
+        """
+        抓取并保存一个条目
+        
+        Args:
+            url_info: extract_urls_from_text 返回的字典
+            save_dir: 保存目录
+            save_html: 是否保存原始HTML
+            state: 可选的 CrawlState，记录该条目完成或失败
+            
+        Returns:
+            bool: 是否成功
+        """
+        logger.info(f"正在处理 [{url_info['number']}] {url_info['title']}")
+        
+        # 获取网页内容
+        success, content = self.fetch_page(url_info['url'])
+        return self.save_result(url_info, success, content, save_dir, save_html, state)
+    
+    def save_result(self, url_info, success, content, save_dir, save_html=False, state=None):
+        """
+        处理一个条目的抓取结果：提取正文并保存，记录完成状态
+        
+        Args:
+            url_info: extract_urls_from_text 返回的字典
+            success: 是否获取成功
+            content: 网页内容或错误信息
+            save_dir: 保存目录
+            save_html: 是否保存原始HTML
+            state: 可选的 CrawlState
+            
+        Returns:
+            bool: 是否成功
+        """
+        if not success:
+            self.record_fetch_failed(url_info, content, state)
+            return False
+        
+        # 提取文本内容
+        text_content = self.extract_content(content, url_info['url'])
+        saved = self.write_files(url_info, content, text_content, save_dir, save_html)
+        return self.record_saved(url_info, saved, state)
+    
+    def write_files(self, url_info, html_content, text_content, save_dir, save_html=False):
+        """
+        保存一个条目的文本（以及原始HTML）
+        
+        Returns:
+            bool: 文本文件是否保存成功
+        """
+        # 如果需要保存原始HTML
+        if save_html:
+            html_filename = f"{url_info['number']}_{url_info['title']}.html"
+            self.save_content(html_content, os.path.join(save_dir, html_filename))
+            logger.info(f"✓ 保存HTML: {html_filename}")
+        
+        # 保存文本内容
+        text_filename = self.text_filename(url_info)
+        return self.save_content(text_content, os.path.join(save_dir, text_filename))
+    
+    def record_fetch_failed(self, url_info, error, state=None):
+        logger.error(f"✗ 获取失败: {url_info['title']}")
+        if state:
+            state.record_failed(url_info['url'], error, key=self.state_key(url_info))
+    
+    def record_saved(self, url_info, saved, state=None):
+        """记录保存结果，返回是否成功"""
+        text_filename = self.text_filename(url_info)
+        key = self.state_key(url_info)
+        if saved:
+            logger.info(f"✓ 成功保存: {text_filename}")
+            if state:
+                state.record_done(url_info['url'], text_filename, key=key)
+            return True
+        
+        logger.error(f"✗ 保存失败: {text_filename}")
+        if state:
+            state.record_failed(url_info['url'], "保存失败", key=key)
+        return False
+    
+    def write_batch(self, batch, save_dir, save_html=False):
+        """流水线写入线程：保存一批 (url_info, (原始HTML, 文本))"""
+        return [self.write_files(url_info, html_content, text_content, save_dir, save_html)
+                for url_info, (html_content, text_content) in batch]
+    
+    def fetch_adaptive(self, url, limiter):
+        """
+        批量模式的抓取线程：按自适应间隔排队发出请求，并把响应情况反馈给 limiter
+        
+        Returns:
+            tuple: (成功状态, 响应内容或错误信息, 响应对象；连接失败等没有响应时为 None)
+        """
+        limiter.wait_turn()
+        start = time.monotonic()
+        success, content, response = self.fetch_page_status(url)
+        if success:
+            limiter.on_success(time.monotonic() - start)
+            return success, content, response
+        
+        status = response.status_code if response is not None else None
+        if status is None or status == 429 or status >= 500:
+            # 限流、服务器错误或连接失败：降速（是否重试由 self.retries 决定）
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            limiter.on_throttle(float(retry_after) if retry_after and retry_after.isdigit() else None,
+                                rate_limited=status == 429)
+        return success, content, response
+    
+    def crawl_batch(self, todo, save_dir, save_html=False, state=None, workers=8, max_retries=3, parse_workers=2,
+                    min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        批量模式：抓取（线程池）-> 提取正文（进程池）-> 保存（写入线程）流水线
+        
+        并发数和请求间隔由 AdaptiveLimiter 根据服务器响应调整：响应快时逐步加速（请求间隔
+        不低于 min_interval），遇到 429/5xx 或延迟升高时减速。失败的条目交给 self.retries，退避时间到期后
+        放回队首（主机熔断中的推迟到恢复之后），等待期间照常处理其他条目。
+        各阶段之间的队列都有上限，提取或写盘跟不上时暂停提交新的请求。
+        
+        Args:
+            todo: 待抓取的条目列表
+            save_dir: 保存目录
+            save_html: 是否保存原始HTML
+            state: 可选的 CrawlState
+            workers: 最大并发数
+            max_retries: 每个条目最多重试的次数（设置到 self.retries）
+            parse_workers: 提取正文的进程数
+            min_interval: 请求间隔的下限（秒），请求间隔从 delay 开始，最快缩短到该值
+            
+        Returns:
+            tuple: (成功数量, 失败数量, 限流/服务器错误次数)
+        """
+        limiter = AdaptiveLimiter(max_concurrency=workers, initial_interval=self.delay,
+                                  min_interval=min(min_interval, self.delay))
+        self.transport.set_pool_size(workers)
+        self.retries.max_retries = max_retries
+        queue = deque(todo)
+        success_count = 0
+        fail_count = 0
+        
+        pipeline = PagePipeline(extract_in_worker, partial(self.write_batch, save_dir=save_dir, save_html=save_html),
+                                parse_workers, initializer=init_extract_worker, initargs=(self.profiles.sites, save_html),
+                                raw_limit=max(workers * 4, parse_workers * 4))
+        fetch = pipeline.timed(self.fetch_adaptive)
+        with pipeline, ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            while queue or pending or pipeline.busy() or self.retries:
+                # 已到期的重试排在最前面
+                queue.extendleft(reversed(self.retries.pop_due()))
+                while queue and len(pending) < limiter.limit and not pipeline.full():
+                    url_info = queue.popleft()
+                    if self.defer_paused(url_info):
+                        continue
+                    logger.info(f"正在处理 [{url_info['number']}] {url_info['title']}")
+                    pending[executor.submit(fetch, url_info['url'], limiter)] = url_info
+                pipeline.stats['fetch'].set_depth(len(pending))
+                
+                if not pending and not pipeline.busy():
+                    # 只剩等待中的重试
+                    self.retries.sleep_until_next()
+                    continue
+                
+                # 有重试将要到期时不一直等在途请求
+                done, _ = wait(list(pending) + pipeline.futures(), timeout=self.retries.time_to_next(),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    url_info = pending.pop(future, None)
+                    if url_info is None:
+                        continue
+                    success, content, response = future.result()
+                    if success:
+                        self.retries.record_success(url_info['url'], self.state_key(url_info))
+                        pipeline.put(url_info, content)
+                    elif not self.schedule_retry(url_info, content, response):
+                        self.record_fetch_failed(url_info, content, state)
+                        fail_count += 1
+                
+                for url_info, result in pipeline.collect(done):
+                    if result is None:
+                        # 提取进程出错，按保存失败处理
+                        self.record_saved(url_info, False, state)
+                        fail_count += 1
+                    else:
+                        pipeline.write(url_info, result)
+                
+                saved, failed = self.record_written(pipeline, state)
+                success_count += saved
+                fail_count += failed
+        
+        saved, failed = self.record_written(pipeline, state)
+        success_count += saved
+        fail_count += failed
+        self.metrics.inc('throttled', limiter.throttled)
+        logger.info("各阶段统计:\n" + pipeline.report())
+        return success_count, fail_count, limiter.throttled
+    
+    def record_written(self, pipeline, state=None):
+        """记录写入线程已完成的条目，返回 (成功数, 失败数)"""
+        results = [self.record_saved(url_info, saved, state) for url_info, saved in pipeline.written()]
+        return sum(results), len(results) - sum(results)
+
+# 批量模式下提取进程中使用的爬虫实例（只用于提取正文）
+_extract_crawler = None
+
+_keep_html = False
+
+def init_extract_worker(profile_sites, keep_html=False):
+    """提取进程初始化：创建爬虫实例并载入主进程当前的提取配置"""
+    global _extract_crawler, _keep_html
+    _extract_crawler = BlogCrawler()
+    _extract_crawler.profiles.sites = profile_sites
+    _keep_html = keep_html
+
+def extract_in_worker(url_info, html_content):
+    """在提取进程中提取一个条目的正文，返回 (原始HTML（不保存HTML时为 None）, 文本)"""
+    text_content = _extract_crawler.extract_content(html_content, url_info['url'])
+    return html_content if _keep_html else None, text_content
 
 def main():
     # 配置参数
@@ -270,12 +634,47 @@ def main():
     SAVE_DIR = "blog_pages"      # 保存目录
     DELAY = 35                    # 请求间隔（秒）
     SAVE_HTML = False            # 是否保存原始HTML
+    WORKERS = 4                   # 并发数，大于 1 时使用批量模式（请求间隔从 DELAY 开始自适应调整）；1 为逐个抓取，每个之后等待 DELAY
+    MIN_INTERVAL = DEFAULT_MIN_INTERVAL  # 批量模式的请求间隔下限（秒），服务器响应快时最快缩短到该值
+    STATE_FILE = "readurl_state.db"  # 断点续爬状态文件，中断后再次运行会跳过已完成的条目
+    CACHE_FILE = "http_cache.db"    # HTTP缓存文件，未变化的页面只需确认不需重新下载
+    INCREMENTAL = True            # 跳过 SAVE_DIR 中已保存的条目，只抓取新增的
+    PROFILE_FILE = "extraction_profiles.json"  # 提取配置文件，与 spider.py 共用
+    METRICS_FILE = None           # 例如 "readurl_metrics.prom" 或 "readurl_metrics.json"：结束时导出各阶段耗时统计
+    METRICS_PORT = None           # 例如 9101：爬取过程中可在 http://127.0.0.1:9101/metrics 查看
+    RECORD_FILE = None            # 例如 "fixtures.db"：录制全部请求和响应，之后用 stubserver.py --fixture 离线回放
+    WARC_FILE = "readurl_raw.warc.gz"  # 原始页面存档，修改提取逻辑后用 reextract.py 离线重新生成文本
+    DEAD_LETTER_FILE = "readurl_dead_letters.jsonl"  # 重试后仍然失败的条目（每行一条）
     
+    metrics = Metrics(prefix='readurl') if METRICS_FILE or METRICS_PORT else None
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    
+    # 录制时不用HTTP缓存（304 响应没有正文），也不跳过已保存的条目，确保每个页面都录到完整的响应
+    # 连接池在创建时按并发数给足，批量模式不需要再调整
+    transport = Transport(pool_size=max(WORKERS, DEFAULT_POOL_SIZE), metrics=metrics, record_file=RECORD_FILE)
     # 创建爬虫实例
-    crawler = BlogCrawler(delay=DELAY)
+    crawler = BlogCrawler(delay=DELAY, cache_file=None if RECORD_FILE else CACHE_FILE, profile_file=PROFILE_FILE,
+                          metrics=metrics, transport=transport, warc_file=WARC_FILE)
     
     # 开始爬取
-    crawler.crawl(TEXT_FILE, SAVE_DIR, SAVE_HTML)
+    crawler.crawl(TEXT_FILE, SAVE_DIR, SAVE_HTML, STATE_FILE, workers=WORKERS,
+                  incremental=INCREMENTAL and not RECORD_FILE, min_interval=MIN_INTERVAL)
+    
+    failed = crawler.retries.write_dead_letters(DEAD_LETTER_FILE)
+    if failed:
+        logger.warning(f"{failed} 个条目最终失败，已记录到: {DEAD_LETTER_FILE}")
+    if RECORD_FILE:
+        logger.info(f"已录制 {transport.recorder.count} 个响应到: {RECORD_FILE}")
+    if crawler.warc:
+        logger.info(f"原始页面已追加到: {WARC_FILE}（{crawler.warc.count} 个响应）")
+        crawler.warc.close()
+    transport.close()
+    if METRICS_FILE:
+        metrics.write(METRICS_FILE)
+        logger.info(f"各阶段耗时统计已保存到: {METRICS_FILE}")
+    if metrics:
+        metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from archive import MAX_HEADER_LINES, iter_article_files, is_separator, read_header
+from charsets import EncodingResolver
+from frontier import normalize_url
+from readurl import BlogCrawler, extract_in_worker, init_extract_worker
+from spider import BlogScraper, init_parse_worker, parse_page_in_worker
+from warc import iter_responses
+
+def rest_route(url):
+    """REST API 地址对应的路由（"/wp/v2/posts" 等），不是 REST 地址时为空字符串"""
+    parts = urlsplit(url)
+    if '/wp-json/' in parts.path:
+        return '/' + parts.path.split('/wp-json/', 1)[1].rstrip('/')
+    return parse_qs(parts.query).get('rest_route', [''])[0].rstrip('/')
+
+
+class Captures:
+    """
+    WARC 中的成功响应：HTML 页面和 REST API 返回的文章、分类、作者
+
+    同一URL抓取过多次时以最后一次为准。页面的解码与 readurl.request_page 相同：
+    按响应头声明的字符集，没有声明时用 EncodingResolver 确定。
+    """
+
+    def __init__(self, paths):
+        self.pages = {}  # 规范化URL -> (URL, HTML)
+        self.posts = {}  # 文章ID -> REST 文章
+        self.categories = {}
+        self.authors = {}
+        self.encodings = EncodingResolver()
+        for url, status, headers, body in iter_responses(paths):
+            if status != 200:
+                continue
+            content_type = headers.get('Content-Type', '')
+            if 'json' in content_type:
+                self.add_rest(rest_route(url), body)
+            elif 'html' in content_type:
+                self.pages[normalize_url(url)] = (url, self.response_text(url, headers, body))
+
+    def response_text(self, url, headers, body):
+        """解码正文：与 requests 相同地取声明的字符集，没有声明（按 ISO-8859-1）时由 self.encodings 确定"""
+        content_type = headers.get('Content-Type', '')
+        encoding = get_encoding_from_headers(CaseInsensitiveDict({'Content-Type': content_type}))
+        if (encoding or 'iso-8859-1').lower() == 'iso-8859-1':
+            return self.encodings.resolve(body, self.encodings.cache_key(url, content_type))[0]
+        try:
+            return body.decode(encoding, errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    def add_rest(self, route, body):
+        try:
+            items = json.loads(body)
+        except ValueError:
+            return
+        if not isinstance(items, list):
+            return
+        if route == '/wp/v2/posts':
+            self.posts.update((post['id'], post) for post in items)
+        elif route == '/wp/v2/categories':
+            self.categories.update((c['id'], c['name']) for c in items)
+        elif route == '/wp/v2/users':
+            self.authors.update((u['id'], u['name']) for u in items)
+
+
+def run_pool(func, initializer, initargs, items, workers):
+    """
+    在 workers 个进程中对 items（参数元组）逐个调用 func，按顺序返回结果
+
+    workers 为 0 时在当前进程中依次执行。
+    """
+    if workers <= 0:
+        initializer(*initargs)
+        return [func(*item) for item in items]
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(func, *zip(*items), chunksize=chunksize)) if items else []
+
+
+def extract_articles(captures, scraper, workers):
+    """
+    重新提取全部文章
+
+    REST API 的文章直接转换；HTML 页面用 BlogScraper.parse_page（与爬取时相同的
+    提取逻辑）在进程池中解析，同一URL两者都有时以页面提取的结果为准。
+
+    Returns:
+        dict: 规范化URL -> 文章字典
+    """
+    articles = {}
+    for post in captures.posts.values():
+        article_data = scraper.article_from_post(post, captures.categories, captures.authors)
+        if article_data['content']:
+            articles[normalize_url(article_data['url'])] = article_data
+    items = list(captures.pages.values())
+    results = run_pool(parse_page_in_worker, init_parse_worker, (scraper.base_url, scraper.profiles.sites),
+                       items, workers)
+    for (url, html_content), (article_data, links) in zip(items, results):
+        if article_data and article_data['content']:
+            articles[normalize_url(url)] = article_data
+    return articles
+
+
+def update_archive(archive_dir, articles):
+    """
+    用重新提取的正文更新归档文件（如 SinyaleeBlogs）
+
+    按文件头的“链接:”找到对应的文章，只替换分隔线之后的正文，文件名、文件头和换行符
+    保持不变；正文没有变化的文件不写入。先写临时文件再替换，中途出错时原文件不受影响。
+
+    Returns:
+        tuple: (更新的文件数, 有对应文章的文件数)
+    """
+    updated = matched = 0
+    for path in iter_article_files(archive_dir):
+        url = read_header(path).get('url')
+        article_data = articles.get(normalize_url(url)) if url else None
+        if not article_data:
+            continue
+        matched += 1
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        newline = '\r\n' if '\r\n' in text else '\n'
+        lines = text.split(newline, MAX_HEADER_LINES + 1)
+        separator = next((i for i, line in enumerate(lines[:MAX_HEADER_LINES + 1]) if is_separator(line)), None)
+        if separator is None:
+            continue
+        new_text = newline.join(lines[:separator + 1] + [article_data['content'].replace('\n', newline)])
+        if new_text == text:
+            continue
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_text)
+        os.replace(tmp_path, path)
+        updated += 1
+    return updated, matched
+
+
+def extract_pages(captures, crawler, list_file, pages_dir, workers):
+    """
+    按 readurl 的URL列表重新生成文本文件（{序号}_{标题}.txt），正文用 BlogCrawler.extract_content 提取
+
+    Returns:
+        tuple: (保存的文件数, 列表中的条目数)
+    """
+    url_infos = crawler.extract_urls_from_text(list_file)
+    items = []
+    for url_info in url_infos:
+        page = captures.pages.get(normalize_url(url_info['url']))
+        if page:
+            items.append((url_info, page[1]))
+    results = run_pool(extract_in_worker, init_extract_worker, (crawler.profiles.sites, False), items, workers)
+    os.makedirs(pages_dir, exist_ok=True)
+    saved = 0
+    for (url_info, html_content), (_, text_content) in zip(items, results):
+        saved += bool(crawler.write_files(url_info, None, text_content, pages_dir))
+    return saved, len(url_infos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 WARC 存档离线重新提取文章，不访问网络")
+    parser.add_argument('warc', nargs='+', help="WARC 文件（spider_raw.warc.gz、readurl_raw.warc.gz），按时间顺序")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="提取进程数，0 表示在当前进程中执行")
+    parser.add_argument('--output', default="blog_content", help="spider.py 格式的输出目录，空字符串表示不生成")
+    parser.add_argument('--archive-dir', help="要更新正文的归档目录，例如 ../SinyaleeBlogs")
+    parser.add_argument('--list', help="readurl 的URL列表（爬取报告.txt），与 --pages-dir 一起使用")
+    parser.add_argument('--pages-dir', default="blog_pages", help="readurl 格式的输出目录")
+    parser.add_argument('--profile-file', default="extraction_profiles.json", help="提取配置文件（与爬虫共用）")
+    parser.add_argument('--base-url', default="https://sinyalee.com/blog/")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    captures = Captures(args.warc)
+    print(f"读取 {len(args.warc)} 个 WARC 文件: {len(captures.pages)} 个页面，{len(captures.posts)} 篇 REST 文章，"
+          f"{time.perf_counter() - start:.2f} 秒")
+
+    if args.output or args.archive_dir:
+        scraper = BlogScraper(args.base_url, profile_file=args.profile_file)
+        step = time.perf_counter()
+        articles = extract_articles(captures, scraper, args.workers)
+        print(f"提取出 {len(articles)} 篇文章（{args.workers} 个进程），{time.perf_counter() - step:.2f} 秒")
+        if args.output:
+            for article_data in articles.values():
+                scraper.save_article(article_data, args.output)
+            stats = scraper.article_store(args.output).stats
+            print(f"已生成 '{args.output}': 新写入 {stats['written']} 个文件，未变化 {stats['unchanged']} 个")
+        if args.archive_dir:
+            updated, matched = update_archive(args.archive_dir, articles)
+            print(f"归档 '{args.archive_dir}': {matched} 个文件有对应的页面，其中 {updated} 个正文已更新")
+
+    if args.list:
+        crawler = BlogCrawler(profile_file=args.profile_file)
+        step = time.perf_counter()
+        saved, total = extract_pages(captures, crawler, args.list, args.pages_dir, args.workers)
+        print(f"已生成 '{args.pages_dir}': 列表 {total} 个条目，{saved} 个有存档并已保存，"
+              f"{time.perf_counter() - step:.2f} 秒")
+
+    print(f"完成，共 {time.perf_counter() - start:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,149 @@
+import argparse
 import os
 import re
-from pathlib import Path
-from urllib.parse import urlparse, parse_qs
+
+import textnorm
+from archive import read_header
+from frontier import normalize_url
 
 # 配置参数 - 请根据实际情况修改这些路径
 NAME_LIST_FILE = r"C:\Users\Administrator\Desktop\Lib\SinyaleeSpider\爬取报告.txt"    # 名单文件路径
 TARGET_FOLDER = r"C:\Users\Administrator\Desktop\Lib\SinyaleeBlogs"   # 要处理的文件夹路径
 # ===============
 
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+# 名单格式：序号. 名称 - URL
+NAME_LINE_PATTERN = re.compile(r'^(\d+)\.\s*(.+?)\s*-\s*(https?://[^\s]+)')
 
-import os
-import re
-from pathlib import Path
 
-def numbered_rename():
-    """保留序号的精确匹配URL重命名版本"""
-    
-    # 读取名单
+def load_name_list(name_list_file):
+    """读取名单，返回 {规范化URL: (序号, 名称)}；同一URL出现多次时以最后一次为准"""
     name_url_map = {}
-    with open(NAME_LIST_FILE, 'r', encoding='utf-8') as f:
+    with open(name_list_file, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if line:
                 # 匹配格式：序号. 名称 - URL
-                match = re.match(r'^(\d+)\.\s*(.+?)\s*-\s*(https?://[^\s]+)', line)
+                match = NAME_LINE_PATTERN.match(line)
                 if match:
                     serial = match.group(1)  # 序号
                     name = match.group(2)   # 名称
                     url = match.group(3)    # URL
-                    name_url_map[url] = (serial, name)
-    
-    # 按照URL长度从长到短排序，优先匹配更具体的URL
-    sorted_urls = sorted(name_url_map.keys(), key=lambda x: len(x), reverse=True)
-    
-    # 处理文件
-    for filename in os.listdir(TARGET_FOLDER):
+                    name_url_map[normalize_url(url)] = (url, serial, name)
+    return name_url_map
+
+
+def match_file(filepath, name_url_map):
+    """
+    查找文件对应的名单条目
+
+    优先只读文件头的 "链接:" 行，按规范化URL直接查表；没有文件头时才读全文，
+    在其中出现的名单URL里取最长（最具体）的一个。
+
+    Returns:
+        tuple: (URL, 序号, 名称)，未匹配时为 None
+    """
+    header = read_header(filepath)
+    if 'url' in header:
+        return name_url_map.get(normalize_url(header['url']))
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    matches = [name_url_map[key] for key in map(normalize_url, URL_PATTERN.findall(content)) if key in name_url_map]
+    return max(matches, key=lambda m: len(m[0]), default=None)
+
+
+def plan_renames(target_folder, name_url_map):
+    """
+    一次计算出所有重命名，不修改任何文件
+
+    保持原名的文件先占住自己的名字，其余文件按文件名顺序分配新名字，
+    冲突时加 _1、_2 …… 后缀。
+
+    Returns:
+        list: (原文件名, 新文件名) 列表，只包含需要改名的文件
+    """
+    targets = {}
+    for filename in sorted(os.listdir(target_folder)):
         if filename.endswith('.txt'):
-            filepath = os.path.join(TARGET_FOLDER, filename)
-            
+            filepath = os.path.join(target_folder, filename)
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 从内容中提取所有URL
-                url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-                content_urls = re.findall(url_pattern, content)
-                
-                # 查找匹配的URL - 使用精确匹配
-                matched_serial = None
-                matched_name = None
-                for url in sorted_urls:
-                    if url in content_urls:
-                        matched_serial, matched_name = name_url_map[url]
-                        print(f"在文件 {filename} 中找到匹配URL: {url}")
-                        break
-                
-                if matched_serial and matched_name:
-                    # 清理文件名
-                    clean_name = re.sub(r'[<>:"/\\|?*]', '_', matched_name)
-                    # 使用序号和名称组合新文件名
-                    new_filename = f"{matched_serial}.{clean_name}.txt"
-                    new_filepath = os.path.join(TARGET_FOLDER, new_filename)
-                    
-                    # 处理文件名冲突
-                    counter = 1
-                    original_new_filepath = new_filepath
-                    while os.path.exists(new_filepath) and new_filepath != filepath:
-                        name_without_ext = f"{matched_serial}.{clean_name}"
-                        new_filename = f"{name_without_ext}_{counter}.txt"
-                        new_filepath = os.path.join(TARGET_FOLDER, new_filename)
-                        counter += 1
-                    
-                    # 只有当文件名不同时才重命名
-                    if new_filepath != filepath:
-                        os.rename(filepath, new_filepath)
-                        print(f"重命名: {filename} -> {new_filename}")
-                    else:
-                        print(f"跳过: {filename} (文件名已正确)")
-                else:
-                    print(f"跳过: {filename} (未找到匹配的URL)")
-                    
+                matched = match_file(filepath, name_url_map)
             except Exception as e:
                 print(f"处理文件 {filename} 时出错: {e}")
+                continue
+            if matched:
+                url, serial, name = matched
+                print(f"在文件 {filename} 中找到匹配URL: {url}")
+                # 清理文件名
+                clean_name = textnorm.clean_filename(name)
+                # 使用序号和名称组合新文件名
+                targets[filename] = f"{serial}.{clean_name}"
+            else:
+                print(f"跳过: {filename} (未找到匹配的URL)")
+
+    # 不改名的文件（未匹配或名字已正确）保留原名
+    taken = {f for f in os.listdir(target_folder) if targets.get(f, f[:-4]) + '.txt' == f}
+    plan = []
+    for filename, stem in targets.items():
+        if stem + '.txt' == filename:
+            print(f"跳过: {filename} (文件名已正确)")
+            continue
+        new_filename = f"{stem}.txt"
+        counter = 1
+        while new_filename in taken:
+            new_filename = f"{stem}_{counter}.txt"
+            counter += 1
+        taken.add(new_filename)
+        plan.append((filename, new_filename))
+    return plan
+
+
+def apply_renames(target_folder, plan):
+    """
+    执行重命名计划
+
+    先把所有待改名文件移到临时名，再移到新名，这样互换名字、链式改名也不会互相覆盖；
+    中途出错时把已移动的文件恢复原名。
+    """
+    moved = []  # [原文件名, 当前文件名]
+    try:
+        for i, (filename, _) in enumerate(plan):
+            tmp_filename = f".renaming-{i}.tmp"
+            os.rename(os.path.join(target_folder, filename), os.path.join(target_folder, tmp_filename))
+            moved.append([filename, tmp_filename])
+        for entry, (_, new_filename) in zip(moved, plan):
+            os.rename(os.path.join(target_folder, entry[1]), os.path.join(target_folder, new_filename))
+            entry[1] = new_filename
+    except OSError as e:
+        print(f"重命名失败，恢复原文件名: {e}")
+        for filename, current in reversed(moved):
+            os.rename(os.path.join(target_folder, current), os.path.join(target_folder, filename))
+        raise
+    for filename, new_filename in plan:
+        print(f"重命名: {filename} -> {new_filename}")
+
+
+def numbered_rename(name_list_file=NAME_LIST_FILE, target_folder=TARGET_FOLDER, dry_run=False):
+    """保留序号的精确匹配URL重命名版本"""
+    name_url_map = load_name_list(name_list_file)
+    plan = plan_renames(target_folder, name_url_map)
+    if dry_run:
+        for filename, new_filename in plan:
+            print(f"将重命名: {filename} -> {new_filename}")
+        print(f"共 {len(plan)} 个文件需要重命名（未执行）")
+        return plan
+    apply_renames(target_folder, plan)
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按名单中的序号和名称重命名文章文件")
+    parser.add_argument('--list', default=NAME_LIST_FILE, help="名单文件路径")
+    parser.add_argument('--folder', default=TARGET_FOLDER, help="要处理的文件夹路径")
+    parser.add_argument('--dry-run', action='store_true', help="只显示重命名计划，不修改文件")
+    args = parser.parse_args()
+    numbered_rename(args.list, args.folder, args.dry_run)
 
 if __name__ == "__main__":
-    numbered_rename()
\ No newline at end of file
+    main()
\ No newline at end of file
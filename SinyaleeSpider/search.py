@@ -0,0 +1,207 @@
+import argparse
+import math
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import Counter
+
+from archive import ARCHIVE_DIR, OUTPUT_DIR, iter_article_files, read_article
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_index.db')
+T2S_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 't2s_chars.txt')
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+# 连续的中日文字符按二元组切分，其他字母数字按单词切分
+TOKEN_PATTERN = re.compile(
+    r'(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|(?P<word>[0-9a-z\u00c0-\u024f]+)')
+
+
+def load_t2s_table(path=T2S_FILE):
+    """读取繁体 -> 简体单字对照表，返回 str.translate 用的表"""
+    mapping = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                for i in range(0, len(line) - 1, 2):
+                    mapping[ord(line[i])] = line[i + 1]
+    return mapping
+
+
+T2S_TABLE = load_t2s_table()
+
+
+def fold_text(text):
+    """统一文本写法：全角转半角、转小写、繁体转简体，使繁简写法得到相同的词项"""
+    return unicodedata.normalize('NFKC', text).lower().translate(T2S_TABLE)
+
+
+def tokenize(text):
+    """
+    把文本切分为词项
+
+    中日文连续字符取相邻二元组（单个字时取单字），英文和数字按单词。
+    例如 "關於清華姚班 USACO" -> ['关于', '于清', '清华', '华姚', '姚班', 'usaco']
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(fold_text(text)):
+        run = match.group('cjk')
+        if run is None:
+            tokens.append(match.group('word'))
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class SearchIndex:
+    """
+    持久化倒排索引（SQLite）
+
+    postings 表以 (term, doc) 为主键聚簇存放，查询一个词项只需一次索引范围扫描。
+    update() 按文件修改时间和大小增量更新：只重建新增或改动的文件，删除已不存在的文件。
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                title TEXT,
+                url TEXT
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def update(self, roots=(ARCHIVE_DIR, OUTPUT_DIR)):
+        """
+        增量更新索引
+
+        Returns:
+            tuple: (新增或更新的文件数, 删除的文件数)
+        """
+        known = {path: (doc_id, mtime, size)
+                 for doc_id, path, mtime, size in self.conn.execute("SELECT id, path, mtime, size FROM docs")}
+        seen = set()
+        changed = 0
+        with self.conn:
+            for root in roots:
+                for path in iter_article_files(root):
+                    path = os.path.abspath(path)
+                    seen.add(path)
+                    st = os.stat(path)
+                    old = known.get(path)
+                    if old and old[1] == st.st_mtime and old[2] == st.st_size:
+                        continue
+                    if old:
+                        self.remove(old[0])
+                    self.add(path, st)
+                    changed += 1
+            removed = [doc_id for path, (doc_id, _, _) in known.items() if path not in seen]
+            for doc_id in removed:
+                self.remove(doc_id)
+        return changed, len(removed)
+
+    def add(self, path, st):
+        article = read_article(path)
+        title = article.get('title', '')
+        terms = Counter(tokenize(title + '\n' + article['content']))
+        cursor = self.conn.execute(
+            "INSERT INTO docs (path, mtime, size, length, title, url) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, st.st_mtime, st.st_size, sum(terms.values()), title, article.get('url')))
+        self.conn.executemany("INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                              ((term, cursor.lastrowid, tf) for term, tf in terms.items()))
+
+    def remove(self, doc_id):
+        self.conn.execute("DELETE FROM postings WHERE doc = ?", (doc_id,))
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+
+    def search(self, query, limit=10):
+        """
+        BM25 排序查询
+
+        Args:
+            query: 查询文本，繁简体均可
+            limit: 返回结果数
+
+        Returns:
+            list: (得分, 路径, 标题, URL) 按得分从高到低
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        lengths = dict(self.conn.execute("SELECT id, length FROM docs"))
+        if not lengths:
+            return []
+        avgdl = sum(lengths.values()) / len(lengths)
+        scores = Counter()
+        for term in terms:
+            rows = self.conn.execute("SELECT doc, tf FROM postings WHERE term = ?", (term,)).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (len(lengths) - len(rows) + 0.5) / (len(rows) + 0.5))
+            for doc_id, tf in rows:
+                norm = K1 * (1 - B + B * lengths[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+        results = []
+        for doc_id, score in scores.most_common(limit):
+            path, title, url = self.conn.execute(
+                "SELECT path, title, url FROM docs WHERE id = ?", (doc_id,)).fetchone()
+            results.append((score, path, title, url))
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="归档文章全文搜索")
+    parser.add_argument('query', nargs='*', help="查询内容，为空时只更新索引")
+    parser.add_argument('-n', '--limit', type=int, default=10, help="显示结果数")
+    parser.add_argument('--index', default=INDEX_FILE, help="索引文件路径")
+    parser.add_argument('--no-update', action='store_true', help="不检查新文件，直接查询")
+    args = parser.parse_args()
+
+    with SearchIndex(args.index) as index:
+        if not args.no_update:
+            start = time.perf_counter()
+            changed, removed = index.update()
+            if changed or removed:
+                print(f"索引已更新: 新增/改动 {changed} 个文件，删除 {removed} 个 "
+                      f"({time.perf_counter() - start:.2f} s)")
+        if not args.query:
+            return
+        start = time.perf_counter()
+        results = index.search(' '.join(args.query), args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for rank, (score, path, title, url) in enumerate(results, 1):
+            print(f"{rank:2d}. [{score:6.2f}] {title or os.path.basename(path)}  {url or ''}")
+            print(f"    {path}")
+        print(f"共 {len(results)} 条结果，查询用时 {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,148 @@
 import requests
-from bs4 import BeautifulSoup
+import hashlib
+import html
 import os
 import time
 import re
 from urllib.parse import urljoin, urlparse
 import random
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from fetcher import ConcurrentFetcher, RetryScheduler
+from frontier import Frontier, article_first, normalize_url
+from crawlstate import CrawlState
+from httpcache import HTTPCache
+from pageparse import make_soup
+from profiles import ExtractionProfiles
+from articlestore import ArticleStore
+from pipeline import PagePipeline
+from metrics import NULL_METRICS, Metrics
+from crawlsummary import CrawlSummary, compact_manifest, read_manifest
+import textnorm
+from archive import iter_article_files, read_header
+from wpdiscovery import WordPressDiscovery
+from transport import Transport
+from warc import WarcWriter
 
 class BlogScraper:
-    def __init__(self):
-        self.base_url = "https://sinyalee.com/blog/"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, base_url="https://sinyalee.com/blog/", state_file=None, cache_file=None, profile_file=None,
+                 metrics=None, manifest_file=None, transport=None, warc_file=None, retries=None):
+        self.base_url = base_url
+        self.domain = urlparse(base_url).hostname  # 只爬取该域名下的链接
+        # 各阶段耗时统计（metrics.Metrics），不指定时不做任何统计
+        self.metrics = metrics or NULL_METRICS
+        # 共用的传输层（连接池、压缩、可选 HTTP/2），可由多个爬虫实例共享
+        self.transport = transport or Transport(metrics=self.metrics)
+        self.session = self.transport.session
         self.timeout = 30
         self.visited_urls = set()  # 记录已访问的URL，避免重复爬取
+        self.follow_links = True  # 为 False 时只抓取给定的页面，不跟踪其中的链接
+        # 断点续爬：记录待爬取/已完成的URL，中断后再次运行时从上次的位置继续
+        self.state = CrawlState(state_file) if state_file else None
+        # HTTP缓存：用 ETag/Last-Modified 条件请求，未变化的页面只传输响应头
+        self.cache = HTTPCache(cache_file) if cache_file else None
+        # 提取配置：学习每个站点实际命中的选择器，之后的页面不再逐个试探
+        self.profiles = ExtractionProfiles(profile_file)
+        self.stores = {}  # 输出目录 -> ArticleStore
+        # 文章清单（JSONL）：汇总报告的文章列表逐篇写入该文件，不在内存中保留全部文章
+        self.manifest_file = manifest_file
+        # 原始响应写入 WARC，修改提取逻辑后可以用 reextract.py 离线重新提取，不必重新爬取
+        self.warc = WarcWriter(warc_file) if warc_file else None
+        # 失败的页面放入重试队列，到期后再抓取，等待期间继续抓取其他页面；同时负责熔断和死信列表
+        self.retries = retries if retries is not None else RetryScheduler()
+        self.ready_retries = deque()  # 已到期、等待发出的重试
         
     def clean_text(self, text):
         """清理文本，移除多余空白和特殊字符"""
         if not text:
             return ""
-        # 移除HTML标签
-        text = re.sub(r'<[^>]+>', '', text)
-        # 替换多个空白字符为单个空格
-        text = re.sub(r'\s+', ' ', text)
-        # 移除首尾空白
-        return text.strip()
+        with self.metrics.timer('clean_seconds'):
+            # 移除HTML标签，合并空白字符并去掉首尾空白
+            return textnorm.clean_text(text)
     
     def clean_filename(self, filename):
-        """清理文件名，移除非法字符"""
-        if not filename:
-            return "未分类"
-        # 移除HTML标签
-        filename = re.sub(r'<[^>]+>', '', filename)
-        # 替换多个空白字符为单个空格
-        filename = re.sub(r'\s+', ' ', filename)
-        # 移除文件名非法字符
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        # 限制文件名长度
-        filename = filename.strip()[:100]
-        return filename if filename else "未分类"
-    
-    def get_page_content_with_retry(self, url, max_retries=3):
-        """获取指定页面的内容，带重试机制"""
-        for attempt in range(max_retries):
+        """清理文件名，非法字符替换为下划线（规则见 textnorm.clean_filename）"""
+        return textnorm.clean_filename(filename) or "未分类"
+    
+    def get_page_content_with_retry(self, url):
+        """获取指定页面的内容，失败时等待后重试（单独抓取个别页面时使用，抓取循环不等待，见 fetch_page）"""
+        response = self.get_response_with_retry(url)
+        return response.text if response is not None else None
+    
+    def get_response_with_retry(self, url):
+        """同上，返回响应对象（HTTP缓存确认页面未变化时 from_cache 为 True），最终失败时返回 None"""
+        while True:
+            response = self.fetch_response(url)
+            if response is not None or not self.retries.is_scheduled(url):
+                return response
+            self.retries.wait_for(url)
+    
+    def fetch_page(self, url):
+        """抓取循环使用：请求一次，返回页面内容；失败时返回 None，是否重试由 self.retries 安排"""
+        response = self.fetch_response(url)
+        return response.text if response is not None else None
+    
+    def fetch_response(self, url):
+        """发出一次请求，成功时返回响应；失败时交给重试队列安排重试（不等待）或记入死信，返回 None"""
+        with self.metrics.timer('fetch_seconds'):
             try:
-                print(f"  尝试获取页面 (尝试 {attempt+1}/{max_retries})...")
-                response = self.session.get(url, timeout=self.timeout)
+                if self.cache:
+                    response = self.cache.get(self.session, url, timeout=self.timeout)
+                else:
+                    response = self.session.get(url, timeout=self.timeout)
                 response.raise_for_status()
-                print(f"  成功获取页面: {url}")
-                return response.text
             except requests.RequestException as e:
-                print(f"  获取页面失败 (尝试 {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)
-                    print(f"  等待 {wait_time:.2f} 秒后重试...")
-                    time.sleep(wait_time)
+                failed = e.response
+                status = failed.status_code if failed is not None else None
+                retry_after = failed.headers.get('Retry-After', '') if failed is not None else ''
+                delay = self.retries.record_failure(url, e, status, float(retry_after) if retry_after.isdigit() else None)
+                if delay is not None:
+                    self.metrics.inc('retries')
+                    print(f"  获取页面失败，{delay:.2f} 秒后重试: {e}")
                 else:
-                    print(f"  页面获取失败，已尝试{max_retries}次: {url}")
-        return None
+                    self.metrics.inc('fetch_failures')
+                    print(f"  页面获取失败，已记入死信列表: {url} ({e})")
+                return None
+        self.retries.record_success(url)
+        print(f"  成功获取页面: {url}")
+        self.archive_response(response)
+        return response
+    
+    def next_url(self, frontier, allow_new=True):
+        """
+        下一个要抓取的URL：先取已到期的重试，再从待爬取队列取新的（allow_new 为 False 或主机熔断中时不取）
+    
+        Returns:
+            tuple: (URL, 是否为新URL)；暂时没有可抓取的URL时为 (None, False)
+        """
+        self.ready_retries.extend(self.retries.pop_due())
+        if self.ready_retries:
+            return self.ready_retries.popleft(), False
+        if allow_new and frontier and not self.retries.paused_until(self.base_url):
+            return frontier.pop(), True
+        return None, False
     
-    def extract_article_links(self, html_content, base_url):
-        """从页面HTML中提取文章链接"""
+    def idle_timeout(self, frontier, allow_new=True):
+        """距离下一个重试到期（或主机熔断结束、可以继续取新URL）的秒数；没有等待中的工作时为 None"""
+        wait_time = self.retries.time_to_next()
+        paused_until = self.retries.paused_until(self.base_url) if allow_new and frontier else None
+        if paused_until is not None:
+            resume = paused_until - time.monotonic()
+            wait_time = resume if wait_time is None else min(wait_time, resume)
+        return wait_time
+    
+    def archive_response(self, response):
+        """把成功的响应写入 WARC（未启用时不做任何事）"""
+        if self.warc and response.status_code == 200:
+            self.warc.write_response(response)
+    
+    def extract_article_links(self, html_content, base_url, soup=None):
+        """从页面HTML中提取文章链接（已解析过的页面可直接传入 soup）"""
         if not html_content:
             return []
             
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if soup is None:
+            soup = make_soup(html_content)
         article_links = []
         
         # 查找所有链接
@@ -79,7 +156,7 @@ class BlogScraper:
                     href = urljoin(base_url, href)
                 
                 # 只关注博客域名内的链接
-                if 'sinyalee.com' in href and href not in self.visited_urls:
+                if self.domain in href and href not in self.visited_urls:
                     # 排除一些非内容页面
                     if any(x in href for x in ['/feed', '/wp-json', '/wp-admin', '/wp-content', '.xml', '.rss']):
                         continue
@@ -90,36 +167,33 @@ class BlogScraper:
         
         return list(set(article_links))  # 去重
     
-    def extract_article_content(self, html_content, url):
-        """提取文章页面的详细内容"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+    def extract_article_content(self, html_content, url, soup=None):
+        """提取文章页面的详细内容（已解析过的页面可直接传入 soup，注意会删除其中的脚本、导航等元素）"""
+        if soup is None:
+            soup = make_soup(html_content)
+        # 各字段按候选选择器的优先级提取；站点的提取配置确定后直接使用命中的选择器
+        host = urlparse(url).netloc
         
         # 提取标题
         title_selectors = ['h1', '.post-title', '.entry-title', 'title']
         title = "未知标题"
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = self.clean_text(title_elem.get_text())
-                break
+        title_elem = self.profiles.select_one(soup, host, 'title', title_selectors)
+        if title_elem:
+            title = self.clean_text(title_elem.get_text())
         
         # 提取发布日期
         date_selectors = ['.post-date', '.entry-date', '.published', 'time']
         publish_date = "未知日期"
-        for selector in date_selectors:
-            date_elem = soup.select_one(selector)
-            if date_elem:
-                publish_date = self.clean_text(date_elem.get_text())
-                break
+        date_elem = self.profiles.select_one(soup, host, 'publish_date', date_selectors)
+        if date_elem:
+            publish_date = self.clean_text(date_elem.get_text())
         
         # 提取作者
         author_selectors = ['.author', '.post-author', '.entry-author']
         author = "未知作者"
-        for selector in author_selectors:
-            author_elem = soup.select_one(selector)
-            if author_elem:
-                author = self.clean_text(author_elem.get_text())
-                break
+        author_elem = self.profiles.select_one(soup, host, 'author', author_selectors)
+        if author_elem:
+            author = self.clean_text(author_elem.get_text())
         
         # 提取内容
         content_selectors = [
@@ -132,14 +206,12 @@ class BlogScraper:
         ]
         
         content = ""
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # 移除脚本和样式
-                for script in content_elem(["script", "style", "nav", "header", "footer"]):
-                    script.decompose()
-                content = self.clean_text(content_elem.get_text())
-                break
+        content_elem = self.profiles.select_one(soup, host, 'content', content_selectors)
+        if content_elem:
+            # 移除脚本和样式
+            for script in content_elem(["script", "style", "nav", "header", "footer"]):
+                script.decompose()
+            content = self.clean_text(content_elem.get_text())
         
         # 如果没有内容，尝试更通用的方法
         if not content:
@@ -159,12 +231,10 @@ class BlogScraper:
             '.cat-links a'
         ]
         categories = []
-        for selector in category_selectors:
-            cat_elems = soup.select(selector)
-            for elem in cat_elems:
-                cat_text = self.clean_text(elem.get_text())
-                if cat_text and len(cat_text) < 50:
-                    categories.append(cat_text)
+        for elem in self.profiles.select_all(soup, host, 'categories[]', category_selectors):
+            cat_text = self.clean_text(elem.get_text())
+            if cat_text and len(cat_text) < 50:
+                categories.append(cat_text)
         
         # 如果没有找到分类，使用默认分类
         if not categories:
@@ -179,178 +249,573 @@ class BlogScraper:
             'author': author
         }
     
+    def format_article(self, article_data):
+        """生成文章文件的内容：文件头、分隔线和正文"""
+        return (
+            f"标题: {article_data['title']}\n"
+            f"链接: {article_data['url']}\n"
+            f"作者: {article_data['author']}\n"
+            f"发布日期: {article_data['publish_date']}\n"
+            f"分类: {', '.join(article_data['categories'])}\n"
+            + "="*80 + "\n"
+            + article_data['content']
+        )
+    
+    def article_store(self, base_dir):
+        """每个输出目录一个 ArticleStore"""
+        if base_dir not in self.stores:
+            self.stores[base_dir] = ArticleStore(base_dir)
+        return self.stores[base_dir]
+    
+    def collect_garbage(self):
+        """删除各输出目录中已没有分类文件引用的对象（文章内容改变后旧内容的对象）"""
+        for base_dir, store in self.stores.items():
+            removed = store.gc()
+            if removed:
+                print(f"已删除 {base_dir} 中不再使用的 {removed} 个旧版本文件")
+    
     def save_article(self, article_data, base_dir="blog_content"):
-        """保存文章到txt文件"""
+        """保存文章到txt文件
+        
+        文件内容只写一次（按内容哈希存放在 base_dir/.objects），各分类目录和“所有文章”
+        中的文件都是指向它的硬链接；重复的分类只保存一次，内容未变时不做任何写入。
+        """
         if not article_data:
             return
         
-        if not os.path.exists(base_dir):
-            os.makedirs(base_dir)
+        with self.metrics.timer('write_seconds'):
+            self.write_article(article_data, base_dir)
+    
+    def write_article(self, article_data, base_dir):
+        store = self.article_store(base_dir)
+        object_path = store.put(self.format_article(article_data))
         
-        # 按分类保存
-        for category in article_data['categories']:
-            clean_category = self.clean_filename(category)
-            if not clean_category:
-                clean_category = "未分类"
-                
+        clean_title = self.clean_filename(article_data['title'])
+        if not clean_title:
+            clean_title = "无标题"
+        filename = f"{clean_title}.txt"
+        
+        # 按分类保存（去掉重复的分类），同时保存到总目录
+        categories = dict.fromkeys(self.clean_filename(c) or "未分类" for c in article_data['categories'])
+        for clean_category in list(categories) + ["所有文章"]:
             category_dir = os.path.join(base_dir, clean_category)
-            if not os.path.exists(category_dir):
-                os.makedirs(category_dir)
-            
-            clean_title = self.clean_filename(article_data['title'])
-            if not clean_title:
-                clean_title = "无标题"
-                
-            filename = f"{clean_title}.txt"
-            filepath = os.path.join(category_dir, filename)
-            
             try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(f"标题: {article_data['title']}\n")
-                    f.write(f"链接: {article_data['url']}\n")
-                    f.write(f"作者: {article_data['author']}\n")
-                    f.write(f"发布日期: {article_data['publish_date']}\n")
-                    f.write(f"分类: {', '.join(article_data['categories'])}\n")
-                    f.write("="*80 + "\n")
-                    f.write(article_data['content'])
-                print(f"    已保存: {filename}")
-            except Exception as e:
+                if store.link(object_path, os.path.join(category_dir, filename)):
+                    print(f"    已保存: {clean_category}/{filename}")
+            except OSError as e:
                 print(f"    保存文件失败: {e}")
                 # 尝试使用简单文件名
                 simple_filename = f"article_{hash(article_data['url'])}.txt"
-                simple_filepath = os.path.join(category_dir, simple_filename)
-                with open(simple_filepath, 'w', encoding='utf-8') as f:
-                    f.write(f"标题: {article_data['title']}\n")
-                    f.write(f"链接: {article_data['url']}\n")
-                    f.write(f"作者: {article_data['author']}\n")
-                    f.write(f"发布日期: {article_data['publish_date']}\n")
-                    f.write(f"分类: {', '.join(article_data['categories'])}\n")
-                    f.write("="*80 + "\n")
-                    f.write(article_data['content'])
-        
-        # 同时保存到总目录
-        all_articles_dir = os.path.join(base_dir, "所有文章")
-        if not os.path.exists(all_articles_dir):
-            os.makedirs(all_articles_dir)
+                store.link(object_path, os.path.join(category_dir, simple_filename))
+    
+    def is_article_url(self, url):
+        """判断URL是否为文章页面（而非分类、翻页等列表页）"""
+        return any(x in url for x in ['/blog/', '/article/', '/post/']) and '?cat=' not in url and '?paged=' not in url
+    
+    def parse_page(self, html_content, url):
+        """只解析一次页面，同时得到文章内容（不是文章页时为 None）和页面中的链接"""
+        with self.metrics.timer('parse_seconds'):
+            soup = make_soup(html_content)
+        # 先提取链接：提取正文时会删除正文中的导航、页眉页脚等元素
+        with self.metrics.timer('links_seconds'):
+            links = self.extract_article_links(html_content, url, soup)
+        article_data = None
+        # 检查这是否是文章页面
+        if self.is_article_url(url):
+            with self.metrics.timer('extract_seconds'):
+                article_data = self.extract_article_content(html_content, url, soup)
+        return article_data, links
+    
+    def process_page(self, url, html_content, frontier, summary):
+        """处理一个已下载的页面：提取并保存文章，把新发现的链接加入待爬取队列，返回处理结果说明"""
+        outcome = 'listing'
+        article_data, links = self.parse_page(html_content, url)
+        if article_data and article_data['content']:
+            self.save_article(article_data)
+            summary.add(article_data)
+            print(f"  成功提取文章: {article_data['title']}")
+            outcome = 'article'
         
-        clean_title = self.clean_filename(article_data['title'])
-        if not clean_title:
-            clean_title = "无标题"
-            
-        filename = f"{clean_title}.txt"
-        filepath = os.path.join(all_articles_dir, filename)
+        # 新发现的链接加入队列，队列按规范化URL去重
+        self.enqueue_links(links, frontier)
+        return outcome
+    
+    def enqueue_links(self, links, frontier):
+        """把页面中的链接加入待爬取队列（follow_links 为 False 时忽略）"""
+        if not self.follow_links:
+            return
+        for link in links:
+            if frontier.add(link) and self.state:
+                self.state.record_queued(link)
+    
+    def record_result(self, url, html_content, frontier, summary):
+        """处理抓取结果，并在断点续爬状态中记录该URL已完成或失败"""
+        if not html_content:
+            if self.state:
+                self.state.record_failed(url, '获取失败')
+            return False
+        outcome = self.process_page(url, html_content, frontier, summary)
+        if self.state:
+            self.state.record_done(url, outcome)
+        return True
+    
+    def init_frontier(self, start_urls, prioritize_articles=False):
+        """创建待爬取队列；有未完成的爬取状态时，跳过已完成的URL并先恢复上次的队列"""
+        frontier = Frontier(priority=article_first if prioritize_articles else None)
+        if self.state:
+            pending = self.state.pending_urls()
+            if pending:
+                done = self.state.done_urls()
+                print(f"从断点继续: 已完成 {len(done)} 个页面，待爬取 {len(pending)} 个")
+                for url in done:
+                    frontier.mark_seen(url)
+                    self.visited_urls.add(url)
+                for url in pending:
+                    frontier.add(url)
+            else:
+                # 上一轮已全部完成（或从未开始），重新开始
+                self.state.reset()
+        for url in self.visited_urls:
+            frontier.mark_seen(url)
+        for url in start_urls:
+            if frontier.add(url) and self.state:
+                self.state.record_queued(url)
+        return frontier
+    
+    def finish_retries(self):
+        """抓取结束（或中断）时，还在重试队列中的页面记入死信"""
+        self.ready_retries.clear()
+        if self.retries:
+            self.retries.abandon_pending("抓取结束时仍在等待重试")
+    
+    def crawl_site(self, start_urls, max_pages=100, workers=1, rate=None, burst=None, prioritize_articles=False,
+                   parse_workers=0, follow_links=True, summary=None):
+        """爬取整个网站的内容
         
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"标题: {article_data['title']}\n")
-                f.write(f"链接: {article_data['url']}\n")
-                f.write(f"作者: {article_data['author']}\n")
-                f.write(f"发布日期: {article_data['publish_date']}\n")
-                f.write(f"分类: {', '.join(article_data['categories'])}\n")
-                f.write("="*80 + "\n")
-                f.write(article_data['content'])
-        except Exception as e:
-            print(f"    保存到总目录失败: {e}")
-    
-    def crawl_site(self, start_urls, max_pages=100):
-        """爬取整个网站的内容"""
-        all_articles = []
-        urls_to_visit = list(start_urls)
+        workers 为 1 且未指定 rate 时逐页抓取，每页之后随机等待 1~3 秒；
+        否则使用并发模式：最多 workers 个请求同时进行，按主机令牌桶限速，
+        每秒不超过 rate 个请求（默认 1），最多突发 burst 个（默认等于 workers）。
+        并发模式下 parse_workers 大于 0 时使用流水线：解析在 parse_workers 个进程中
+        进行，文章由单独的写入线程保存，抓取不再等待解析和写盘。
+        prioritize_articles 为 True 时先抓文章页（?p=），再抓分类、翻页等列表页。
+        follow_links 为 False 时只抓取 start_urls，不跟踪页面中的链接。
         
+        失败的页面按退避时间放入重试队列（self.retries），等待期间继续抓取其他页面；
+        同一主机连续失败时暂停该主机，最终失败的页面记入 self.retries 的死信列表。
+        
+        返回 CrawlSummary：文章数、分类和作者计数，以及逐篇记录的文章列表（不含正文）。
+        从断点继续时沿用上次的文章清单。传入 summary 时文章计入其中（由调用方关闭）。
+        """
+        self.follow_links = follow_links
+        # 每个并发请求都需要一个连接，连接池不小于并发数
+        self.transport.set_pool_size(workers)
+        frontier = self.init_frontier(start_urls, prioritize_articles)
+        own_summary = summary is None
+        if own_summary:
+            summary = CrawlSummary(self.manifest_file, resume=bool(self.state and self.state.done))
+        try:
+            if parse_workers > 0 and (workers > 1 or rate is not None):
+                self.crawl_pipeline(frontier, summary, max_pages, workers, rate or 1.0, burst, parse_workers)
+            elif workers > 1 or rate is not None:
+                self.crawl_concurrent(frontier, summary, max_pages, workers, rate or 1.0, burst)
+            else:
+                self.crawl_sequential(frontier, summary, max_pages)
+        finally:
+            self.finish_retries()
+            # 中断时也把已缓存的状态写入磁盘
+            if self.state:
+                self.state.flush()
+            self.profiles.save()
+            self.collect_garbage()
+            if own_summary:
+                summary.close()
+        return summary
+    
+    def crawl_sequential(self, frontier, summary, max_pages):
+        """逐页抓取，每页之后随机等待 1~3 秒；失败的页面到期后再重试，等待期间先抓其他页面"""
         page_count = 0
-        while urls_to_visit and page_count < max_pages:
-            url = urls_to_visit.pop(0)
-            
-            # 跳过已访问的URL
-            if url in self.visited_urls:
+        while True:
+            url, is_new = self.next_url(frontier, page_count < max_pages)
+            if url is None:
+                # 只剩等待中的重试（或主机熔断中）
+                wait_time = self.idle_timeout(frontier, page_count < max_pages)
+                if wait_time is None:
+                    break
+                time.sleep(wait_time)
                 continue
-                
+            
             print(f"正在处理: {url}")
             self.visited_urls.add(url)
             
-            html_content = self.get_page_content_with_retry(url)
-            if not html_content:
+            html_content = self.fetch_page(url)
+            if html_content is None and self.retries.is_scheduled(url):
+                continue
+            if not self.record_result(url, html_content, frontier, summary):
                 continue
-            
-            # 检查这是否是文章页面
-            if any(x in url for x in ['/blog/', '/article/', '/post/']) and '?cat=' not in url and '?paged=' not in url:
-                # 这是文章页面，提取内容
-                article_data = self.extract_article_content(html_content, url)
-                if article_data and article_data['content']:
-                    self.save_article(article_data)
-                    all_articles.append(article_data)
-                    print(f"  成功提取文章: {article_data['title']}")
-            
-            # 从当前页面提取更多链接
-            new_links = self.extract_article_links(html_content, url)
-            for link in new_links:
-                if link not in self.visited_urls and link not in urls_to_visit:
-                    urls_to_visit.append(link)
             
             page_count += 1
             
             # 随机延迟，避免被屏蔽
             delay = random.uniform(1, 3)
             time.sleep(delay)
+    
+    def crawl_concurrent(self, frontier, summary, max_pages, workers, rate, burst=None):
+        """并发抓取：下载在线程池中进行，解析和保存仍在当前线程依次完成"""
+        page_count = 0
+        with ConcurrentFetcher(self.fetch_page, workers, rate, burst) as fetcher:
+            while True:
+                # 补满在途请求（先发已到期的重试）
+                while fetcher.has_capacity():
+                    url, is_new = self.next_url(frontier, page_count < max_pages)
+                    if url is None:
+                        break
+                    print(f"正在处理: {url}")
+                    self.visited_urls.add(url)
+                    fetcher.submit(url)
+                    page_count += is_new
+                
+                wait_time = self.idle_timeout(frontier, page_count < max_pages)
+                if not fetcher.pending:
+                    if wait_time is None:
+                        break
+                    time.sleep(wait_time)
+                    continue
+                
+                # 有重试将要到期时不一直等在途请求
+                for url, html_content in fetcher.completed(wait_time):
+                    if html_content is None and self.retries.is_scheduled(url):
+                        continue
+                    self.record_result(url, html_content, frontier, summary)
+    
+    def write_articles(self, batch):
+        """流水线写入线程：保存一批 (url, 文章)，写入结果即文章本身，由主线程计入汇总"""
+        for url, article_data in batch:
+            self.save_article(article_data)
+        return [article_data for url, article_data in batch]
+    
+    def crawl_pipeline(self, frontier, summary, max_pages, workers, rate, burst=None, parse_workers=2,
+                       report_interval=10.0):
+        """流水线抓取：下载（线程池）-> 解析（进程池）-> 保存（写入线程），各阶段之间的队列都有上限
         
-        return all_articles
+        解析进程使用启动时提取配置的副本，其中新学到的选择器不会写回配置文件。
+        每隔 report_interval 秒以及结束时打印各阶段的吞吐量和队列深度。
+        """
+        page_count = 0
+        last_report = time.monotonic()
+        pipeline = PagePipeline(parse_page_in_worker, self.write_articles, parse_workers,
+                                initializer=init_parse_worker, initargs=(self.base_url, self.profiles.sites),
+                                raw_limit=max(workers * 4, parse_workers * 4))
+        with pipeline, ConcurrentFetcher(pipeline.timed(self.fetch_page), workers, rate, burst) as fetcher:
+            while True:
+                # 原始页面积压过多时暂停提交，等解析跟上
+                while fetcher.has_capacity() and not pipeline.full():
+                    url, is_new = self.next_url(frontier, page_count < max_pages)
+                    if url is None:
+                        break
+                    print(f"正在处理: {url}")
+                    self.visited_urls.add(url)
+                    fetcher.submit(url)
+                    page_count += is_new
+                pipeline.stats['fetch'].set_depth(len(fetcher.pending))
+                
+                wait_time = self.idle_timeout(frontier, page_count < max_pages)
+                if not fetcher.pending and not pipeline.busy():
+                    if wait_time is None:
+                        break
+                    time.sleep(wait_time)
+                    continue
+                
+                done, _ = wait(list(fetcher.pending) + pipeline.futures(), timeout=wait_time,
+                               return_when=FIRST_COMPLETED)
+                for url, html_content in fetcher.collect(done):
+                    if html_content:
+                        pipeline.put(url, html_content)
+                    elif self.retries.is_scheduled(url):
+                        continue
+                    elif self.state:
+                        self.state.record_failed(url, '获取失败')
+                
+                for url, result in pipeline.collect(done):
+                    article_data, links = result or (None, [])
+                    self.enqueue_links(links, frontier)
+                    if article_data and article_data['content']:
+                        print(f"  成功提取文章: {article_data['title']}")
+                        # 写入线程保存后才记为完成
+                        pipeline.write(url, article_data)
+                    elif self.state:
+                        self.state.record_done(url, 'listing' if result else '解析失败')
+                
+                self.record_written(pipeline, summary)
+                if time.monotonic() - last_report >= report_interval:
+                    last_report = time.monotonic()
+                    print(pipeline.report())
+        self.record_written(pipeline, summary)
+        print(pipeline.report())
     
-    def scrape_blog_pages(self, start_page=1, end_page=24):
+    def record_written(self, pipeline, summary):
+        """把写入线程已保存的文章计入汇总并记为完成"""
+        for url, article_data in pipeline.written():
+            summary.add(article_data)
+            if self.state:
+                self.state.record_done(url, 'article')
+    
+    def scrape_blog_pages(self, start_page=1, end_page=24, workers=1, rate=None, burst=None, prioritize_articles=False,
+                          parse_workers=0):
         """爬取博客的特定页面范围"""
         start_urls = [f"{self.base_url}?paged={i}" for i in range(start_page, end_page + 1)]
-        return self.crawl_site(start_urls, max_pages=500)  # 增加最大页面数
+        return self.crawl_site(start_urls, max_pages=500, workers=workers, rate=rate, burst=burst,
+                               prioritize_articles=prioritize_articles, parse_workers=parse_workers)  # 增加最大页面数
     
-    def generate_summary(self, all_articles):
-        """生成汇总报告"""
-        summary_file = "博客爬取汇总报告.txt"
+    def article_from_post(self, post, categories, authors):
+        """把 REST API 返回的文章转换为与 extract_article_content 相同格式的字典"""
+        title = self.clean_text(html.unescape(post.get('title', {}).get('rendered', ''))) or "未知标题"
+        content = ""
+        rendered = post.get('content', {}).get('rendered', '')
+        if rendered:
+            content = self.clean_text(make_soup(rendered).get_text())
         
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write("博客爬取汇总报告\n")
-            f.write("="*80 + "\n\n")
-            f.write(f"总共爬取文章数量: {len(all_articles)}\n")
-            f.write(f"总共访问页面数量: {len(self.visited_urls)}\n\n")
-            
-            # 分类统计
-            category_count = {}
-            for article in all_articles:
-                for category in article['categories']:
-                    category_count[category] = category_count.get(category, 0) + 1
-            
-            f.write("分类统计:\n")
-            for category, count in sorted(category_count.items(), key=lambda x: x[1], reverse=True):
-                f.write(f"  {category}: {count} 篇\n")
-            
-            # 作者统计
-            author_count = {}
-            for article in all_articles:
-                author = article.get('author', '未知作者')
-                author_count[author] = author_count.get(author, 0) + 1
-            
-            f.write("\n作者统计:\n")
-            for author, count in sorted(author_count.items(), key=lambda x: x[1], reverse=True):
-                f.write(f"  {author}: {count} 篇\n")
-            
-            f.write("\n文章列表:\n")
-            for i, article in enumerate(all_articles, 1):
-                f.write(f"{i}. {article['title']} - {article['url']}\n")
-                f.write(f"   作者: {article['author']} | 日期: {article['publish_date']} | 分类: {', '.join(article['categories'])}\n\n")
+        names = []
+        for cat_id in post.get('categories', []):
+            cat_text = self.clean_text(html.unescape(categories.get(cat_id, '')))
+            if cat_text and len(cat_text) < 50:
+                names.append(cat_text)
+        
+        return {
+            'title': title,
+            'content': content,
+            'categories': names or ['未分类'],
+            'url': post.get('link', ''),
+            'publish_date': (post.get('date') or "未知日期").replace('T', ' '),
+            'author': authors.get(post.get('author'), "未知作者")
+        }
+    
+    def scrape_wordpress(self, workers=1, rate=None, burst=None, parse_workers=0):
+        """用 WordPress 接口列出全部文章，接口不可用时逐级退回
+        
+        1. REST API：几个请求取得全部文章的标题、日期、分类和正文，直接保存；
+        2. 站点地图：得到全部文章地址，只抓取文章页，不跟踪链接；
+        3. 都没有时按原方式从翻页列表开始逐页抓取（scrape_blog_pages）。
+        """
+        discovery = WordPressDiscovery(self.session, self.base_url, self.timeout, on_response=self.archive_response)
+        posts = discovery.posts()
+        if posts is not None:
+            categories = discovery.categories()
+            authors = discovery.authors()
+            with CrawlSummary(self.manifest_file) as summary:
+                for post in posts:
+                    article_data = self.article_from_post(post, categories, authors)
+                    self.visited_urls.add(article_data['url'])
+                    if article_data['content']:
+                        self.save_article(article_data)
+                        summary.add(article_data)
+                        print(f"  成功提取文章: {article_data['title']}")
+            self.collect_garbage()
+            print(f"通过 REST API 获取到 {len(summary)} 篇文章（共 {discovery.requests} 个请求）")
+            return summary
+        
+        urls = discovery.sitemap_urls()
+        if urls:
+            print(f"未找到 REST API，通过站点地图发现 {len(urls)} 篇文章")
+            return self.crawl_site(urls, max_pages=len(urls), workers=workers, rate=rate, burst=burst,
+                                   parse_workers=parse_workers, follow_links=False)
+        
+        print("未找到 REST API 和站点地图，从翻页列表开始逐页抓取")
+        return self.scrape_blog_pages(1, 24, workers=workers, rate=rate, burst=burst, parse_workers=parse_workers)
+    
+    def known_posts(self, archive_dir=None):
+        """已保存的文章：规范化URL -> 正文的 SHA-256（只知道链接时为 None）
+        
+        来源为文章清单，以及 archive_dir（例如 SinyaleeBlogs）中各文件头的“链接:”行。
+        """
+        known = {}
+        if archive_dir and os.path.isdir(archive_dir):
+            for path in iter_article_files(archive_dir):
+                url = read_header(path).get('url')
+                if url:
+                    known[normalize_url(url)] = None
+        if self.manifest_file and os.path.exists(self.manifest_file):
+            for record in read_manifest(self.manifest_file):
+                known[normalize_url(record['url'])] = record.get('sha256')
+        return known
+    
+    def is_post_url(self, url):
+        """文章页（首页本身不算）"""
+        return self.is_article_url(url) and normalize_url(url) != normalize_url(self.base_url)
+    
+    def walk_listing(self, known, stop_after=1, max_listing_pages=50, delay=(1, 3)):
+        """从第一页起按从新到旧的顺序读取翻页列表，连续 stop_after 页都只有已知文章时停止
+        
+        Returns:
+            tuple: (新文章URL列表, 读到的列表页中已保存的文章URL列表)
+        """
+        new_urls, listed = [], []
+        seen = set()
+        quiet = 0
+        for page in range(1, max_listing_pages + 1):
+            url = f"{self.base_url}?paged={page}"
+            print(f"正在处理: {url}")
+            self.visited_urls.add(url)
+            html_content = self.get_page_content_with_retry(url)
+            if not html_content:
+                break
+            links = self.extract_article_links(html_content, url)
+            fresh = 0
+            for link in sorted(links):
+                key = normalize_url(link)
+                if not self.is_post_url(link) or key in seen:
+                    continue
+                seen.add(key)
+                if key in known:
+                    listed.append(link)
+                else:
+                    new_urls.append(link)
+                    fresh += 1
+            quiet = 0 if fresh else quiet + 1
+            # 没有下一页的链接说明已到最后一页
+            if quiet >= stop_after or not any(re.search(rf"paged={page + 1}(?!\d)", link) for link in links):
+                break
+            if delay:
+                time.sleep(random.uniform(*delay))
+        return new_urls, listed
+    
+    def revalidate_posts(self, urls, known, summary, delay=(1, 3)):
+        """重新检查已保存的文章，返回有修改（已重新保存）的文章数
+        
+        有HTTP缓存时发条件请求，服务器返回 304 即未修改，只传输响应头；
+        返回新内容时比较正文的 SHA-256 与清单中的记录，不同（或没有记录）才保存。
+        """
+        changed = 0
+        for url in urls:
+            print(f"检查更新: {url}")
+            self.visited_urls.add(url)
+            response = self.get_response_with_retry(url)
+            if response is not None and not getattr(response, 'from_cache', False):
+                article_data, links = self.parse_page(response.text, url)
+                if article_data and article_data['content']:
+                    digest = hashlib.sha256(article_data['content'].encode('utf-8')).hexdigest()
+                    if digest != known.get(normalize_url(url)):
+                        self.save_article(article_data)
+                        summary.add(article_data)
+                        print(f"  文章有修改，已重新保存: {article_data['title']}")
+                        changed += 1
+            if delay:
+                time.sleep(random.uniform(*delay))
+        return changed
+    
+    def scrape_incremental(self, workers=1, rate=None, burst=None, revalidate=False, stop_after=1,
+                           max_listing_pages=50, archive_dir=None, delay=(1, 3)):
+        """增量爬取：只抓取上次之后发布的文章，以及（revalidate 时）有修改的文章
+        
+        已保存的文章来自文章清单和 archive_dir 中的文件头（见 known_posts）。从第一页起
+        按从新到旧读取翻页列表，直到连续 stop_after 页都只有已保存的文章；列表中的新文章
+        用 crawl_site 抓取（不跟踪链接），记录追加到原清单。revalidate 为 True 时，
+        读到的列表页中已保存的文章也重新检查一遍（见 revalidate_posts）。
+        没有新文章时只需一两个请求。
+        
+        workers、rate、burst 同 crawl_site；delay 为列表页和检查更新之间的随机等待（秒），None 表示不等待。
+        
+        返回 CrawlSummary；有文章清单时为整个清单（同一文章只保留最新的记录）。
+        """
+        known = self.known_posts(archive_dir)
+        print(f"已保存 {len(known)} 篇文章，从第一页开始查找新文章")
+        new_urls, listed = self.walk_listing(known, stop_after, max_listing_pages, delay)
+        print(f"发现 {len(new_urls)} 篇新文章")
+        
+        summary = CrawlSummary(self.manifest_file, resume=True)
+        try:
+            changed = self.revalidate_posts(listed, known, summary, delay) if revalidate else 0
+            if revalidate:
+                print(f"检查了 {len(listed)} 篇已保存的文章，{changed} 篇有修改")
+            if new_urls:
+                self.crawl_site(new_urls, max_pages=len(new_urls), workers=workers, rate=rate, burst=burst,
+                                follow_links=False, summary=summary)
+            elif changed:
+                # 只有修改过的文章时 crawl_site 没有运行，在这里清理旧内容的对象
+                self.collect_garbage()
+        finally:
+            summary.close()
+        if self.manifest_file and changed:
+            compact_manifest(self.manifest_file)
+            # 重新统计整个清单
+            summary = CrawlSummary(self.manifest_file, resume=True)
+            summary.close()
+        return summary
+    
+    def generate_summary(self, summary):
+        """生成汇总报告（计数在爬取过程中已累计，文章列表从清单逐行读取）"""
+        summary.write_report("博客爬取汇总报告.txt", len(self.visited_urls))
+
+# 流水线模式下解析进程中使用的爬虫实例（只用于解析，不联网、不写文件）
+_parse_scraper = None
+
+def init_parse_worker(base_url, profile_sites):
+    """解析进程初始化：创建爬虫实例并载入主进程当前的提取配置"""
+    global _parse_scraper
+    _parse_scraper = BlogScraper(base_url)
+    _parse_scraper.profiles.sites = profile_sites
+
+def parse_page_in_worker(url, html_content):
+    """在解析进程中解析一个页面，返回 (文章内容或 None, 链接列表)"""
+    return _parse_scraper.parse_page(html_content, url)
 
 def main():
-    scraper = BlogScraper()
+    METRICS_FILE = None   # 例如 "crawl_metrics.prom" 或 "crawl_metrics.json"：结束时导出各阶段耗时统计
+    METRICS_PORT = None   # 例如 9100：爬取过程中可在 http://127.0.0.1:9100/metrics 查看
+    INCREMENTAL = True    # 已有文章清单时只抓取新文章（从第一页起读列表，遇到全是已保存的文章就停止）
+    REVALIDATE = False    # 增量爬取时是否用条件请求检查列表中已保存的文章有没有修改
+    MANIFEST_FILE = "articles_manifest.jsonl"
+    RECORD_FILE = None    # 例如 "fixtures.db"：录制全部请求和响应，之后用 stubserver.py --fixture 离线回放
+    WARC_FILE = "spider_raw.warc.gz"  # 原始页面存档，修改提取逻辑后用 reextract.py 离线重新生成文章
+    DEAD_LETTER_FILE = "spider_dead_letters.jsonl"  # 重试后仍然失败的页面（每行一条），可据此单独补抓
+    
+    metrics = Metrics(prefix='spider') if METRICS_FILE or METRICS_PORT else None
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    # 录制时不用HTTP缓存（304 响应没有正文），也不做增量爬取，确保每个页面都录到完整的响应
+    transport = Transport(metrics=metrics, record_file=RECORD_FILE)
+    # 状态文件记录爬取进度，中断后再次运行会从断点继续
+    scraper = BlogScraper(state_file="spider_state.db", cache_file=None if RECORD_FILE else "http_cache.db",
+                          profile_file="extraction_profiles.json", metrics=metrics,
+                          manifest_file=MANIFEST_FILE, transport=transport, warc_file=WARC_FILE)
     
     print("开始深度爬取博客内容...")
     print("这将爬取博客的所有页面和文章内容，可能需要一些时间...")
     
-    all_articles = scraper.scrape_blog_pages(1, 24)
+    if INCREMENTAL and not RECORD_FILE and os.path.exists(MANIFEST_FILE):
+        summary = scraper.scrape_incremental(revalidate=REVALIDATE)
+    else:
+        # 优先用 REST API / 站点地图列出文章，都不可用时逐页抓取
+        summary = scraper.scrape_wordpress()
     
     print("生成汇总报告...")
-    scraper.generate_summary(all_articles)
+    scraper.generate_summary(summary)
     
     print(f"爬取完成！")
     print(f"共访问 {len(scraper.visited_urls)} 个页面")
-    print(f"共提取 {len(all_articles)} 篇文章")
+    print(f"共提取 {len(summary)} 篇文章")
+    print("文章清单已保存到 'articles_manifest.jsonl'")
     print("文章已按分类保存到 'blog_content' 文件夹")
     print("详细汇总报告已保存到 '博客爬取汇总报告.txt'")
+    print(scraper.transport.stats_line())
+    print(scraper.retries.stats_line())
+    failed = scraper.retries.write_dead_letters(DEAD_LETTER_FILE)
+    if failed:
+        print(f"{failed} 个页面最终失败，已记录到 '{DEAD_LETTER_FILE}'")
+    scraper.state.close()
+    if scraper.cache:
+        print(scraper.cache.stats_line())
+        scraper.cache.close()
+    if RECORD_FILE:
+        print(f"已录制 {transport.recorder.count} 个响应到 '{RECORD_FILE}'")
+    if scraper.warc:
+        print(f"原始页面已追加到 '{WARC_FILE}'（{scraper.warc.count} 个响应）")
+        scraper.warc.close()
+    transport.close()
+    if METRICS_FILE:
+        metrics.write(METRICS_FILE)
+        print(f"各阶段耗时统计已保存到 '{METRICS_FILE}'")
+    if metrics:
+        metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
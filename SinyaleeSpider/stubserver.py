@@ -0,0 +1,431 @@
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from archive import ARCHIVE_DIR, iter_articles
+from fixtures import FixtureSite
+
+POSTS_PER_PAGE = 10
+
+
+class StubSite:
+    """用归档文章渲染出一个结构与 sinyalee.com 相同的离线 WordPress 站点
+
+    页面保存在 pages 字典中，键为 "/blog/?p=1032" 这样的路径加查询串。
+    rest 为 True 时还提供 WordPress REST API（/blog/wp-json/wp/v2/... 和
+    /blog/?rest_route=/wp/v2/...），sitemap 为 True 时提供站点地图 /blog/wp-sitemap.xml。
+    skip_newest 为 N 时不发布最新的 N 篇文章（模拟“昨天”的站点，用于测试增量爬取）。
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, rest=True, sitemap=True, skip_newest=0):
+        self.pages = {}
+        self.rest_enabled = rest
+        self.sitemap_enabled = sitemap
+        self.base_url = "https://sinyalee.com/blog/"  # REST 和站点地图中绝对链接的前缀，serve() 会改为实际地址
+        posts = {}
+        for article in iter_articles(archive_dir):
+            query = parse_qs(urlparse(article.get('url', '')).query)
+            if 'p' in query and article['content'].strip():
+                posts.setdefault(query['p'][0], article)
+
+        # WordPress 文章列表按发布时间倒序，这里用文章ID近似
+        self.post_ids = sorted(posts, key=int, reverse=True)
+        self.category_ids = {}
+        for post_id in self.post_ids:
+            for category in posts[post_id].get('categories', []):
+                self.category_ids.setdefault(category, len(self.category_ids) + 1)
+        # 分类编号按全部文章确定，未发布的文章不影响其他页面的内容
+        for post_id in self.post_ids[:skip_newest]:
+            del posts[post_id]
+        self.post_ids = self.post_ids[skip_newest:]
+
+        for post_id in self.post_ids:
+            self.pages[f"/blog/?p={post_id}"] = self.render_post(post_id, posts[post_id])
+
+        page_count = max(1, -(-len(self.post_ids) // POSTS_PER_PAGE))
+        for page in range(1, page_count + 1):
+            chunk = self.post_ids[(page - 1) * POSTS_PER_PAGE:page * POSTS_PER_PAGE]
+            body = self.render_list(chunk, posts)
+            if page < page_count:
+                body += f'<a class="next" href="/blog/?paged={page + 1}">下一页</a>'
+            self.pages[f"/blog/?paged={page}"] = self.render_layout("新的原野", body)
+        self.pages["/blog/"] = self.pages["/blog/?paged=1"]
+
+        for category, cat_id in self.category_ids.items():
+            chunk = [p for p in self.post_ids if category in posts[p].get('categories', [])]
+            self.pages[f"/blog/?cat={cat_id}"] = self.render_layout(
+                f"分类： {category}", self.render_list(chunk, posts))
+
+        self.posts = posts
+        self.authors = {}
+        for post_id in self.post_ids:
+            self.authors.setdefault(posts[post_id].get('author', 'Sinya'), len(self.authors) + 1)
+
+    def edit_post(self, post_id, content):
+        """修改一篇文章的正文（文章页随之改变，列表页不变）"""
+        self.posts[post_id] = dict(self.posts[post_id], content=content)
+        self.pages[f"/blog/?p={post_id}"] = self.render_post(post_id, self.posts[post_id])
+
+    def lookup(self, path):
+        """
+        按请求路径返回响应
+
+        Returns:
+            tuple: (状态码, Content-Type, 响应体, 额外的响应头)，不存在的路径返回 None
+        """
+        page = self.pages.get(path)
+        if page is not None:
+            return 200, 'text/html; charset=UTF-8', page, {}
+        if self.sitemap_enabled and path == '/blog/wp-sitemap.xml':
+            return 200, 'application/xml; charset=UTF-8', self.render_sitemap_index(), {}
+        if self.sitemap_enabled and path == '/blog/wp-sitemap-posts-post-1.xml':
+            return 200, 'application/xml; charset=UTF-8', self.render_sitemap(self.post_ids), {}
+        if not self.rest_enabled:
+            return None
+        url = urlparse(path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.startswith('/blog/wp-json/'):
+            route = url.path[len('/blog/wp-json'):]
+        elif url.path == '/blog/' and 'rest_route' in query:
+            route = query['rest_route']
+        else:
+            return None
+        return self.rest(route.rstrip('/'), query)
+
+    def rest(self, route, query):
+        """WordPress REST API 的 posts、categories、users 列表（支持 per_page/page 分页）"""
+        if route == '/wp/v2/posts':
+            items = [self.render_post_json(p) for p in self.post_ids]
+        elif route == '/wp/v2/categories':
+            items = [{'id': cat_id, 'name': html.escape(name), 'count': 0}
+                     for name, cat_id in self.category_ids.items()]
+        elif route == '/wp/v2/users':
+            items = [{'id': user_id, 'name': name} for name, user_id in self.authors.items()]
+        else:
+            return 404, 'application/json; charset=UTF-8', json.dumps({'code': 'rest_no_route'}), {}
+        per_page = min(100, int(query.get('per_page', 10)))
+        page = int(query.get('page', 1))
+        total_pages = max(1, -(-len(items) // per_page))
+        if page > total_pages:
+            return 400, 'application/json; charset=UTF-8', json.dumps({'code': 'rest_post_invalid_page_number'}), {}
+        body = json.dumps(items[(page - 1) * per_page:page * per_page], ensure_ascii=False)
+        return 200, 'application/json; charset=UTF-8', body, {
+            'X-WP-Total': str(len(items)), 'X-WP-TotalPages': str(total_pages)}
+
+    def render_post_json(self, post_id):
+        article = self.posts[post_id]
+        return {
+            'id': int(post_id),
+            'date': article.get('publish_date') or '',
+            'link': f"{self.base_url}?p={post_id}",
+            'title': {'rendered': html.escape(article.get('title', ''))},
+            'content': {'rendered': self.render_paragraphs(article), 'protected': False},
+            'author': self.authors[article.get('author', 'Sinya')],
+            'categories': [self.category_ids[c] for c in dict.fromkeys(article.get('categories', []))],
+        }
+
+    def render_sitemap_index(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'<sitemap><loc>{self.base_url}wp-sitemap-posts-post-1.xml</loc></sitemap>'
+                '</sitemapindex>')
+
+    def render_sitemap(self, post_ids):
+        urls = "".join(f"<url><loc>{self.base_url}?p={p}</loc></url>" for p in post_ids)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+
+    def render_layout(self, title, body):
+        return (
+            f"<!DOCTYPE html><html><head><meta charset=\"UTF-8\"><title>{html.escape(title)} – 新的原野</title></head>"
+            f"<body><header><a href=\"/blog/\">新的原野</a></header><main>{body}</main>"
+            f"<footer>WordPress</footer></body></html>"
+        )
+
+    def render_categories(self, categories):
+        links = ", ".join(
+            f'<a href="/blog/?cat={self.category_ids[c]}" rel="category">{html.escape(c)}</a>'
+            for c in dict.fromkeys(categories))
+        return f'<span class="cat-links">{links}</span>'
+
+    def render_list(self, post_ids, posts):
+        items = []
+        for post_id in post_ids:
+            article = posts[post_id]
+            items.append(
+                f'<article class="post"><h2 class="entry-title"><a href="/blog/?p={post_id}">'
+                f'{html.escape(article.get("title", ""))}</a></h2>'
+                f'{self.render_categories(article.get("categories", []))}'
+                f'<a class="more-link" href="/blog/?p={post_id}">阅读更多</a></article>')
+        return "".join(items)
+
+    def render_paragraphs(self, article):
+        # 与 WordPress 的 the_content 一样，段落之间有换行
+        return "".join(
+            f"<p>{html.escape(line)}</p>\n" for line in article['content'].split('\n') if line.strip())
+
+    def render_post(self, post_id, article):
+        paragraphs = self.render_paragraphs(article)
+        body = (
+            f'<article id="post-{post_id}"><h1 class="entry-title">{html.escape(article.get("title", ""))}</h1>'
+            f'<span class="author">{html.escape(article.get("author", "Sinya"))}</span>'
+            f'<div class="entry-content">{paragraphs}</div>'
+            f'{self.render_categories(article.get("categories", []))}</article>'
+        )
+        return self.render_layout(article.get("title", ""), body)
+
+
+class SyntheticSite(StubSite):
+    """按需生成页面的大型离线站点，用于内存基准
+
+    共 post_count 篇文章（/blog/?p=1 ~ ?p=post_count），每篇 paragraphs 段随机短句，
+    内容由文章ID决定，每次请求相同。页面在请求时才渲染，不保存，站点本身几乎不占内存，
+    页面数可以远多于归档。翻页列表从 ID 最大的文章开始，每页 POSTS_PER_PAGE 篇；
+    每篇文章属于 1~2 个分类。只提供 HTML 页面（没有 REST API 和站点地图）。
+    """
+
+    WORDS = ("今天", "我们", "一个", "学校", "老师", "数学", "比赛", "题目", "时间", "北京", "清华", "同学",
+             "觉得", "可以", "问题", "因为", "所以", "但是", "已经", "没有", "什么", "这样", "事情", "朋友")
+    CATEGORIES = ("生活", "数学", "信息学", "读书", "旅行", "随笔", "音乐", "电影", "游戏", "学校")
+
+    def __init__(self, post_count=10000, paragraphs=12):
+        self.post_count = post_count
+        self.paragraphs = paragraphs
+        self.rest_enabled = False
+        self.sitemap_enabled = False
+        self.base_url = "https://sinyalee.com/blog/"
+        self.category_ids = {name: i for i, name in enumerate(self.CATEGORIES, 1)}
+        self.pages = {}
+        self.page_count = max(1, -(-post_count // POSTS_PER_PAGE))
+
+    def __len__(self):
+        """页面总数：文章、翻页列表和分类页"""
+        return self.post_count + self.page_count + len(self.CATEGORIES)
+
+    def categories(self, post_id):
+        names = [self.CATEGORIES[post_id % len(self.CATEGORIES)]]
+        if post_id % 3 == 0:
+            names.append(self.CATEGORIES[post_id * 7 % len(self.CATEGORIES)])
+        return names
+
+    def article(self, post_id):
+        rng = random.Random(post_id)
+        lines = ["".join(rng.choice(self.WORDS) for _ in range(rng.randint(20, 60))) + "。"
+                 for _ in range(self.paragraphs)]
+        return {
+            'title': f"合成文章 {post_id}",
+            'author': "Sinya",
+            'categories': self.categories(post_id),
+            'content': "\n".join(lines),
+        }
+
+    def lookup(self, path):
+        url = urlparse(path)
+        if url.path != '/blog/':
+            return None
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if 'p' in query:
+                post_id = int(query['p'])
+                if not 1 <= post_id <= self.post_count:
+                    return None
+                page = self.render_post(post_id, self.article(post_id))
+            elif 'cat' in query:
+                name = self.CATEGORIES[int(query['cat']) - 1]
+                # 分类页只列出该分类最新的一页文章
+                chunk = [p for p in range(self.post_count, max(0, self.post_count - 100), -1)
+                         if name in self.categories(p)][:POSTS_PER_PAGE]
+                page = self.render_layout(f"分类： {name}", self.render_list(chunk, {p: self.article(p) for p in chunk}))
+            else:
+                number = int(query.get('paged', 1))
+                if not 1 <= number <= self.page_count:
+                    return None
+                first = self.post_count - (number - 1) * POSTS_PER_PAGE
+                chunk = list(range(first, max(0, first - POSTS_PER_PAGE), -1))
+                body = self.render_list(chunk, {p: self.article(p) for p in chunk})
+                if number < self.page_count:
+                    body += f'<a class="next" href="/blog/?paged={number + 1}">下一页</a>'
+                page = self.render_layout("新的原野", body)
+        except (ValueError, IndexError):
+            return None
+        return 200, 'text/html; charset=UTF-8', page, {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按路径从 server.site.pages 返回页面，每个请求先等待 server.latency 秒
+
+    响应带 ETag，请求的 If-None-Match 与之相同时返回 304。
+    同时处理中的请求超过 server.max_inflight 时返回 429（带 Retry-After），
+    另有 server.error_rate 的概率返回 503，用来模拟限流的服务器。
+    server.compress 为 True 且请求接受 gzip 时压缩响应体。
+    server.bandwidth 大于 0 时每个响应按该速率（字节/秒）分块发送，模拟慢速网络。
+    默认为 HTTP/1.0，每个请求一个连接；KeepAliveStubHandler 使用 HTTP/1.1 保持连接。
+    """
+
+    def setup(self):
+        super().setup()
+        with self.server.inflight_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.inflight_lock:
+            server.inflight += 1
+            server.requests += 1
+            overloaded = server.max_inflight and server.inflight > server.max_inflight
+        try:
+            if overloaded:
+                server.throttled += 1
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            time.sleep(server.latency)
+            if server.error_rate and random.random() < server.error_rate:
+                server.throttled += 1
+                self.send_error(503)
+                return
+            self.send_page()
+        finally:
+            with server.inflight_lock:
+                server.inflight -= 1
+
+    def send_page(self):
+        response = self.server.site.lookup(self.path)
+        if response is None:
+            self.send_error(404)
+            return
+        status, content_type, page, headers = response
+        body = page if isinstance(page, bytes) else page.encode('utf-8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=6)
+            headers = dict(headers, **{'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.write_body(body)
+
+    def write_body(self, body):
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        # 每块约 50 毫秒的数据量
+        chunk_size = max(1024, int(bandwidth / 20))
+        for i in range(0, len(body), chunk_size):
+            chunk = body[i:i + chunk_size]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KeepAliveStubHandler(StubHandler):
+    protocol_version = 'HTTP/1.1'
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列只有 5，并发建立大量连接时会被拒绝
+    request_queue_size = 128
+
+
+def serve(site=None, host="127.0.0.1", port=0, latency=0.0, max_inflight=0, error_rate=0.0, keep_alive=False,
+          certfile=None, keyfile=None, compress=False, bandwidth=0):
+    """
+    在后台线程启动离线站点
+
+    Args:
+        site: StubSite 实例（或回放录制文件的 fixtures.FixtureSite），默认由 SinyaleeBlogs 渲染
+        host/port: 监听地址，port 为 0 时自动分配
+        latency: 每个请求的模拟延迟（秒）
+        max_inflight: 同时处理的请求超过该数时返回 429，0 表示不限
+        error_rate: 随机返回 503 的概率
+        keep_alive: 使用 HTTP/1.1 保持连接（默认 HTTP/1.0，每个请求一个连接）
+        certfile/keyfile: 证书和私钥文件，指定后提供 HTTPS
+        compress: 客户端接受 gzip 时压缩响应体
+        bandwidth: 每个响应的传输速率上限（字节/秒），0 表示不限
+
+    Returns:
+        ThreadingHTTPServer: 已启动的服务器，base_url 属性为博客首页地址，requests 为收到的请求数，
+        connections 为接受的连接数，用完调用 shutdown()
+    """
+    server = StubServer((host, port), KeepAliveStubHandler if keep_alive else StubHandler)
+    scheme = 'http'
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        # 握手在处理请求的线程中进行，不阻塞接受新连接
+        server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+        scheme = 'https'
+    server.daemon_threads = True
+    server.compress = compress
+    server.bandwidth = bandwidth
+    server.connections = 0
+    server.site = site or StubSite()
+    server.latency = latency
+    server.max_inflight = max_inflight
+    server.error_rate = error_rate
+    server.inflight = 0
+    server.inflight_lock = threading.Lock()
+    server.throttled = 0
+    server.requests = 0
+    server.base_url = f"{scheme}://{host}:{server.server_address[1]}/blog/"
+    server.site.base_url = server.base_url
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线博客站点，用于基准测试")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    parser.add_argument('--max-inflight', type=int, default=0, help="同时处理的请求超过该数时返回 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="随机返回 503 的概率")
+    parser.add_argument('--no-rest', action='store_true', help="不提供 REST API")
+    parser.add_argument('--no-sitemap', action='store_true', help="不提供站点地图")
+    parser.add_argument('--keep-alive', action='store_true', help="使用 HTTP/1.1 保持连接")
+    parser.add_argument('--gzip', action='store_true', help="客户端接受时用 gzip 压缩响应")
+    parser.add_argument('--cert', help="证书文件（PEM），指定后提供 HTTPS")
+    parser.add_argument('--key', help="私钥文件（PEM），与证书在同一文件时可省略")
+    parser.add_argument('--bandwidth', type=float, default=0, help="每个响应的传输速率上限（KB/秒），0 表示不限")
+    parser.add_argument('--fixture', help="回放录制文件（Transport 的 record_file 录制），代替由归档渲染的站点")
+    args = parser.parse_args()
+
+    if args.fixture:
+        site = FixtureSite(args.fixture)
+    else:
+        site = StubSite(rest=not args.no_rest, sitemap=not args.no_sitemap)
+    server = serve(site, port=args.port, latency=args.latency,
+                   max_inflight=args.max_inflight, error_rate=args.error_rate, keep_alive=args.keep_alive,
+                   certfile=args.cert, keyfile=args.key, compress=args.gzip, bandwidth=args.bandwidth * 1024)
+    print(f"离线站点已启动: {server.base_url}  (共 {len(server.site.pages)} 个页面，Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import re
+
+# spider.py、readurl.py、renamefile.py 共用的文本清理和文件名规则
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Windows 文件名中不允许的字符，统一替换为下划线（与 SinyaleeBlogs 中已有的文件名一致）
+ILLEGAL_FILENAME_CHARS = '<>:"/\\|?*'
+FILENAME_TABLE = str.maketrans(ILLEGAL_FILENAME_CHARS, '_' * len(ILLEGAL_FILENAME_CHARS))
+
+MAX_FILENAME_LENGTH = 100
+
+
+def strip_tags(text):
+    """移除HTML标签（没有 '<' 时不调用正则）"""
+    return TAG_PATTERN.sub('', text) if '<' in text else text
+
+
+def collapse_whitespace(text):
+    """连续空白合并为一个空格并去掉首尾空白，与 re.sub(r'\\s+', ' ', text).strip() 相同"""
+    return ' '.join(text.split())
+
+
+def clean_text(text):
+    """清理文本：移除HTML标签，合并空白"""
+    if not text:
+        return ""
+    return collapse_whitespace(strip_tags(text))
+
+
+def clean_filename(name, max_length=MAX_FILENAME_LENGTH):
+    """
+    清理文件名：移除HTML标签、非法字符替换为下划线、合并空白、限制长度
+
+    Args:
+        name: 原始文件名（不含扩展名）
+        max_length: 最大长度
+
+    Returns:
+        str: 清理后的文件名，可能为空字符串
+    """
+    if not name:
+        return ""
+    return collapse_whitespace(strip_tags(name).translate(FILENAME_TABLE))[:max_length].rstrip()
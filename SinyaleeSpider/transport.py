@@ -0,0 +1,238 @@
+import logging
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.request import ACCEPT_ENCODING
+
+from fixtures import FixtureRecorder
+from metrics import NULL_METRICS, InstrumentedAdapter
+
+# HTTP/2 需要 httpx（pip install "httpx[http2]"），没有安装时只使用 HTTP/1.1
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/91.0.4472.124 Safari/537.36')
+
+# 每个主机保持的连接数（requests 默认 10）
+DEFAULT_POOL_SIZE = 10
+
+# 缓存连接池的主机数
+DEFAULT_POOL_HOSTS = 10
+
+
+class TransportStats:
+    """连接复用和压缩统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.body_bytes = 0
+        self.wire_bytes = 0
+        self.encodings = Counter()
+        self.versions = Counter()
+        self.lock = threading.Lock()
+
+    def add_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def add_response(self, version, encoding, body_bytes, wire_bytes):
+        with self.lock:
+            self.requests += 1
+            self.versions[version] += 1
+            self.encodings[encoding or 'identity'] += 1
+            self.body_bytes += body_bytes
+            self.wire_bytes += wire_bytes
+
+    @property
+    def reused(self):
+        """复用已有连接的请求数"""
+        return max(0, self.requests - self.connections)
+
+    def line(self):
+        """统计信息，例如 "连接: 请求 380, 新建连接 8, 复用 372 (97.9%) | HTTP/1.1 380 | 压缩 gzip 380, 传输 1.2 MB / 解压后 4.3 MB" """
+        reuse = self.reused / self.requests * 100 if self.requests else 0.0
+        versions = ", ".join(f"{v} {n}" for v, n in self.versions.most_common())
+        encodings = ", ".join(f"{e} {n}" for e, n in self.encodings.most_common())
+        return (f"连接: 请求 {self.requests}, 新建连接 {self.connections}, 复用 {self.reused} ({reuse:.1f}%) | "
+                f"{versions or '无响应'} | 压缩 {encodings or '无'}, "
+                f"传输 {self.wire_bytes / 2**20:.1f} MB / 解压后 {self.body_bytes / 2**20:.1f} MB")
+
+
+class CountingConnectionMixin:
+    """新建连接（建立套接字）时计数；服务器关闭后重新连接也算一次"""
+
+    stats = None
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        self.stats.add_connection()
+        return sock
+
+
+class PooledAdapter(InstrumentedAdapter):
+    """带连接计数的 HTTPAdapter（同时保留 metrics 中的连接和 TLS 耗时统计）"""
+
+    def __init__(self, metrics, stats, **kwargs):
+        self.stats = stats
+        super().__init__(metrics, **kwargs)
+
+    def connection_class(self, base):
+        timed = super().connection_class(base)
+        return type(f'Pooled{base.__name__}', (CountingConnectionMixin, timed), {'stats': self.stats})
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    用 httpx 发送请求的 requests 适配器，用于 HTTPS 的 HTTP/2
+
+    HTTP/2 在一个连接上并发多个请求，不需要按并发数开多个连接。返回的是普通的
+    requests.Response（正文已读取并解压），对调用方透明。证书校验使用 httpx 客户端的
+    设置（默认校验），忽略单个请求的 verify/cert/proxies 参数。
+    """
+
+    def __init__(self, stats, pool_size=DEFAULT_POOL_SIZE, verify=True):
+        super().__init__()
+        self.stats = stats
+        self.client = httpx.Client(http2=True, verify=verify,
+                                   limits=httpx.Limits(max_connections=pool_size,
+                                                       max_keepalive_connections=pool_size))
+        self.known_connections = set()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            r = self.client.request(request.method, request.url, headers=dict(request.headers),
+                                    content=request.body, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(e, request=request)
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        # 按连接池中的连接数估计新建连接数（一个 HTTP/2 连接可同时承载多个请求）
+        connections = getattr(self.client._transport, '_pool', None)
+        if connections is not None:
+            for connection in connections.connections:
+                if id(connection) not in self.known_connections:
+                    self.known_connections.add(id(connection))
+                    self.stats.add_connection()
+
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.headers = CaseInsensitiveDict(r.headers.multi_items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = r.reason_phrase
+        response.url = str(r.url)
+        response.request = request
+        response.connection = self
+        response._content = r.content
+        response._content_consumed = True
+        response.http_version = r.http_version
+        response.wire_bytes = r.num_bytes_downloaded
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class Transport:
+    """
+    两个爬虫共用的 HTTP 传输层：连接池、压缩和可选的 HTTP/2
+
+    - 每个主机最多保持 pool_size 个连接；连接都在使用中时新请求等待空闲连接
+      （pool_block），不会临时新建连接用完即丢，重复进行 TCP/TLS 握手。
+      并发抓取时 pool_size 应不小于并发数：最好在创建时给足，也可以用 set_pool_size() 增大。
+    - Accept-Encoding 声明 urllib3 能解压的全部编码（gzip、deflate，安装了
+      brotli 时还有 br），统计服务器实际使用的压缩方式和传输/解压后的字节数。
+    - http2 为 True 且安装了 httpx 时，HTTPS 请求使用 HTTP/2。
+    - stats 记录请求数、新建连接数（得出连接复用率）、协议版本和压缩情况。
+    - record_file 指定时进入录制模式：每个请求和响应都保存到该文件（fixtures.FixtureRecorder），
+      之后可以用 stubserver.py --fixture 离线回放。
+
+    session 是普通的 requests.Session，HTTPCache、WordPressDiscovery 等可以直接使用。
+    多个爬虫实例可以传入同一个 Transport 共享连接。
+
+    Args:
+        pool_size: 每个主机的最大连接数
+        pool_hosts: 缓存连接池的主机数
+        http2: 是否对 HTTPS 使用 HTTP/2（需要 httpx）
+        metrics: 可选的 metrics.Metrics，记录连接、TLS、首字节和响应体耗时
+        headers: 额外的请求头
+        verify: 证书校验，同 requests 的 verify 参数
+        record_file: 录制文件路径，None 表示不录制
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, pool_hosts=DEFAULT_POOL_HOSTS, http2=False, metrics=None,
+                 headers=None, verify=True, record_file=None):
+        self.pool_size = pool_size
+        self.pool_hosts = pool_hosts
+        self.metrics = metrics or NULL_METRICS
+        self.stats = TransportStats()
+        self.verify = verify
+        if http2 and httpx is None:
+            logger.warning("未安装 httpx，HTTP/2 不可用，使用 HTTP/1.1")
+        self.http2 = bool(http2 and httpx is not None)
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+        if headers:
+            self.session.headers.update(headers)
+        self.mount()
+        # metrics 的钩子计时读取响应体，需在 on_response（会读取响应体）之前
+        if self.metrics.enabled:
+            self.session.hooks['response'].append(self.metrics.on_response)
+        self.session.hooks['response'].append(self.on_response)
+        self.recorder = FixtureRecorder(record_file).attach(self.session) if record_file else None
+        self.retired = []  # set_pool_size() 换下的适配器，close() 时才关闭
+
+    def mount(self):
+        adapter = PooledAdapter(self.metrics, self.stats, pool_connections=self.pool_hosts,
+                                pool_maxsize=self.pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', Http2Adapter(self.stats, self.pool_size, self.verify) if self.http2 else adapter)
+
+    def set_pool_size(self, pool_size):
+        """
+        把每个主机的连接数增大到至少 pool_size（并发抓取前调用）
+
+        新请求改用新的适配器；Transport 可能由多个爬虫共用，旧适配器上可能还有在途请求，
+        所以不立即关闭，留到 close() 时再关闭。
+        """
+        if pool_size <= self.pool_size:
+            return
+        self.retired.extend(set(self.session.adapters.values()))
+        self.pool_size = pool_size
+        self.mount()
+
+    def on_response(self, response, *args, **kwargs):
+        body = response.content or b''
+        version = getattr(response, 'http_version', None)
+        wire_bytes = getattr(response, 'wire_bytes', None)
+        if version is None:
+            raw_version = getattr(response.raw, 'version', 11)
+            version = f"HTTP/{raw_version // 10}.{raw_version % 10}"
+        if wire_bytes is None:
+            # urllib3 的 tell() 是从连接读取的（压缩的）字节数
+            wire_bytes = response.raw.tell() if hasattr(response.raw, 'tell') else len(body)
+        self.stats.add_response(version, response.headers.get('Content-Encoding'), len(body), wire_bytes)
+
+    def stats_line(self):
+        return self.stats.line()
+
+    def close(self):
+        self.session.close()
+        for adapter in self.retired:
+            adapter.close()
+        self.retired = []
+        if self.recorder:
+            self.recorder.close()
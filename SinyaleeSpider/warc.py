@@ -0,0 +1,143 @@
+import gzip
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# 响应头中不写入 WARC 的字段：正文已由 requests 解压，长度按解压后的正文重新计算
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def warc_date(timestamp=None):
+    moment = datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else datetime.now(timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def format_record(warc_type, block, headers):
+    """一条 WARC 记录（未压缩）"""
+    lines = [
+        'WARC/1.0',
+        f'WARC-Type: {warc_type}',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+        f'WARC-Date: {warc_date()}',
+    ]
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    lines.append(f'Content-Length: {len(block)}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + block + b'\r\n\r\n'
+
+
+class WarcWriter:
+    """
+    把抓取到的原始响应追加写入 WARC 文件（.warc.gz）
+
+    每条记录单独压缩为一个 gzip 成员，文件只追加，可以用任何 WARC 工具读取，
+    中断后再次运行接着写入。记录的是爬虫实际使用的响应（包括HTTP缓存确认未变化、
+    由缓存构造的响应），正文为解压后的内容，状态行和响应头按原响应重建。
+    多个线程可以同时写入。
+
+    Args:
+        path: WARC 文件路径，已存在时追加
+        software: 写入 warcinfo 记录的程序名（仅新文件）
+    """
+
+    def __init__(self, path, software='SinyaleeSpider'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.count = 0
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if is_new:
+            info = f'software: {software}\r\nformat: WARC File Format 1.0\r\n'.encode('utf-8')
+            self.write_record('warcinfo', info, {'WARC-Filename': os.path.basename(path),
+                                                 'Content-Type': 'application/warc-fields'})
+
+    def write_record(self, warc_type, block, headers):
+        data = gzip.compress(format_record(warc_type, block, headers), compresslevel=6)
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+
+    def write_response(self, response):
+        """写入一个 requests.Response"""
+        reason = response.reason or 'OK'
+        body = response.content or b''
+        lines = [f'HTTP/1.1 {response.status_code} {reason}']
+        lines += [f'{name}: {value}' for name, value in response.headers.items()
+                  if name.lower() not in SKIPPED_HEADERS]
+        lines.append(f'Content-Length: {len(body)}')
+        block = ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + body
+        self.write_record('response', block, {'WARC-Target-URI': response.url,
+                                              'Content-Type': 'application/http; msgtype=response'})
+        with self.lock:
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_headers(stream):
+    """读取以空行结束的 "名称: 值" 行，返回 (首行, 字段字典)；已到文件末尾时返回 (None, None)"""
+    first = stream.readline()
+    while first in (b'\r\n', b'\n'):
+        first = stream.readline()
+    if not first:
+        return None, None
+    headers = {}
+    for line in iter(stream.readline, b''):
+        line = line.rstrip(b'\r\n')
+        if not line:
+            break
+        name, _, value = line.decode('utf-8', 'replace').partition(':')
+        headers[name.strip()] = value.strip()
+    return first.rstrip(b'\r\n').decode('utf-8', 'replace'), headers
+
+
+def iter_records(path):
+    """
+    依次产出 WARC 文件中的记录 (记录头字典, 内容块)
+
+    支持 .warc.gz（多个 gzip 成员）和未压缩的 .warc。文件末尾的记录不完整时
+    （写入时中断）停止读取。
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as stream:
+        while True:
+            try:
+                version, headers = read_headers(stream)
+                if version is None:
+                    return
+                length = int(headers.get('Content-Length', 0))
+                block = stream.read(length)
+            except (EOFError, OSError, ValueError):
+                return
+            if len(block) < length:
+                return
+            yield headers, block
+
+
+def parse_http_response(block):
+    """把 response 记录的内容块拆为 (状态码, 响应头字典, 正文)"""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.decode('utf-8', 'replace').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    return status, headers, body
+
+
+def iter_responses(paths):
+    """
+    依次产出多个 WARC 文件中的 HTTP 响应 (URL, 状态码, 响应头, 正文字节)
+
+    Args:
+        paths: WARC 文件路径列表（按时间顺序，同一 URL 以后出现的为准）
+    """
+    for path in paths:
+        for headers, block in iter_records(path):
+            if headers.get('WARC-Type') != 'response':
+                continue
+            status, http_headers, body = parse_http_response(block)
+            yield headers.get('WARC-Target-URI', ''), status, http_headers, body
@@ -0,0 +1,164 @@
+import logging
+import xml.etree.ElementTree as ET
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# REST API 只取需要的字段，减小响应体
+POST_FIELDS = 'id,date,link,title,content,author,categories'
+
+
+class WordPressDiscovery:
+    """
+    用 WordPress 自带的接口列出全部文章，代替逐页跟踪链接
+
+    REST API（/wp/v2/posts?per_page=100）每个请求返回 100 篇文章的标题、日期、分类
+    和正文，整站只需几个请求；站点未开放 REST API 时读取站点地图（wp-sitemap.xml），
+    得到全部文章地址后只需抓取文章页本身，不必再抓分类页和翻页列表。
+
+    使用固定链接（/wp-json/）和默认链接（?rest_route=）的站点都能识别，先试
+    前者，成功后记住可用的形式。
+
+    Args:
+        session: requests.Session
+        base_url: WordPress 首页地址，例如 "https://sinyalee.com/blog/"
+        timeout: 请求超时（秒）
+        per_page: REST API 每页条目数（WordPress 上限 100）
+        on_response: 可选的回调，每收到一个响应调用一次（例如写入 WARC）
+    """
+
+    def __init__(self, session, base_url, timeout=30, per_page=100, on_response=None):
+        self.session = session
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.timeout = timeout
+        self.per_page = per_page
+        self.rest_form = None
+        self.requests = 0
+        self.on_response = on_response
+
+    def get(self, url, params=None):
+        """发出请求；连接失败时返回 None"""
+        self.requests += 1
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.info(f"请求失败 {url}: {e}")
+            return None
+        if self.on_response:
+            self.on_response(response)
+        return response
+
+    def rest_get(self, route, params):
+        """请求一个 REST 路由，返回 200 响应；两种地址形式都不可用时返回 None"""
+        forms = [self.rest_form] if self.rest_form else ['wp-json', 'rest_route']
+        for form in forms:
+            if form == 'wp-json':
+                response = self.get(f"{self.base_url}wp-json{route}", params)
+            else:
+                response = self.get(self.base_url, dict(params, rest_route=route))
+            if (response is not None and response.status_code == 200
+                    and 'json' in response.headers.get('Content-Type', '')):
+                self.rest_form = form
+                return response
+        return None
+
+    def rest_page(self, route, params, page):
+        """取 REST 列表的一页，返回 (条目列表, 总页数)；接口不可用时返回 None"""
+        response = self.rest_get(route, dict(params or {}, per_page=self.per_page, page=page))
+        if response is None:
+            return None
+        try:
+            batch = response.json()
+        except ValueError:
+            return None
+        if not isinstance(batch, list):
+            return None
+        return batch, int(response.headers.get('X-WP-TotalPages') or page)
+
+    def iter_pages(self, route, params, first):
+        """从已取到的第一页开始，逐页产出列表中的条目；中途出错时停止"""
+        batch, total_pages = first
+        page = 1
+        while True:
+            yield from batch
+            if page >= total_pages or len(batch) < self.per_page:
+                return
+            page += 1
+            result = self.rest_page(route, params, page)
+            if result is None:
+                logger.warning(f"REST 列表 {route} 第 {page} 页获取失败，之后的条目未取到")
+                return
+            batch, total_pages = result
+
+    def rest_list(self, route, params=None):
+        """
+        按页取完一个 REST 列表
+
+        Returns:
+            list: 所有条目；接口不可用时为 None
+        """
+        first = self.rest_page(route, params, 1)
+        if first is None:
+            return None
+        return list(self.iter_pages(route, params, first))
+
+    def posts(self):
+        """
+        REST API 返回的文章（原始 JSON）
+
+        只先取第一页以确认接口可用，其余各页在迭代时才请求，内存中同时只有一页文章。
+
+        Returns:
+            iterator: 逐篇产出文章；REST API 不可用时为 None
+        """
+        params = {'_fields': POST_FIELDS}
+        first = self.rest_page('/wp/v2/posts', params, 1)
+        if first is None:
+            return None
+        return self.iter_pages('/wp/v2/posts', params, first)
+
+    def categories(self):
+        """分类ID -> 分类名（名称中的HTML实体未解码）"""
+        return {c['id']: c['name'] for c in self.rest_list('/wp/v2/categories', {'_fields': 'id,name'}) or []}
+
+    def authors(self):
+        """作者ID -> 名字；站点禁止列出用户时为空"""
+        return {u['id']: u['name'] for u in self.rest_list('/wp/v2/users', {'_fields': 'id,name'}) or []}
+
+    def sitemap_locs(self, url):
+        """读取一个站点地图，返回 (根元素名, 其中的 loc 列表)；不存在或不是站点地图时返回 None"""
+        response = self.get(url)
+        if response is None or response.status_code != 200:
+            return None
+        try:
+            root = ET.fromstring(response.content)
+        except ET.ParseError:
+            return None
+        return root.tag.replace(SITEMAP_NS, ''), [loc.text.strip() for loc in root.iter(SITEMAP_NS + 'loc') if loc.text]
+
+    def sitemap_urls(self):
+        """
+        从站点地图中列出全部文章地址（只取文章，不含页面、分类和用户）
+
+        Returns:
+            list: 文章地址；站点没有站点地图时为 None
+        """
+        for index_url in (f"{self.base_url}wp-sitemap.xml", f"{self.base_url}?sitemap=index"):
+            result = self.sitemap_locs(index_url)
+            if result:
+                break
+        else:
+            return None
+        kind, locs = result
+        if kind == 'urlset':
+            return locs
+        urls = []
+        for loc in locs:
+            if 'posts-post' in loc or 'sitemap-subtype=post' in loc or 'post-sitemap' in loc:
+                sub = self.sitemap_locs(loc)
+                if sub:
+                    urls.extend(sub[1])
+        return urls